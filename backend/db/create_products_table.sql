@@ -30,3 +30,5 @@ CREATE TABLE IF NOT EXISTS alternate_prices (
 );
 
 ALTER TABLE products ADD COLUMN IF NOT EXISTS metadata JSONB;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS price_fingerprint TEXT;
+ALTER TABLE products ADD COLUMN IF NOT EXISTS last_checked_at TIMESTAMP;
@@ -1,4 +1,5 @@
 const db = require('../db');
+const { toPrice } = require('../utils/price');
 
 async function createOrUpdateProduct({ url, title, image, price, email, targetPrice, metadata }) {
   const res = await db.query(`
@@ -53,7 +54,7 @@ async function insertAlternatePrices(productId, alternates, platform) {
     await db.query(
       `INSERT INTO alternate_prices (product_id, platform, title, url, price)
        VALUES ($1, $2, $3, $4, $5)`,
-      [productId, platform, alt.title, alt.url, alt.price ? parseFloat(alt.price.replace(/[^\d.]/g, '')) : null]
+      [productId, platform, alt.title, alt.url, toPrice(alt.price)]
     );
   }
 }
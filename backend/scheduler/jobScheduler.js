@@ -19,30 +19,54 @@ async function runPriceCheck(productId = null) {
 
   for (const product of products) {
     console.log(`[${now}] Scheduler: Sending to scraper: ${product.url}`);
-    const scraped = await scrapeProduct(product.url);
-    if (scraped.price) {
+    const scraped = await scrapeProduct(product.url, false, true, {
+      lastPrice: product.current_price,
+      fingerprint: product.price_fingerprint
+    });
+    if (!scraped.price) continue;
+    let priceHistoryId;
+    if (scraped.unchanged) {
+      console.log(`[${now}] Scheduler: Price unchanged for ${product.url}`);
+      // No new price_history row; the latest one still holds this price
+      const latest = await db.query(
+        'SELECT id FROM price_history WHERE product_id = $1 ORDER BY checked_at DESC LIMIT 1',
+        [product.id]
+      );
+      priceHistoryId = latest.rowCount ? latest.rows[0].id : null;
+      // Keep the fingerprint the scraper matched (or a first one) for the next re-check
+      await db.query(
+        'UPDATE products SET price_fingerprint = COALESCE($1, price_fingerprint), last_checked_at = CURRENT_TIMESTAMP WHERE id = $2',
+        [scraped.fingerprint || null, product.id]
+      );
+    } else {
       const result = await db.query(
         'INSERT INTO price_history (product_id, price) VALUES ($1, $2) RETURNING id',
         [product.id, scraped.price]
       );
-      const priceHistoryId = result.rows[0].id;
-      if (
-        product.target_price &&
-        scraped.price <= product.target_price &&
-        product.user_email
-      ) {
-        const emailCheck = await db.query(
-          'SELECT email_sent FROM price_history WHERE product_id = $1 AND price = $2 AND email_sent = TRUE',
-          [product.id, scraped.price]
-        );
-        if (emailCheck.rowCount === 0) {
-          try {
-            await sendPriceDropEmail(product.user_email, product, scraped.price);
+      await db.query(
+        'UPDATE products SET current_price = $1, price_fingerprint = $2, last_checked_at = CURRENT_TIMESTAMP WHERE id = $3',
+        [scraped.price, scraped.fingerprint || null, product.id]
+      );
+      priceHistoryId = result.rows[0].id;
+    }
+    if (
+      product.target_price &&
+      scraped.price <= product.target_price &&
+      product.user_email
+    ) {
+      const emailCheck = await db.query(
+        'SELECT email_sent FROM price_history WHERE product_id = $1 AND price = $2 AND email_sent = TRUE',
+        [product.id, scraped.price]
+      );
+      if (emailCheck.rowCount === 0) {
+        try {
+          await sendPriceDropEmail(product.user_email, product, scraped.price);
+          if (priceHistoryId) {
             await db.query('UPDATE price_history SET email_sent = TRUE WHERE id = $1', [priceHistoryId]);
-            console.log(`[${now}] Scheduler: Sent price drop email to ${product.user_email}`);
-          } catch (e) {
-            console.error(`[${now}] Scheduler: Failed to send email to ${product.user_email}:`, e);
           }
+          console.log(`[${now}] Scheduler: Sent price drop email to ${product.user_email}`);
+        } catch (e) {
+          console.error(`[${now}] Scheduler: Failed to send email to ${product.user_email}:`, e);
         }
       }
     }
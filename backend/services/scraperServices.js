@@ -1,11 +1,16 @@
 const axios = require('axios');
 const { console } = require('inspector');
 
-async function scrapeProduct(url, extract_metadata = false, get_alternates = true) {
+// recheck = { lastPrice, fingerprint } asks for a price-only re-check: the
+// scraper answers { unchanged: true, price, fingerprint } when nothing moved.
+async function scrapeProduct(url, extract_metadata = false, get_alternates = true, recheck = null) {
   console.log("Scraping product data from URL:", url);
-  const res = await axios.get(`${process.env.SCRAPER_URL}/scrape`, {
-    params: { url, extract_metadata, get_alternates }
-  });
+  const params = { url, extract_metadata, get_alternates };
+  if (recheck) {
+    if (recheck.lastPrice != null) params.last_price = recheck.lastPrice;
+    if (recheck.fingerprint) params.fingerprint = recheck.fingerprint;
+  }
+  const res = await axios.get(`${process.env.SCRAPER_URL}/scrape`, { params });
   return res.data.results;
 }
 
@@ -0,0 +1,30 @@
+const test = require('node:test');
+const assert = require('node:assert');
+const { toPrice } = require('../utils/price');
+
+// An alternate as the scraper's /scrape now returns it
+const alternate = {
+  platform: 'Flipkart',
+  title: 'Apple iPhone 15 (Black, 128 GB)',
+  url: 'https://www.flipkart.com/apple-iphone-15-black-128-gb/p/itm6ac6485515ae4',
+  price: 61999.0,
+  mrp: 69900.0,
+  currency: 'INR'
+};
+
+test('numeric scraper prices are used as they are', () => {
+  assert.strictEqual(toPrice(alternate.price), 61999);
+  assert.strictEqual(toPrice(alternate.mrp), 69900);
+});
+
+test('display strings from older scrapers are still parsed', () => {
+  assert.strictEqual(toPrice('₹61,999'), 61999);
+  assert.strictEqual(toPrice('Rs. 1,299.50'), 1299.5);
+});
+
+test('missing or unparseable prices are null', () => {
+  assert.strictEqual(toPrice(null), null);
+  assert.strictEqual(toPrice(undefined), null);
+  assert.strictEqual(toPrice(''), null);
+  assert.strictEqual(toPrice('Currently unavailable'), null);
+});
@@ -0,0 +1,11 @@
+// The scraper returns prices as numbers (e.g. alternate_prices[].price,
+// .mrp); older scraper versions sent display strings such as "₹15,499".
+function toPrice(value) {
+  if (value == null || value === '') return null;
+  if (typeof value === 'number') return Number.isFinite(value) ? value : null;
+  const match = String(value).replace(/,/g, '').match(/\d+(?:\.\d+)?/);
+  const price = match ? parseFloat(match[0]) : NaN;
+  return Number.isFinite(price) ? price : null;
+}
+
+module.exports = { toPrice };
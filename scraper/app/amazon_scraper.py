@@ -1,135 +1,107 @@
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-import re
 import sys
+from rate_limit import limiter_key
+from page_modes import CONTEXT_OPTIONS, SCRAPE_LEAN_DEFAULT, PageTraffic, install_lean_routes, wait_until
+from metrics import event, span
+from page_extract import (EXTRACT_SCRIPT, check_blocked, navigation_failed, page_result, price_unchanged,
+                          script_args, unchanged_result)
+from enrichment import enrich_product
 
-def clean_price(price_str):
-    price_str = price_str.replace('₹', '').replace(',', '').strip()
+def create_context(browser):
+    """
+    Create a browser context with the headers we present to Amazon.
+    """
+    return browser.new_context(**CONTEXT_OPTIONS)
+
+def scrape_page(page, url, lean=SCRAPE_LEAN_DEFAULT, price_only=False):
+    """
+    Scrape the page-bound fields of an Amazon product (title, price, image)
+    using an already opened page. lean controls the resource blocking in
+    page_modes.py; price_only skips the block-marker scan of pages that
+    have a price, for re-checks. Enrichment is left to the caller so the
+    page can be released first (see enrichment.py). The caller takes the
+    domain's rate-limit token before opening the page (see
+    main.acquire_page_token); the outcome is reported here.
+    """
+    traffic = PageTraffic(lean)
+    domain = limiter_key(url)
     try:
-        return float(re.findall(r"[\d.]+", price_str)[0])
+        install_lean_routes(page, traffic)
+        with span("navigation"):
+            page.goto(url, timeout=20000, wait_until=wait_until(lean))
+        # Title, price candidates, image and block markers in one round trip
+        with span("extract"):
+            extracted = page.evaluate(EXTRACT_SCRIPT, script_args(price_only))
+        blocked = check_blocked(domain, url, page.url, extracted)
     except Exception as e:
-        print(f"[ERROR] Failed to clean price: {e} | Raw: {price_str}", file=sys.stderr)
-        return None
+        return navigation_failed(domain, url, e)
+    if blocked:
+        return blocked
+    if not extracted["title"]:
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+        try:
+            with span("title_wait"):
+                page.wait_for_selector('#productTitle', timeout=10000)
+            extracted = page.evaluate(EXTRACT_SCRIPT, script_args(price_only))
+        except PlaywrightTimeoutError:
+            event("title_timeout")
+            print(f"[ERROR] Timeout waiting for product title on {url}", file=sys.stderr)
+            return {"error": "Timeout waiting for product title"}
+        except Exception as e:
+            print(f"[ERROR] Failed to find product title: {e}", file=sys.stderr)
+            return {"error": f"Failed to find product title: {e}"}
+    return page_result(url, extracted, traffic)
+
+def scrape_amazon_product(url, extract_metadata=False, get_alternates=False, context=None, cache_mode="use",
+                          lean=SCRAPE_LEAN_DEFAULT, price_only=False, last_price=None, fingerprint=None):
+    """
+    Scrape an Amazon product. When a warm browser context is passed (see
+    browser_pool.py) only a new page is opened, otherwise a browser is
+    launched for this single call. The page (or browser) is closed before
+    the metadata and alternate price enrichment runs.
 
-def scrape_amazon_product(url, extract_metadata=False, get_alternates=False):
+    Passing last_price or fingerprint makes this a re-check: when the price
+    has not moved the compact unchanged result is returned and nothing is
+    enriched.
+    """
+    recheck = last_price is not None or bool(fingerprint)
+    result = scrape_product_page(url, context=context, lean=lean, price_only=price_only or recheck)
+    if "error" in result:
+        return result
+    if recheck and price_unchanged(result, last_price, fingerprint):
+        return unchanged_result(result)
+    if recheck:
+        result = {**result, "unchanged": False}
+    return {**result, **enrich_product(result["title"], extract_metadata, get_alternates, cache_mode)}
+
+def scrape_product_page(url, context=None, lean=SCRAPE_LEAN_DEFAULT, price_only=False):
+    """
+    The page-bound stage of scrape_amazon_product: title, price and image,
+    with the page closed again before returning.
+    """
+    if context is not None:
+        page = None
+        try:
+            page = context.new_page()
+            return scrape_page(page, url, lean=lean, price_only=price_only)
+        except Exception as e:
+            print(f"[ERROR] Unexpected error: {e}", file=sys.stderr)
+            return {"error": str(e)}
+        finally:
+            if page:
+                try:
+                    page.close()
+                except Exception:
+                    pass
+    # Imported here so importing this module does not load Playwright
+    from playwright.sync_api import sync_playwright
     with sync_playwright() as p:
         browser = None
         try:
-            browser = p.chromium.launch(headless=True)
-            context = browser.new_context(
-                user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-                locale="en-US",
-                extra_http_headers={
-                    "accept-language": "en-US,en;q=0.9",
-                    "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-                    "sec-fetch-site": "none",
-                    "sec-fetch-mode": "navigate",
-                    "sec-fetch-user": "?1",
-                    "sec-fetch-dest": "document",
-                }
-            )
+            with span("browser_launch"):
+                browser = p.chromium.launch(headless=True)
+                context = create_context(browser)
             page = context.new_page()
-            try:
-                response = page.goto(url, timeout=20000)
-                final_url = page.url
-                if final_url != url:
-                    print(f"[REDIRECT] Navigated from {url} to {final_url}", file=sys.stderr)
-                content = page.content()
-                
-                if ("Enter the characters you see below" in content or
-                    "not a robot" in content or
-                    "captcha" in content.lower() or
-                    "Sorry, we just need to make sure you're not a robot" in content):
-                    print(f"[BLOCKED] CAPTCHA or block detected on {final_url}", file=sys.stderr)
-                    return {"error": "CAPTCHA or block detected"}
-              
-               
-            except Exception as e:
-                print(f"[ERROR] Failed to navigate to {url}: {e}", file=sys.stderr)
-                return {"error": f"Failed to navigate: {e}"}
-            try:
-                page.wait_for_selector('#productTitle', timeout=10000)
-            except PlaywrightTimeoutError:
-                print(f"[ERROR] Timeout waiting for product title on {url}", file=sys.stderr)
-                return {"error": "Timeout waiting for product title"}
-            except Exception as e:
-                print(f"[ERROR] Failed to find product title: {e}", file=sys.stderr)
-                return {"error": f"Failed to find product title: {e}"}
-            try:
-                title = page.locator("#productTitle").nth(0).inner_text().strip()
-            except Exception as e:
-                print(f"[ERROR] Failed to extract title: {e}", file=sys.stderr)
-                title = None
-            
-            metadata = None
-            alternate_prices = None
-            
-            # Extract metadata if requested
-            if extract_metadata and title:
-                try:
-                    from extract_metadata import extract_metadata_with_openai
-                    metadata = extract_metadata_with_openai(title)
-                    print(f"[DEBUG] Extracted metadata: {metadata}", file=sys.stderr)
-                except Exception as e:
-                    print(f"[ERROR] Failed to extract metadata: {e}", file=sys.stderr)
-                    metadata = None
-            
-            # Get alternate prices if requested
-            if get_alternates and title:
-                try:
-                    from extract_metadata import get_alternate_platform_prices
-                    # Always call with just the title if metadata is None or empty
-                    brand = None
-                    model = None
-                    if metadata and isinstance(metadata, dict):
-                        brand = metadata.get('brand')
-                        model = metadata.get('model')
-                    alternate_prices = get_alternate_platform_prices(title, brand, model)
-                    print(f"[DEBUG] Found {len(alternate_prices) if alternate_prices else 0} alternate prices", file=sys.stderr)
-                except Exception as e:
-                    print(f"[ERROR] Failed to get alternate prices: {e}", file=sys.stderr)
-                    alternate_prices = []
-            
-            price = None
-            price_selectors = [
-                "span.a-price span.a-offscreen",
-                "span#priceblock_ourprice",
-                "span#priceblock_dealprice",
-                "span#priceblock_saleprice",
-                "span.apexPriceToPay span.a-offscreen",
-                "span.a-price-whole"
-            ]
-            for selector in price_selectors:
-                try:
-                    locator = page.locator(selector)
-                    if locator.count() > 0:
-                        price_text = locator.first.inner_text().strip()
-                        price = clean_price(price_text)
-                        if price is not None:
-                            break
-                except Exception as e:
-                    print(f"[ERROR] Failed to extract price with selector {selector}: {e}", file=sys.stderr)
-            try:
-                page.wait_for_selector('body', timeout=15000)
-            except Exception as e:
-                print(f"[ERROR] Timeout waiting for body: {e}", file=sys.stderr)
-            if price is None:
-                print(f"[ERROR] Could not find price on page. Saving HTML snippet for debugging.", file=sys.stderr)
-                snippet = page.content()[:5000]
-                print(f"[HTML SNIPPET] {snippet}", file=sys.stderr)
-            try:
-                image = page.locator("#landingImage").get_attribute("src")
-            except Exception as e:
-                print(f"[ERROR] Failed to extract image: {e}", file=sys.stderr)
-                image = None
-            if not title:
-                return {"error": "Product title not found"}
-            return {
-                "title": title,
-                "price": price,
-                "image": image,
-                "metadata": metadata,
-                "alternate_prices": alternate_prices
-            }
+            return scrape_page(page, url, lean=lean, price_only=price_only)
         except Exception as e:
             print(f"[ERROR] Unexpected error: {e}", file=sys.stderr)
             return {"error": str(e)}
@@ -0,0 +1,93 @@
+import asyncio
+import sys
+
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+from enrichment import enrich_product
+from rate_limit import limiter_key
+from page_modes import CONTEXT_OPTIONS, SCRAPE_LEAN_DEFAULT, PageTraffic, install_lean_routes_async, wait_until
+from metrics import event, span
+from page_extract import (EXTRACT_SCRIPT, check_blocked, navigation_failed, page_result, price_unchanged, script_args,
+                          unchanged_result)
+
+async def create_context_async(browser):
+    """
+    Async counterpart of amazon_scraper.create_context.
+    """
+    return await browser.new_context(**CONTEXT_OPTIONS)
+
+async def scrape_page_async(page, url, lean=SCRAPE_LEAN_DEFAULT, price_only=False):
+    """
+    Async counterpart of amazon_scraper.scrape_page.
+    """
+    traffic = PageTraffic(lean)
+    domain = limiter_key(url)
+    try:
+        await install_lean_routes_async(page, traffic)
+        with span("navigation"):
+            await page.goto(url, timeout=20000, wait_until=wait_until(lean))
+        with span("extract"):
+            extracted = await page.evaluate(EXTRACT_SCRIPT, script_args(price_only))
+        blocked = check_blocked(domain, url, page.url, extracted)
+    except Exception as e:
+        return navigation_failed(domain, url, e)
+    if blocked:
+        return blocked
+    if not extracted["title"]:
+        try:
+            with span("title_wait"):
+                await page.wait_for_selector('#productTitle', timeout=10000)
+            extracted = await page.evaluate(EXTRACT_SCRIPT, script_args(price_only))
+        except PlaywrightTimeoutError:
+            event("title_timeout")
+            print(f"[ERROR] Timeout waiting for product title on {url}", file=sys.stderr)
+            return {"error": "Timeout waiting for product title"}
+        except Exception as e:
+            print(f"[ERROR] Failed to find product title: {e}", file=sys.stderr)
+            return {"error": f"Failed to find product title: {e}"}
+    return page_result(url, extracted, traffic)
+
+async def scrape_amazon_product_async(url, extract_metadata=False, get_alternates=False, pool=None, cache_mode="use",
+                                      lean=SCRAPE_LEAN_DEFAULT, price_only=False, last_price=None, fingerprint=None):
+    """
+    Scrape an Amazon product on a page leased from an AsyncBrowserPool, or on a
+    browser launched for this call when no pool is given. The page goes back
+    to the pool before enrichment starts; the metadata and alternate price
+    lookups are blocking HTTP calls, so they run in a worker thread to keep
+    the event loop free for other scrapes. last_price and fingerprint make
+    it a re-check, as in amazon_scraper.scrape_amazon_product.
+    """
+    recheck = last_price is not None or bool(fingerprint)
+    result = await scrape_product_page_async(url, pool=pool, lean=lean, price_only=price_only or recheck)
+    if "error" in result:
+        return result
+    if recheck and price_unchanged(result, last_price, fingerprint):
+        return unchanged_result(result)
+    if recheck:
+        result = {**result, "unchanged": False}
+    enrichment = await asyncio.to_thread(enrich_product, result["title"], extract_metadata, get_alternates, cache_mode)
+    return {**result, **enrichment}
+
+async def scrape_product_page_async(url, pool=None, lean=SCRAPE_LEAN_DEFAULT, price_only=False):
+    """
+    Async counterpart of amazon_scraper.scrape_product_page.
+    """
+    if pool is not None:
+        async with pool.page() as page:
+            return await scrape_page_async(page, url, lean=lean, price_only=price_only)
+
+    from playwright.async_api import async_playwright
+    async with async_playwright() as p:
+        browser = None
+        try:
+            with span("browser_launch"):
+                browser = await p.chromium.launch(headless=True)
+                context = await create_context_async(browser)
+            page = await context.new_page()
+            return await scrape_page_async(page, url, lean=lean, price_only=price_only)
+        except Exception as e:
+            print(f"[ERROR] Unexpected error: {e}", file=sys.stderr)
+            return {"error": str(e)}
+        finally:
+            if browser:
+                await browser.close()
@@ -0,0 +1,412 @@
+import asyncio
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+
+from metrics import span
+
+POOL_SIZE = int(os.getenv("SCRAPER_POOL_SIZE", "2"))
+POOL_MAX_PAGES = int(os.getenv("SCRAPER_POOL_MAX_PAGES", "50"))
+POOL_MAX_PENDING = int(os.getenv("SCRAPER_POOL_MAX_PENDING", "20"))
+POOL_HEALTH_INTERVAL = float(os.getenv("SCRAPER_POOL_HEALTH_INTERVAL", "30"))
+POOL_PAGES_PER_BROWSER = int(os.getenv("SCRAPER_POOL_PAGES_PER_BROWSER", "8"))
+
+
+class PoolExhausted(Exception):
+    """
+    Raised when every browser is busy and the pending queue is full.
+    """
+
+
+class _BrowserSlot(threading.Thread):
+    """
+    One long-lived Chromium with a warm context. The sync Playwright API is
+    bound to the thread that started it, so each slot owns its own thread and
+    pulls jobs from the pool's shared queue.
+    """
+
+    def __init__(self, pool, index):
+        super().__init__(name=f"browser-slot-{index}", daemon=True)
+        self.pool = pool
+        self.index = index
+        self.playwright = None
+        self.browser = None
+        self.context = None
+        self.pages = 0
+        self.busy = False
+
+    def run(self):
+        from playwright.sync_api import sync_playwright
+        try:
+            self.playwright = sync_playwright().start()
+        except Exception as e:
+            print(f"[ERROR] Browser slot {self.index} failed to start Playwright: {e}", file=sys.stderr)
+            return
+        try:
+            self.launch()
+        except Exception as e:
+            print(f"[ERROR] Browser slot {self.index} failed to launch browser: {e}", file=sys.stderr)
+        try:
+            while True:
+                try:
+                    job = self.pool._jobs.get(timeout=self.pool.health_interval)
+                except queue.Empty:
+                    self.health_check()
+                    continue
+                if job is None:
+                    break
+                self.run_job(job)
+        finally:
+            self.close_browser()
+            self.playwright.stop()
+
+    def launch(self):
+        from amazon_scraper import create_context
+        with span("browser_launch"):
+            self.browser = self.playwright.chromium.launch(headless=True)
+            self.context = create_context(self.browser)
+        self.pages = 0
+        self.pool._record("launches")
+
+    def close_browser(self):
+        if self.browser:
+            try:
+                self.browser.close()
+            except Exception as e:
+                print(f"[WARNING] Browser slot {self.index} failed to close browser: {e}", file=sys.stderr)
+        self.browser = None
+        self.context = None
+
+    def healthy(self):
+        return self.browser is not None and self.browser.is_connected()
+
+    def relaunch(self):
+        self.close_browser()
+        try:
+            self.launch()
+        except Exception as e:
+            print(f"[ERROR] Browser slot {self.index} failed to relaunch: {e}", file=sys.stderr)
+
+    def health_check(self):
+        if not self.healthy():
+            print(f"[WARNING] Browser slot {self.index} is unhealthy, relaunching", file=sys.stderr)
+            if self.browser is not None:
+                self.pool._record("crashes")
+            self.relaunch()
+
+    def run_job(self, job):
+        future, fn, args, kwargs, enqueued_at = job
+        if not future.set_running_or_notify_cancel():
+            return
+        started_at = time.monotonic()
+        self.busy = True
+        try:
+            if not self.healthy():
+                if self.browser is not None:
+                    self.pool._record("crashes")
+                self.close_browser()
+                self.launch()
+            result = fn(self.context, *args, **kwargs)
+            future.set_result(result)
+        except Exception as e:
+            print(f"[ERROR] Browser slot {self.index} job failed: {e}", file=sys.stderr)
+            future.set_exception(e)
+        finally:
+            self.busy = False
+            self.pages += 1
+            self.pool._record_job(started_at - enqueued_at, time.monotonic() - started_at)
+            if self.browser is not None and not self.browser.is_connected():
+                print(f"[WARNING] Browser slot {self.index} crashed, relaunching", file=sys.stderr)
+                self.pool._record("crashes")
+                self.relaunch()
+            elif self.pages >= self.pool.max_pages:
+                self.pool._record("recycles")
+                self.relaunch()
+
+
+class BrowserPool:
+    """
+    Fixed-size pool of warm Playwright browsers.
+
+    Jobs are callables taking a browser context as their first argument.
+    A browser is recycled after max_pages jobs or as soon as it disconnects,
+    and submit() raises PoolExhausted once max_pending jobs are waiting.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_pages=POOL_MAX_PAGES,
+                 max_pending=POOL_MAX_PENDING, health_interval=POOL_HEALTH_INTERVAL):
+        self.size = size
+        self.max_pages = max_pages
+        self.max_pending = max_pending
+        self.health_interval = health_interval
+        self._jobs = queue.Queue(maxsize=max_pending)
+        self._slots = []
+        self._lock = threading.Lock()
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "launches": 0,
+            "recycles": 0,
+            "crashes": 0,
+        }
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    def start(self):
+        for index in range(self.size):
+            slot = _BrowserSlot(self, index)
+            slot.start()
+            self._slots.append(slot)
+
+    def close(self):
+        for _ in self._slots:
+            self._jobs.put(None)
+        for slot in self._slots:
+            slot.join(timeout=10)
+        self._slots = []
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            self._jobs.put_nowait((future, fn, args, kwargs, time.monotonic()))
+        except queue.Full:
+            self._record("rejected")
+            raise PoolExhausted(f"All {self.size} browsers busy and {self.max_pending} jobs pending")
+        self._record("submitted")
+        return future
+
+    def scrape(self, url, **options):
+        """
+        Queue the page-bound stage of a product scrape on a warm browser and
+        return its future. options are passed on to scrape_product_page;
+        enrichment is left to the caller so the browser is not held for it.
+        """
+        from amazon_scraper import scrape_product_page
+        return self.submit(lambda context: scrape_product_page(url, context=context, **options))
+
+    def _record(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def _record_job(self, waited, ran):
+        with self._lock:
+            self._counters["completed"] += 1
+            self._wait_total += waited
+            self._run_total += ran
+
+    def stats(self):
+        with self._lock:
+            counters = dict(self._counters)
+            wait_total = self._wait_total
+            run_total = self._run_total
+        completed = counters["completed"]
+        busy = sum(1 for slot in self._slots if slot.busy)
+        return {
+            "size": self.size,
+            "busy": busy,
+            "idle": len(self._slots) - busy,
+            "healthy": sum(1 for slot in self._slots if slot.healthy()),
+            "pending": self._jobs.qsize(),
+            "max_pending": self.max_pending,
+            "max_pages": self.max_pages,
+            "avg_wait_ms": round(wait_total / completed * 1000, 1) if completed else 0.0,
+            "avg_run_ms": round(run_total / completed * 1000, 1) if completed else 0.0,
+            "slots": [{"index": slot.index, "busy": slot.busy, "pages": slot.pages} for slot in self._slots],
+            **counters,
+        }
+
+
+class _AsyncBrowser:
+    def __init__(self, browser, context):
+        self.browser = browser
+        self.context = context
+        self.pages = 0
+        self.active = 0
+        self.retiring = False
+
+    def healthy(self):
+        return not self.retiring and self.browser.is_connected()
+
+
+class AsyncBrowserPool:
+    """
+    Pool of warm browsers driven through Playwright's async API.
+
+    Unlike BrowserPool, each browser serves up to pages_per_browser pages at
+    once from the event loop, so one process can run dozens of scrapes
+    concurrently. Browsers are retired after max_pages pages (closed once
+    their open pages finish) or replaced as soon as they disconnect, and
+    page() raises PoolExhausted once max_pending callers are waiting.
+    """
+
+    def __init__(self, size=POOL_SIZE, pages_per_browser=POOL_PAGES_PER_BROWSER,
+                 max_pages=POOL_MAX_PAGES, max_pending=POOL_MAX_PENDING,
+                 health_interval=POOL_HEALTH_INTERVAL):
+        self.size = size
+        self.pages_per_browser = pages_per_browser
+        self.max_pages = max_pages
+        self.max_pending = max_pending
+        self.health_interval = health_interval
+        self._playwright = None
+        self._browsers = []
+        self._slots = asyncio.Semaphore(size * pages_per_browser)
+        self._launch_lock = asyncio.Lock()
+        self._health_task = None
+        self._waiting = 0
+        self._active = 0
+        self._counters = {
+            "submitted": 0,
+            "completed": 0,
+            "rejected": 0,
+            "launches": 0,
+            "recycles": 0,
+            "crashes": 0,
+        }
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        for _ in range(self.size):
+            try:
+                self._browsers.append(await self._launch())
+            except Exception as e:
+                print(f"[ERROR] Async pool failed to launch browser: {e}", file=sys.stderr)
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self):
+        if self._health_task:
+            self._health_task.cancel()
+        for entry in self._browsers:
+            await self._close_browser(entry)
+        self._browsers = []
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self):
+        from async_scraper import create_context_async
+        with span("browser_launch"):
+            browser = await self._playwright.chromium.launch(headless=True)
+            context = await create_context_async(browser)
+        self._counters["launches"] += 1
+        return _AsyncBrowser(browser, context)
+
+    async def _close_browser(self, entry):
+        try:
+            await entry.browser.close()
+        except Exception as e:
+            print(f"[WARNING] Async pool failed to close browser: {e}", file=sys.stderr)
+
+    async def _replace_unhealthy(self):
+        async with self._launch_lock:
+            for index, entry in enumerate(self._browsers):
+                if entry.healthy():
+                    continue
+                if not entry.retiring:
+                    print("[WARNING] Async pool browser disconnected, relaunching", file=sys.stderr)
+                    self._counters["crashes"] += 1
+                    entry.retiring = True
+                if entry.active == 0:
+                    asyncio.create_task(self._close_browser(entry))
+                try:
+                    self._browsers[index] = await self._launch()
+                except Exception as e:
+                    print(f"[ERROR] Async pool failed to relaunch browser: {e}", file=sys.stderr)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            await self._replace_unhealthy()
+
+    async def _lease(self):
+        healthy = [entry for entry in self._browsers if entry.healthy()]
+        if len(healthy) < len(self._browsers) or not healthy:
+            await self._replace_unhealthy()
+            healthy = [entry for entry in self._browsers if entry.healthy()]
+        if not healthy:
+            raise RuntimeError("No healthy browser available")
+        return min(healthy, key=lambda entry: entry.active)
+
+    def _release(self, entry):
+        entry.active -= 1
+        entry.pages += 1
+        if not entry.retiring and entry.pages >= self.max_pages:
+            entry.retiring = True
+            self._counters["recycles"] += 1
+        if entry.retiring and entry.active == 0 and entry not in self._browsers:
+            asyncio.create_task(self._close_browser(entry))
+
+    @asynccontextmanager
+    async def page(self):
+        """
+        Lease a fresh page on the least busy warm browser.
+        """
+        if self._slots.locked() and self._waiting >= self.max_pending:
+            self._counters["rejected"] += 1
+            raise PoolExhausted(
+                f"All {self.size * self.pages_per_browser} pages busy and {self.max_pending} scrapes pending"
+            )
+        self._counters["submitted"] += 1
+        enqueued_at = time.monotonic()
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+        started_at = time.monotonic()
+        entry = None
+        page = None
+        self._active += 1
+        try:
+            entry = await self._lease()
+            entry.active += 1
+            page = await entry.context.new_page()
+            yield page
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            if entry is not None:
+                self._release(entry)
+            self._active -= 1
+            self._slots.release()
+            self._counters["completed"] += 1
+            self._wait_total += started_at - enqueued_at
+            self._run_total += time.monotonic() - started_at
+
+    async def scrape(self, url, **options):
+        """
+        Page-bound stage of a product scrape on a leased page, like
+        BrowserPool.scrape.
+        """
+        from async_scraper import scrape_product_page_async
+        return await scrape_product_page_async(url, pool=self, **options)
+
+    def stats(self):
+        completed = self._counters["completed"]
+        return {
+            "size": self.size,
+            "pages_per_browser": self.pages_per_browser,
+            "busy": self._active,
+            "idle": self.size * self.pages_per_browser - self._active,
+            "healthy": sum(1 for entry in self._browsers if entry.healthy()),
+            "pending": self._waiting,
+            "max_pending": self.max_pending,
+            "max_pages": self.max_pages,
+            "avg_wait_ms": round(self._wait_total / completed * 1000, 1) if completed else 0.0,
+            "avg_run_ms": round(self._run_total / completed * 1000, 1) if completed else 0.0,
+            "browsers": [
+                {"index": index, "active": entry.active, "pages": entry.pages}
+                for index, entry in enumerate(self._browsers)
+            ],
+            **self._counters,
+        }
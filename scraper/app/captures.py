@@ -0,0 +1,235 @@
+"""
+Sampled debug captures of failed fetches.
+
+Instead of writing every result page to a fixed file in the working
+directory, failures are sampled into a size-bounded store under CAPTURE_DIR.
+Each capture is named by the SHA-256 of its content, so repeats of the same
+page are stored once, and is gzipped with a small JSON sidecar describing
+it. Writes happen on one background thread fed by a bounded queue; when the
+queue is full the capture is dropped rather than slowing the request down.
+The oldest captures are deleted once CAPTURE_MAX_FILES or CAPTURE_MAX_BYTES
+is exceeded. The index of what is already on disk is loaded by the writer
+thread when it starts, so capture() never touches the disk on the caller's
+thread; readers wait for that load.
+"""
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import queue
+import random
+import re
+import sys
+import threading
+import time
+
+CAPTURE_ENABLED = os.getenv("CAPTURE_ENABLED", "1") == "1"
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "captures")
+CAPTURE_SAMPLE_RATE = float(os.getenv("CAPTURE_SAMPLE_RATE", "0.25"))
+CAPTURE_MAX_FILES = int(os.getenv("CAPTURE_MAX_FILES", "500"))
+CAPTURE_MAX_BYTES = int(os.getenv("CAPTURE_MAX_BYTES", str(50 * 1024 * 1024)))
+CAPTURE_QUEUE_SIZE = int(os.getenv("CAPTURE_QUEUE_SIZE", "64"))
+
+_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+_queue = queue.Queue(maxsize=CAPTURE_QUEUE_SIZE)
+_writer = None
+_writer_lock = threading.Lock()
+_index = None
+_index_lock = threading.Lock()
+_index_ready = threading.Event()
+_pending = set()
+_counters = {"sampled_out": 0, "dropped": 0, "duplicates": 0, "written": 0, "evicted": 0}
+
+
+def _count(name):
+    with _index_lock:
+        _counters[name] += 1
+
+
+def _paths(capture_id):
+    base = os.path.join(CAPTURE_DIR, capture_id)
+    return base + ".html.gz", base + ".json"
+
+
+def _load_index():
+    """
+    capture id -> metadata for what is already on disk, oldest first.
+    """
+    index = {}
+    if os.path.isdir(CAPTURE_DIR):
+        for name in os.listdir(CAPTURE_DIR):
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(os.path.join(CAPTURE_DIR, name), encoding="utf-8") as f:
+                    meta = json.load(f)
+            except (OSError, ValueError):
+                continue
+            index[meta["id"]] = meta
+    return dict(sorted(index.items(), key=lambda item: item[1]["captured_at"]))
+
+
+def _get_index():
+    """
+    The capture index, once the writer thread has loaded it. Blocks until
+    then, so call it without holding _index_lock and off the event loop.
+    """
+    _ensure_writer()
+    _index_ready.wait()
+    return _index
+
+
+def _evict(index):
+    total = sum(meta["stored_bytes"] for meta in index.values())
+    while index and (len(index) > CAPTURE_MAX_FILES or total > CAPTURE_MAX_BYTES):
+        capture_id = next(iter(index))
+        total -= index.pop(capture_id)["stored_bytes"]
+        for path in _paths(capture_id):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        _counters["evicted"] += 1
+
+
+def _write(capture_id, content, meta):
+    data_path, meta_path = _paths(capture_id)
+    os.makedirs(CAPTURE_DIR, exist_ok=True)
+    data = gzip.compress(content.encode("utf-8"))
+    with open(data_path, "wb") as f:
+        f.write(data)
+    meta["stored_bytes"] = len(data)
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f)
+    with _index_lock:
+        _pending.discard(capture_id)
+        _index.pop(capture_id, None)
+        _index[capture_id] = meta
+        _counters["written"] += 1
+        _evict(_index)
+
+
+def _run_writer():
+    global _index
+    try:
+        index = _load_index()
+    except Exception as e:
+        print(f"[WARNING] Failed to load the capture index: {e}", file=sys.stderr)
+        index = {}
+    with _index_lock:
+        _index = index
+    _index_ready.set()
+    while True:
+        capture_id, content, meta = _queue.get()
+        try:
+            _write(capture_id, content, meta)
+        except Exception as e:
+            with _index_lock:
+                _pending.discard(capture_id)
+            print(f"[WARNING] Failed to write capture {capture_id}: {e}", file=sys.stderr)
+        finally:
+            _queue.task_done()
+
+
+def _ensure_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = threading.Thread(target=_run_writer, name="capture-writer", daemon=True)
+                _writer.start()
+
+
+def capture(kind, content, **details):
+    """
+    Sample content (a page or snippet that failed to yield a result) into the
+    store and return its capture id, or None when it was not kept. Never
+    blocks on disk I/O. details (url, reason, platform, ...) are stored with
+    the capture.
+    """
+    if not CAPTURE_ENABLED or not content:
+        return None
+    if random.random() >= CAPTURE_SAMPLE_RATE:
+        _count("sampled_out")
+        return None
+    capture_id = hashlib.sha256(content.encode("utf-8")).hexdigest()
+    with _index_lock:
+        # Until the writer has loaded the index only queued captures are
+        # known; a repeat of an older one is then rewritten, which is harmless
+        if capture_id in _pending or (_index is not None and capture_id in _index):
+            _counters["duplicates"] += 1
+            return capture_id
+        _pending.add(capture_id)
+    meta = {"id": capture_id, "kind": kind, "captured_at": time.time(), "bytes": len(content), **details}
+    _ensure_writer()
+    try:
+        _queue.put_nowait((capture_id, content, meta))
+    except queue.Full:
+        with _index_lock:
+            _pending.discard(capture_id)
+            _counters["dropped"] += 1
+        return None
+    return capture_id
+
+
+def flush(timeout=2.0):
+    """
+    Wait up to timeout seconds for queued captures to be written, so a
+    short-lived worker process does not exit with them still queued.
+    """
+    deadline = time.monotonic() + timeout
+    while _queue.unfinished_tasks and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+
+atexit.register(flush)
+
+
+def list_captures(kind=None, limit=100):
+    """
+    Metadata of stored captures, newest first.
+    """
+    index = _get_index()
+    with _index_lock:
+        metas = list(index.values())
+    metas.reverse()
+    if kind:
+        metas = [meta for meta in metas if meta["kind"] == kind]
+    return metas[:limit]
+
+
+def read_capture(capture_id):
+    """
+    (metadata, content) for a capture, or None when it does not exist.
+    """
+    if not _ID_RE.match(capture_id):
+        return None
+    index = _get_index()
+    with _index_lock:
+        meta = index.get(capture_id)
+    if meta is None:
+        return None
+    data_path, _ = _paths(capture_id)
+    try:
+        with open(data_path, "rb") as f:
+            return meta, gzip.decompress(f.read()).decode("utf-8")
+    except OSError:
+        return None
+
+
+def stats():
+    index = _get_index()
+    with _index_lock:
+        return {
+            "enabled": CAPTURE_ENABLED,
+            "dir": CAPTURE_DIR,
+            "sample_rate": CAPTURE_SAMPLE_RATE,
+            "captures": len(index),
+            "stored_bytes": sum(meta["stored_bytes"] for meta in index.values()),
+            "max_files": CAPTURE_MAX_FILES,
+            "max_bytes": CAPTURE_MAX_BYTES,
+            "queued": _queue.qsize(),
+            **_counters,
+        }
@@ -0,0 +1,131 @@
+"""
+Single-flight coalescing of product scrapes.
+
+The backend scrapes the same popular products from several places at once
+(trackProduct and the scheduler, for different users), and each request
+used to get its own browser page. Concurrent requests for the same product
+and options now share one in-flight scrape, and a result that completed
+less than SCRAPE_FRESH_SECONDS ago is returned again without refetching.
+
+Product URLs are compared by canonical_url(), so Amazon links that differ
+only in slug, ref path or tracking parameters map to the same /dp/<ASIN>.
+"""
+import asyncio
+import os
+import re
+import threading
+from urllib.parse import urlsplit
+
+from search_cache import open_cache
+
+SCRAPE_COALESCE = os.getenv("SCRAPE_COALESCE", "1") == "1"
+SCRAPE_FRESH_SECONDS = float(os.getenv("SCRAPE_FRESH_SECONDS", "30"))
+SCRAPE_FRESH_MAX_ENTRIES = int(os.getenv("SCRAPE_FRESH_MAX_ENTRIES", "2000"))
+
+_AMAZON_HOST_RE = re.compile(r"(^|\.)amazon\.[a-z.]+$")
+_ASIN_RE = re.compile(r"/(?:dp|gp/product|gp/aw/d|exec/obidos/asin|o/asin)/([A-Z0-9]{10})(?=[/?#]|$)", re.IGNORECASE)
+
+_inflight = {}
+_fresh = None
+_fresh_lock = threading.Lock()
+_counters = {"leaders": 0, "joined": 0, "fresh_hits": 0, "abandoned": 0}
+
+
+def canonical_url(url):
+    """
+    One URL per product: https://www.amazon.<tld>/dp/<ASIN> for Amazon
+    product links, otherwise the URL without its fragment and with a
+    lowercased host.
+    """
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    if _AMAZON_HOST_RE.search(host):
+        asin = _ASIN_RE.search(parts.path)
+        if asin:
+            if not host.startswith("www."):
+                host = "www." + host
+            return f"https://{host}/dp/{asin.group(1).upper()}"
+    netloc = host + (f":{parts.port}" if parts.port else "")
+    query = f"?{parts.query}" if parts.query else ""
+    return f"{parts.scheme.lower()}://{netloc}{parts.path or '/'}{query}"
+
+
+def scrape_key(url, options):
+    """
+    Canonical URL plus every option that changes the result.
+    """
+    flags = ",".join(f"{name}={options[name]}" for name in sorted(options))
+    return f"{canonical_url(url)}|{flags}"
+
+
+def get_fresh_results():
+    global _fresh
+    if _fresh is None:
+        with _fresh_lock:
+            if _fresh is None:
+                _fresh = open_cache("memory", None, SCRAPE_FRESH_SECONDS, SCRAPE_FRESH_MAX_ENTRIES, "fresh_scrapes")
+    return _fresh
+
+
+def _succeeded(result):
+    return isinstance(result, dict) and "error" not in result
+
+
+class _Flight:
+    def __init__(self, task):
+        self.task = task
+        self.waiters = 0
+
+
+async def coalesced(key, make_scrape, use_fresh=True, succeeded=_succeeded):
+    """
+    Await make_scrape() for key, sharing one run between concurrent callers
+    and, when use_fresh is set, reusing a successful result from the last
+    SCRAPE_FRESH_SECONDS. The shared scrape runs as its own task, so one
+    caller timing out or disconnecting does not cancel it for the others; it
+    is cancelled only when every caller has gone.
+    """
+    if not SCRAPE_COALESCE:
+        return await make_scrape()
+    if use_fresh and SCRAPE_FRESH_SECONDS > 0:
+        result = get_fresh_results().get(key)
+        if result is not None:
+            _counters["fresh_hits"] += 1
+            return result
+
+    flight = _inflight.get(key)
+    if flight is None:
+        flight = _inflight[key] = _Flight(asyncio.ensure_future(make_scrape()))
+        flight.task.add_done_callback(lambda task: _finish(key, flight, task, succeeded))
+        _counters["leaders"] += 1
+    else:
+        _counters["joined"] += 1
+
+    flight.waiters += 1
+    try:
+        return await asyncio.shield(flight.task)
+    finally:
+        flight.waiters -= 1
+        if not flight.waiters and not flight.task.done():
+            _counters["abandoned"] += 1
+            flight.task.cancel()
+
+
+def _finish(key, flight, task, succeeded):
+    if _inflight.get(key) is flight:
+        del _inflight[key]
+    if task.cancelled() or task.exception() is not None:
+        return
+    result = task.result()
+    if SCRAPE_FRESH_SECONDS > 0 and succeeded(result):
+        get_fresh_results().set(key, result)
+
+
+def stats():
+    return {
+        "enabled": SCRAPE_COALESCE,
+        "fresh_seconds": SCRAPE_FRESH_SECONDS,
+        "inflight": len(_inflight),
+        **_counters,
+        "fresh": get_fresh_results().stats(),
+    }
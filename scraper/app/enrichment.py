@@ -0,0 +1,103 @@
+"""
+Title-driven enrichment of a scraped product: LLM/rule metadata and
+alternate platform prices.
+
+This runs after the page-bound stage has finished and its browser page has
+been released, so a browser never sits idle while Gemini or DuckDuckGo
+answer. The metadata lookup and the alternate-price fan-out run side by
+side rather than one after the other: the alternate queries use the
+offline rule metadata, which is instant, instead of waiting for the LLM.
+Whatever is not back after ENRICH_DEADLINE seconds is left out and named
+in the result's "enrichment" field. A metadata call that is still running
+keeps going in the background and fills the metadata cache for the next
+scrape of the title.
+"""
+import contextvars
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+
+from metrics import event, span
+
+ENRICH_DEADLINE = float(os.getenv("ENRICH_DEADLINE", "15"))
+ENRICH_MAX_WORKERS = int(os.getenv("ENRICH_MAX_WORKERS", "8"))
+
+_executor = None
+
+
+def get_enrich_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=ENRICH_MAX_WORKERS, thread_name_prefix="enrich")
+    return _executor
+
+
+def _metadata(title):
+    from extract_metadata import extract_product_metadata
+    with span("metadata"):
+        metadata = extract_product_metadata(title)
+    print(f"[DEBUG] Extracted metadata: {metadata}", file=sys.stderr)
+    return metadata
+
+
+def _query_metadata(title):
+    """
+    Brand and model for the alternate queries, from the offline rules when
+    they are confident enough.
+    """
+    from extract_metadata import METADATA_RULES_MIN_CONFIDENCE
+    from rule_metadata import extract_metadata_rules
+    metadata, confidence = extract_metadata_rules(title)
+    if confidence < METADATA_RULES_MIN_CONFIDENCE:
+        return None, None
+    return metadata.get("brand"), metadata.get("model")
+
+
+def enrich_product(title, extract_metadata=False, get_alternates=False, cache_mode="use", deadline=ENRICH_DEADLINE):
+    """
+    {"metadata", "alternate_prices", "enrichment"} for a scraped title,
+    shared by the browser and plain-HTTP fetch tiers. Stages that miss the
+    deadline are listed in enrichment["timed_out"]; a timed-out metadata
+    lookup falls back to the rule metadata.
+    """
+    result = {"metadata": None, "alternate_prices": None}
+    if not title or not (extract_metadata or get_alternates):
+        return result
+    started = time.monotonic()
+    stop_at = started + deadline
+    timed_out = []
+
+    metadata_future = None
+    if extract_metadata:
+        # Copy the context so the metadata spans reach this request's timings
+        metadata_future = get_enrich_executor().submit(contextvars.copy_context().run, _metadata, title)
+
+    if get_alternates:
+        try:
+            from extract_metadata import ALTERNATES_DEADLINE, get_alternate_platform_prices
+            brand, model = _query_metadata(title)
+            with span("alternates"):
+                alternate_prices = get_alternate_platform_prices(
+                    title, brand, model, cache_mode=cache_mode, deadline=min(ALTERNATES_DEADLINE, deadline)
+                )
+            print(f"[DEBUG] Found {len(alternate_prices) if alternate_prices else 0} alternate prices", file=sys.stderr)
+            result["alternate_prices"] = alternate_prices
+        except Exception as e:
+            print(f"[ERROR] Failed to get alternate prices: {e}", file=sys.stderr)
+            result["alternate_prices"] = []
+
+    if metadata_future is not None:
+        try:
+            result["metadata"] = metadata_future.result(timeout=max(0.0, stop_at - time.monotonic()))
+        except FutureTimeoutError:
+            from rule_metadata import extract_metadata_rules
+            event("enrichment_timeout")
+            print(f"[WARNING] Metadata not back after {deadline}s, returning rule metadata", file=sys.stderr)
+            result["metadata"], _ = extract_metadata_rules(title)
+            timed_out.append("metadata")
+        except Exception as e:
+            print(f"[ERROR] Failed to extract metadata: {e}", file=sys.stderr)
+
+    result["enrichment"] = {"seconds": round(time.monotonic() - started, 3), "timed_out": timed_out}
+    return result
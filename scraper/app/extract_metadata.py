@@ -1,414 +1,504 @@
 import os
 import sys
 import json
-import requests
+import hashlib
 import re
-from dotenv import load_dotenv
+import threading
+import contextvars
 import time
-from urllib.parse import unquote
-from bs4 import BeautifulSoup  
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from search_cache import CACHE_USE, cached_search, normalize_query, open_cache
+from rule_metadata import RULES_MIN_CONFIDENCE, extract_metadata_rules
+from price_tokens import price_details
+from platforms import enabled_platforms, make_searcher
+from metrics import span
+from startup import load_config
 
-load_dotenv()
+# A no-op when the entry point has already loaded .env
+load_config()
 
-def extract_metadata_with_gemini(title):
-    try:
-        import google.generativeai as genai
-    except ImportError:
-        print("[ERROR] google-generativeai SDK not installed. Run: pip install google-generativeai", file=sys.stderr)
+ALTERNATES_DEADLINE = float(os.getenv("ALTERNATES_DEADLINE", "12"))
+ALTERNATES_MIN_PRICED = int(os.getenv("ALTERNATES_MIN_PRICED", "5"))
+ALTERNATES_MAX_WORKERS = int(os.getenv("ALTERNATES_MAX_WORKERS", "16"))
+
+METADATA_CACHE_BACKEND = os.getenv("METADATA_CACHE_BACKEND", "sqlite")
+METADATA_CACHE_PATH = os.getenv("METADATA_CACHE_PATH", "metadata_cache.sqlite3")
+METADATA_CACHE_TTL = float(os.getenv("METADATA_CACHE_TTL", str(90 * 24 * 60 * 60)))
+METADATA_CACHE_MAX_ENTRIES = int(os.getenv("METADATA_CACHE_MAX_ENTRIES", "100000"))
+
+GEMINI_MODEL_NAMES = [
+    'gemini-1.5-flash',
+    'gemini-1.5-pro', 
+    'gemini-1.0-pro',
+    'models/gemini-1.5-flash',
+    'models/gemini-1.5-pro',
+    'models/gemini-1.0-pro'
+]
+LAST_MODEL_KEY = "model:last_working"
+METADATA_LLM_BACKEND = os.getenv("METADATA_LLM_BACKEND", "gemini")
+GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+METADATA_BATCH_SIZE = int(os.getenv("METADATA_BATCH_SIZE", "25"))
+METADATA_BATCH_RETRIES = int(os.getenv("METADATA_BATCH_RETRIES", "2"))
+METADATA_RULES_MIN_CONFIDENCE = float(os.getenv("METADATA_RULES_MIN_CONFIDENCE", str(RULES_MIN_CONFIDENCE)))
+
+_search_executor = None
+_metadata_cache = None
+_metadata_lock = threading.Lock()
+_metadata_inflight = {}
+_configured_api_key = None
+_genai = None
+_genai_missing = False
+_last_working_model = None
+
+def get_metadata_cache():
+    """
+    Return the persistent title -> metadata store, or None when
+    METADATA_CACHE_BACKEND=off.
+    """
+    global _metadata_cache
+    if _metadata_cache is None and METADATA_CACHE_BACKEND != "off":
+        with _metadata_lock:
+            if _metadata_cache is None:
+                _metadata_cache = open_cache(METADATA_CACHE_BACKEND, METADATA_CACHE_PATH, METADATA_CACHE_TTL,
+                                             METADATA_CACHE_MAX_ENTRIES, "metadata_cache")
+    return _metadata_cache
+
+def metadata_cache_key(title):
+    return "title:" + hashlib.sha256(normalize_query(title).encode("utf-8")).hexdigest()
+
+def configure_gemini(genai, api_key):
+    """
+    Configure the Gemini client once per API key instead of on every call.
+    """
+    global _configured_api_key
+    if _configured_api_key != api_key:
+        genai.configure(api_key=api_key)
+        _configured_api_key = api_key
+
+def import_genai():
+    """
+    The Gemini SDK, imported on first use so processes that never call the
+    LLM do not load it. None when it is not installed, which is reported
+    once rather than on every call.
+    """
+    global _genai, _genai_missing
+    if _genai is None and not _genai_missing:
+        try:
+            import google.generativeai as genai
+        except ImportError:
+            print("[ERROR] google-generativeai SDK not installed. Run: pip install google-generativeai", file=sys.stderr)
+            _genai_missing = True
+            return None
+        _genai = genai
+    return _genai
+
+def gemini_model_order():
+    """
+    GEMINI_MODEL_NAMES with the model that last answered moved to the front,
+    so a dead model name does not cost a failed round trip on every call.
+    """
+    global _last_working_model
+    if _last_working_model is None:
+        cache = get_metadata_cache()
+        _last_working_model = (cache.get(LAST_MODEL_KEY) if cache else None) or ""
+    if _last_working_model in GEMINI_MODEL_NAMES:
+        return [_last_working_model] + [name for name in GEMINI_MODEL_NAMES if name != _last_working_model]
+    return list(GEMINI_MODEL_NAMES)
+
+def remember_working_model(model_name):
+    global _last_working_model
+    if model_name != _last_working_model:
+        _last_working_model = model_name
+        cache = get_metadata_cache()
+        if cache:
+            cache.set(LAST_MODEL_KEY, model_name)
+
+def strip_code_fence(response_text):
+    response_text = response_text.strip()
+    
+    if response_text.startswith('```json'):
+        response_text = response_text[7:]  
+    elif response_text.startswith('```'):
+        response_text = response_text[3:]   
+        
+    if response_text.endswith('```'):
+        response_text = response_text[:-3] 
+        
+    return response_text.strip()
+
+def get_gemini_model_factory():
+    """
+    Return a callable mapping a model name to an object with
+    generate_content(prompt), or None when Gemini is unavailable.
+    METADATA_LLM_BACKEND=fake swaps in the local stand-in from fake_llm.py.
+    """
+    if METADATA_LLM_BACKEND == "fake":
+        from fake_llm import FakeGeminiModel
+        return FakeGeminiModel
+
+    genai = import_genai()
+    if genai is None:
         return None
 
-    api_key = os.getenv('GEMINI_API_KEY')
-    if not api_key:
+    if not GEMINI_API_KEY:
         print('[ERROR] GEMINI_API_KEY not set in environment', file=sys.stderr)
         return None
 
+    configure_gemini(genai, GEMINI_API_KEY)
+    return genai.GenerativeModel
+
+def generate_with_fallback(model_factory, prompt):
+    """
+    Send prompt to the first model in gemini_model_order() that answers and
+    return the response text.
+    """
+    response = None
+    last_error = None
+    
+    for model_name in gemini_model_order():
+        try:
+            model = model_factory(model_name)
+            with span("metadata_llm"):
+                response = model.generate_content(prompt)
+            remember_working_model(model_name)
+            break  
+        except Exception as e:
+            last_error = e
+            continue 
+    
+    if response is None:
+        raise last_error or Exception("No working model found")
+    return response.text
+
+def call_gemini_for_metadata(title):
+    model_factory = get_gemini_model_factory()
+    if model_factory is None:
+        return None
+
     prompt = f"""
 Extract the brand, model, and key attributes from this product title. Return as JSON with keys: brand, model, attributes.
 Title: {title}
 """
+    response_text = None
     try:
-        genai.configure(api_key=api_key)
-        model_names = [
-            'gemini-1.5-flash',
-            'gemini-1.5-pro', 
-            'gemini-1.0-pro',
-            'models/gemini-1.5-flash',
-            'models/gemini-1.5-pro',
-            'models/gemini-1.0-pro'
-        ]
-        
-        response = None
-        last_error = None
-        
-        for model_name in model_names:
-            try:
-                model = genai.GenerativeModel(model_name)
-                response = model.generate_content(prompt)
-                break  
-            except Exception as e:
-                last_error = e
-                continue 
-        
-        if response is None:
-            raise last_error or Exception("No working model found")
-        
-        response_text = response.text.strip()
-        
-        if response_text.startswith('```json'):
-            response_text = response_text[7:]  
-        elif response_text.startswith('```'):
-            response_text = response_text[3:]   
-            
-        if response_text.endswith('```'):
-            response_text = response_text[:-3] 
-            
-        response_text = response_text.strip()
-        
-        return json.loads(response_text)
+        response_text = generate_with_fallback(model_factory, prompt)
+        return json.loads(strip_code_fence(response_text))
     except json.JSONDecodeError as e:
         print(f"[ERROR] Failed to parse Gemini response as JSON: {e}", file=sys.stderr)
-        print(f"[DEBUG] Raw response: {response.text}", file=sys.stderr)
+        print(f"[DEBUG] Raw response: {response_text}", file=sys.stderr)
         return None
     except Exception as e:
         print(f"[ERROR] Gemini metadata extraction failed: {e}", file=sys.stderr)
         return None
 
+def extract_metadata_with_gemini(title):
+    """
+    Memoized Gemini metadata extraction. Results are stored per normalized
+    title, and concurrent calls for the same title share one LLM request.
+    """
+    cache = get_metadata_cache()
+    key = metadata_cache_key(title)
+    if cache:
+        metadata = cache.get(key)
+        if metadata is not None:
+            return metadata
+
+    with _metadata_lock:
+        future = _metadata_inflight.get(key)
+        owner = future is None
+        if owner:
+            future = Future()
+            _metadata_inflight[key] = future
+    if not owner:
+        return future.result()
+
+    metadata = None
+    try:
+        metadata = call_gemini_for_metadata(title)
+        if metadata is not None and cache:
+            cache.set(key, metadata)
+    finally:
+        with _metadata_lock:
+            del _metadata_inflight[key]
+        future.set_result(metadata)
+    return metadata
+
+def extract_product_metadata(title):
+    """
+    Metadata for a title from the offline rules in rule_metadata.py when they
+    are confident enough, otherwise from the memoized Gemini path. The rule
+    result is still returned if the LLM fails.
+    """
+    metadata, confidence = extract_metadata_rules(title)
+    if confidence >= METADATA_RULES_MIN_CONFIDENCE:
+        print(f"[DEBUG] Rule-based metadata with confidence {confidence}", file=sys.stderr)
+        return metadata
+    llm_metadata = extract_metadata_with_gemini(title)
+    return llm_metadata if llm_metadata is not None else metadata
+
+def build_batch_prompt(titles):
+    numbered = "\n".join(f"{index}. {title}" for index, title in enumerate(titles, start=1))
+    return f"""
+Extract the brand, model, and key attributes from each numbered product title below.
+Return only a JSON array with one object per title, each with keys: index, brand, model, attributes.
+The index must be the number of the title it describes.
+Titles:
+{numbered}
+"""
+
+def parse_batch_response(response_text, count):
+    """
+    Map the JSON array returned for a batch prompt back to 0-based title
+    positions. Entries that are missing, malformed or out of range are left
+    out, so the caller can retry just those titles.
+    """
+    try:
+        items = json.loads(strip_code_fence(response_text))
+    except json.JSONDecodeError as e:
+        print(f"[ERROR] Failed to parse batch response as JSON: {e}", file=sys.stderr)
+        return {}
+    if not isinstance(items, list):
+        print("[ERROR] Batch response is not a JSON array", file=sys.stderr)
+        return {}
+    parsed = {}
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        try:
+            position = int(item.get("index")) - 1
+        except (TypeError, ValueError):
+            continue
+        if 0 <= position < count and position not in parsed:
+            parsed[position] = {key: item.get(key) for key in ("brand", "model", "attributes")}
+    return parsed
+
+def extract_metadata_batch(titles, batch_size=METADATA_BATCH_SIZE, max_retries=METADATA_BATCH_RETRIES, use_rules=True):
+    """
+    Extract metadata for many titles with one LLM call per batch_size titles.
+    Cached titles and (with use_rules) titles the offline rules are confident
+    about are skipped, and titles whose entry is missing from a batch
+    response are retried (up to max_retries times) without re-sending the
+    ones that succeeded. Returns a list aligned with titles; titles the LLM
+    never answered get the rule metadata, as in extract_product_metadata.
+    """
+    cache = get_metadata_cache()
+    results = {}
+    pending = []
+    seen = set()
+    for title in titles:
+        key = metadata_cache_key(title)
+        if key in seen:
+            continue
+        seen.add(key)
+        cached = cache.get(key) if cache else None
+        if cached is not None:
+            results[key] = cached
+            continue
+        if use_rules:
+            metadata, confidence = extract_metadata_rules(title)
+            if confidence >= METADATA_RULES_MIN_CONFIDENCE:
+                results[key] = metadata
+                continue
+        pending.append(title)
+
+    model_factory = get_gemini_model_factory() if pending else None
+    attempt = 0
+    while pending and model_factory is not None and attempt <= max_retries:
+        failed = []
+        for start in range(0, len(pending), batch_size):
+            chunk = pending[start:start + batch_size]
+            parsed = {}
+            try:
+                response_text = generate_with_fallback(model_factory, build_batch_prompt(chunk))
+                parsed = parse_batch_response(response_text, len(chunk))
+            except Exception as e:
+                print(f"[ERROR] Gemini batch metadata extraction failed: {e}", file=sys.stderr)
+            for position, title in enumerate(chunk):
+                metadata = parsed.get(position)
+                if metadata is None:
+                    failed.append(title)
+                    continue
+                results[metadata_cache_key(title)] = metadata
+                if cache:
+                    cache.set(metadata_cache_key(title), metadata)
+        if failed:
+            print(f"[WARNING] {len(failed)} titles missing from batch attempt {attempt + 1}", file=sys.stderr)
+        pending = failed
+        attempt += 1
+
+    for title in pending:
+        results[metadata_cache_key(title)] = extract_metadata_rules(title)[0]
+    return [results.get(metadata_cache_key(title)) for title in titles]
+
 def extract_price_from_text(text):
     """
-    Extract price from text using multiple patterns
+    Extract the selling price from text as a float (see price_tokens.py)
     """
-    price_patterns = [
-        r'₹\s*[\d,]+(?:\.\d+)?', 
-        r'Rs\.?\s*[\d,]+(?:\.\d+)?', 
-        r'INR\s*[\d,]+(?:\.\d+)?',  
-        r'\b[\d,]+\s*₹',  
-        r'Price:\s*₹?\s*[\d,]+(?:\.\d+)?',  
-        r'MRP:?\s*₹?\s*[\d,]+(?:\.\d+)?', 
-    ]
-    
-    for pattern in price_patterns:
-        matches = re.findall(pattern, text, re.IGNORECASE)
-        if matches:
-            return matches[0].strip()
-    
-    return None
+    return price_details(text)["price"]
 
-def search_platform_with_retry(search_func, query, platform_name, max_retries=2):
+def search_platform_with_retry(search_func, query, platform_name, max_retries=2, cache_mode=CACHE_USE):
     """
-    Wrapper function to retry platform searches with different queries
+    Wrapper function to retry platform searches with different queries.
+    DuckDuckGo requests are paced by rate_limit, so retries do not sleep.
     """
     for attempt in range(max_retries):
         try:
-            results = search_func(query)
+            results = cached_search(search_func, query, platform_name, cache_mode)
             if results:
                 return results
          
             if attempt < max_retries - 1:
                 query = " ".join(query.split()[:3]) 
-                time.sleep(1)  
         except Exception as e:
             print(f"[WARNING] {platform_name} search attempt {attempt + 1} failed: {e}", file=sys.stderr)
-            if attempt < max_retries - 1:
-                time.sleep(1)
     
     return []
 
-def search_flipkart(query):
+# The platform searches are config entries in platforms.py; these names are
+# kept for callers that search one platform directly.
+search_flipkart = make_searcher("flipkart")
+search_meesho = make_searcher("meesho")
+search_reliance_digital = make_searcher("reliance digital")
+
+ALTERNATE_PLATFORMS = [
+    (platform["key"], make_searcher(platform["key"]), platform["name"]) for platform in enabled_platforms()
+]
+
+def build_alternate_queries(title, brand=None, model=None):
     """
-    Use DuckDuckGo to search Flipkart for the product and return a list of (title, url, price) tuples.
+    Build the query variations used to look a product up on other platforms.
     """
-    search_url = "https://duckduckgo.com/html/"
-    params = {"q": f"{query} site:flipkart.com"}  
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-        "Accept-Encoding": "gzip, deflate",
-        "Connection": "keep-alive",
-    }
+    queries = [title]
     
-    try:
-        resp = requests.get(search_url, params=params, headers=headers, timeout=15)
-        resp.raise_for_status()
-        with open("ddg_test.html", "w", encoding="utf-8") as f:
-            f.write(resp.text)
-       
-        if ("no results" in resp.text.lower() or "captcha" in resp.text.lower() or "detected unusual traffic" in resp.text.lower()):
-            print("[WARNING] DuckDuckGo may be blocking or returning no results.", file=sys.stderr)
-            return []
-        
-        soup = BeautifulSoup(resp.text, "html.parser")
-        results = []
-        for a in soup.find_all("a", href=True):
-            url = a["href"]
-            if not url.startswith("https://www.flipkart.com/"):
-                continue
-            title = a.get_text(strip=True)
-            if not title or len(title) < 5:
-                continue
-  
-            price = None
-            parent = a.find_parent()
-            context = parent.get_text(" ", strip=True) if parent else title
-            price = extract_price_from_text(context)
-            if not price:
-                price = extract_price_from_text(title)
-            results.append({
-                "title": title[:100],
-                "url": url,
-                "price": price
-            })
-            if len(results) >= 5:
-                break
-        results_with_prices = [r for r in results if r['price']]
-        if results_with_prices:
-            return results_with_prices[:5]
-        return results[:5]
-    except Exception as e:
-        print(f"[ERROR] Flipkart search failed: {e}", file=sys.stderr)
-        return []
+    if brand and model:
+        queries.append(f"{brand} {model}")
+        queries.append(f"{brand} {model} {title}")
+    elif brand:
+        queries.append(f"{brand} {title}")
+    elif model:
+        queries.append(f"{model} {title}")
+    
+    return [re.sub(r'\s+', ' ', query).strip() for query in queries]
 
-def search_meesho(query):
+def rank_alternate_results(all_results):
     """
-    Use DuckDuckGo to search Meesho for the product and return a list of (title, url, price) tuples.
+    Drop duplicate URLs and put priced results first.
     """
-    search_url = "https://duckduckgo.com/html/"
-    params = {"q": f"{query} site:meesho.com"} 
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-    }
+    seen_urls = set()
+    unique_results = []
+    for result in all_results:
+        if result['url'] not in seen_urls:
+            seen_urls.add(result['url'])
+            unique_results.append(result)
     
-    try:
-        resp = requests.get(search_url, params=params, headers=headers, timeout=15)
-        resp.raise_for_status()
-        
-        links = re.findall(r'<a[^>]+href="(https://www\\.meesho\\.com/[^\"]+)"[^>]*>(.*?)</a>', resp.text, re.DOTALL)
-        results = []
-        
-        for url, title_html in links:
-            url = unquote(url)
-            if 'meesho.com' not in url:
-                continue
-                
-            title = re.sub('<[^<]+?>', '', title_html).strip()
-            if not title or len(title) < 5:
-                continue
-            
-            price = None
-            
-            # Find price in surrounding context
-            link_pos = resp.text.find(url)
-            if link_pos != -1:
-                context_start = max(0, link_pos - 500)
-                context_end = min(len(resp.text), link_pos + 500)
-                context = resp.text[context_start:context_end]
-                price = extract_price_from_text(context)
-            
-            if not price:
-                price = extract_price_from_text(title_html + " " + title)
-            
-            results.append({
-                "title": title[:100],
-                "url": url,
-                "price": price
-            })
-            
-            if len(results) >= 5:
-                break
-        
-        # Prioritize results with prices
-        results_with_prices = [r for r in results if r['price']]
-        if results_with_prices:
-            return results_with_prices[:5]
-        
-        # Fallback: Save HTML and try BeautifulSoup parsing if no results with prices
-        try:
-            from bs4 import BeautifulSoup
-        except ImportError:
-            print("[WARNING] BeautifulSoup not installed, skipping fallback parsing for Meesho.", file=sys.stderr)
-            return results[:5]
-        # Save HTML for debugging
-        with open("ddg_meesho.html", "w", encoding="utf-8") as f:
-            f.write(resp.text)
-        print("[INFO] Saved DuckDuckGo HTML for Meesho fallback parsing.", file=sys.stderr)
-        soup = BeautifulSoup(resp.text, "html.parser")
-        alt_results = []
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            if href.startswith("https://www.meesho.com/"):
-                title = a.get_text(strip=True)
-                if not title or len(title) < 5:
-                    continue
-                price = extract_price_from_text(title)
-                alt_results.append({
-                    "title": title[:100],
-                    "url": href,
-                    "price": price
-                })
-                if len(alt_results) >= 5:
-                    break
-        alt_results_with_prices = [r for r in alt_results if r['price']]
-        if alt_results_with_prices:
-            return alt_results_with_prices[:5]
-        return alt_results[:5] if alt_results else results[:5]
-        
-    except Exception as e:
-        print(f"[ERROR] Meesho search failed: {e}", file=sys.stderr)
-        return []
+    # Sort by whether they have prices (with prices first)
+    unique_results.sort(key=lambda x: (x.get('price') is None, x.get('platform', '')))
+    
+    return unique_results[:15]  # Return top 15 results
+
+def get_search_executor():
+    global _search_executor
+    if _search_executor is None:
+        _search_executor = ThreadPoolExecutor(max_workers=ALTERNATES_MAX_WORKERS, thread_name_prefix="platform-search")
+    return _search_executor
 
-def search_reliance_digital(query):
+def search_platform_before_deadline(search_func, query, platform_name, deadline, cache_mode=CACHE_USE, cancelled=None):
     """
-    Use DuckDuckGo to search Reliance Digital for the product and return a list of (title, url, price) tuples.
+    Like search_platform_with_retry, but retries the shortened query straight
+    away instead of sleeping, and only while the deadline has not passed and
+    cancelled (a threading.Event) is not set. Searches that are queued when
+    either happens return [] without sending a request.
     """
-    search_url = "https://duckduckgo.com/html/"
-    params = {"q": f"{query} site:reliancedigital.in"}  # No quotes, as per requirement
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-    }
-    
     try:
-        resp = requests.get(search_url, params=params, headers=headers, timeout=15)
-        resp.raise_for_status()
-        
-        links = re.findall(r'<a[^>]+href="(https://www\\.reliancedigital\\.in/[^\"]+)"[^>]*>(.*?)</a>', resp.text, re.DOTALL)
-        results = []
-        
-        for url, title_html in links:
-            url = unquote(url)
-            if 'reliancedigital.in' not in url:
-                continue
-                
-            title = re.sub('<[^<]+?>', '', title_html).strip()
-            if not title or len(title) < 5:
-                continue
-            
-            price = None
-            
-            # Find price in surrounding context
-            link_pos = resp.text.find(url)
-            if link_pos != -1:
-                context_start = max(0, link_pos - 500)
-                context_end = min(len(resp.text), link_pos + 500)
-                context = resp.text[context_start:context_end]
-                price = extract_price_from_text(context)
-            
-            if not price:
-                price = extract_price_from_text(title_html + " " + title)
-            
-            results.append({
-                "title": title[:100],
-                "url": url,
-                "price": price
-            })
-            
-            if len(results) >= 5:
-                break
-        
-        # Prioritize results with prices
-        results_with_prices = [r for r in results if r['price']]
-        if results_with_prices:
-            return results_with_prices[:5]
-        
-        # Fallback: Save HTML and try BeautifulSoup parsing if no results with prices
-        try:
-            from bs4 import BeautifulSoup
-        except ImportError:
-            print("[WARNING] BeautifulSoup not installed, skipping fallback parsing for Reliance Digital.", file=sys.stderr)
-            return results[:5]
-        # Save HTML for debugging
-        with open("ddg_reliance.html", "w", encoding="utf-8") as f:
-            f.write(resp.text)
-        print("[INFO] Saved DuckDuckGo HTML for Reliance Digital fallback parsing.", file=sys.stderr)
-        soup = BeautifulSoup(resp.text, "html.parser")
-        alt_results = []
-        for a in soup.find_all("a", href=True):
-            href = a["href"]
-            if href.startswith("https://www.reliancedigital.in/"):
-                title = a.get_text(strip=True)
-                if not title or len(title) < 5:
-                    continue
-                price = extract_price_from_text(title)
-                alt_results.append({
-                    "title": title[:100],
-                    "url": href,
-                    "price": price
-                })
-                if len(alt_results) >= 5:
-                    break
-        alt_results_with_prices = [r for r in alt_results if r['price']]
-        if alt_results_with_prices:
-            return alt_results_with_prices[:5]
-        return alt_results[:5] if alt_results else results[:5]
-        
+        results = cached_search(search_func, query, platform_name, cache_mode, stop_at=deadline, cancelled=cancelled)
+        if results:
+            return results
+        short_query = " ".join(query.split()[:3])
+        if short_query != query and time.monotonic() < deadline and not (cancelled and cancelled.is_set()):
+            return cached_search(search_func, short_query, platform_name, cache_mode,
+                                 stop_at=deadline, cancelled=cancelled)
     except Exception as e:
-        print(f"[ERROR] Reliance Digital search failed: {e}", file=sys.stderr)
-        return []
+        print(f"[WARNING] {platform_name} search failed: {e}", file=sys.stderr)
+    return []
 
-def get_alternate_platform_prices(title, brand=None, model=None):
+def get_alternate_platform_prices_concurrent(title, brand=None, model=None,
+                                             deadline=ALTERNATES_DEADLINE, min_priced=ALTERNATES_MIN_PRICED,
+                                             cache_mode=CACHE_USE):
     """
-    Use extracted metadata to form search queries and return alternate prices from Flipkart, Meesho, and Reliance Digital.
+    Search every platform in parallel, one query variation at a time: the
+    next variation only goes out while fewer than min_priced priced results
+    are in. Returns once min_priced are in or deadline seconds have passed;
+    searches still queued or waiting for a rate-limit token then give up
+    without sending a request.
     """
-    # Create multiple query variations
-    queries = [title]
+    queries = build_alternate_queries(title, brand, model)
+    stop_at = time.monotonic() + deadline
+    executor = get_search_executor()
+    cancelled = threading.Event()
+    completed = {}
+    priced = 0
+    for query_index, query in enumerate(queries):
+        futures = {}
+        for platform_index, (platform, search_func, platform_name) in enumerate(ALTERNATE_PLATFORMS):
+            # Run in a copy of this context so the searches' timing spans reach the request
+            future = executor.submit(contextvars.copy_context().run, search_platform_before_deadline,
+                                     search_func, query, platform_name, stop_at, cache_mode, cancelled)
+            futures[future] = (query_index, platform_index, platform)
+        pending = set(futures)
+        while pending and priced < min_priced:
+            remaining = stop_at - time.monotonic()
+            if remaining <= 0:
+                print(f"[WARNING] Alternate search deadline reached with {len(pending)} searches outstanding", file=sys.stderr)
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                _, platform_index, platform = futures[future]
+                try:
+                    results = future.result()
+                except Exception as e:
+                    print(f"[WARNING] {platform} search failed: {e}", file=sys.stderr)
+                    results = []
+                for result in results:
+                    result['platform'] = platform
+                completed[(query_index, platform_index)] = results
+                priced += sum(1 for r in results if r.get('price'))
+        if pending or priced >= min_priced:
+            break
+    cancelled.set()
     
-    if brand and model:
-        queries.append(f"{brand} {model}")
-        queries.append(f"{brand} {model} {title}")
-    elif brand:
-        queries.append(f"{brand} {title}")
-    elif model:
-        queries.append(f"{model} {title}")
+    # Keep the sequential ordering: query variation first, then platform
+    all_results = []
+    for key in sorted(completed):
+        all_results.extend(completed[key])
+    return rank_alternate_results(all_results)
+
+def get_alternate_platform_prices(title, brand=None, model=None, concurrent=True, cache_mode=CACHE_USE,
+                                  deadline=ALTERNATES_DEADLINE):
+    """
+    Use extracted metadata to form search queries and return alternate prices from the platforms in platforms.py.
+    Searches run in parallel unless concurrent=False, and then return what is back after deadline seconds.
+    cache_mode is passed to search_cache.cached_search.
+    """
+    if concurrent:
+        return get_alternate_platform_prices_concurrent(title, brand, model, deadline=deadline, cache_mode=cache_mode)
     
     all_results = []
     
-    for query in queries:
-        # Clean up query
-        query = re.sub(r'\s+', ' ', query).strip()
-        
+    for query in build_alternate_queries(title, brand, model):
         print(f"[INFO] Searching with query: {query}", file=sys.stderr)
         
         # Search each platform with retry logic
-        flipkart_results = search_platform_with_retry(search_flipkart, query, "Flipkart")
-        meesho_results = search_platform_with_retry(search_meesho, query, "Meesho")
-        reliance_results = search_platform_with_retry(search_reliance_digital, query, "Reliance Digital")
-        
-        # Add platform info and collect results
-        for result in flipkart_results:
-            result['platform'] = 'flipkart'
-            all_results.append(result)
-        
-        for result in meesho_results:
-            result['platform'] = 'meesho'
-            all_results.append(result)
-        
-        for result in reliance_results:
-            result['platform'] = 'reliance digital'
-            all_results.append(result)
+        for platform, search_func, platform_name in ALTERNATE_PLATFORMS:
+            for result in search_platform_with_retry(search_func, query, platform_name, cache_mode=cache_mode):
+                result['platform'] = platform
+                all_results.append(result)
         
         # If we found results with prices, prioritize them
         results_with_prices = [r for r in all_results if r.get('price')]
         if len(results_with_prices) >= 5:
             break
-        
-        # Brief delay between query variations
-        time.sleep(0.5)
-    
-    # Remove duplicates based on URL
-    seen_urls = set()
-    unique_results = []
-    for result in all_results:
-        if result['url'] not in seen_urls:
-            seen_urls.add(result['url'])
-            unique_results.append(result)
     
-    # Sort by whether they have prices (with prices first)
-    unique_results.sort(key=lambda x: (x.get('price') is None, x.get('platform', '')))
-    
-    return unique_results[:15]  # Return top 15 results
+    return rank_alternate_results(all_results)
 
 # For compatibility with the rest of the codebase
 extract_metadata_with_openai = extract_metadata_with_gemini
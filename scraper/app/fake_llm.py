@@ -0,0 +1,67 @@
+"""
+Local stand-in for google.generativeai.GenerativeModel.
+
+It answers the single-title and batch metadata prompts from
+extract_metadata.py with naive rule-based JSON, so the LLM paths can be
+exercised and benchmarked without an API key. Enable it in the service
+with METADATA_LLM_BACKEND=fake.
+"""
+import hashlib
+import json
+import os
+import re
+import time
+from types import SimpleNamespace
+
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", "0"))
+FAKE_LLM_DROP_RATE = float(os.getenv("FAKE_LLM_DROP_RATE", "0"))
+
+
+def describe_title(title):
+    """
+    Brand is the first word, model the words before the first "(" and
+    attributes the comma separated parts inside the parentheses.
+    """
+    head, _, tail = title.partition("(")
+    words = head.split()
+    attributes = [part.strip() for part in tail.rstrip(")").split(",") if part.strip()]
+    return {
+        "brand": words[0] if words else None,
+        "model": " ".join(words[1:4]) if len(words) > 1 else None,
+        "attributes": attributes,
+    }
+
+
+class FakeGeminiModel:
+    """
+    latency is added to every call. drop_rate is the fraction of batch
+    entries left out of the response; which titles get dropped depends on the
+    title and the call number, so a retry can succeed.
+    """
+
+    calls = 0
+
+    def __init__(self, model_name="fake", latency=FAKE_LLM_LATENCY, drop_rate=FAKE_LLM_DROP_RATE):
+        self.model_name = model_name
+        self.latency = latency
+        self.drop_rate = drop_rate
+
+    def _dropped(self, title):
+        digest = hashlib.sha256(f"{FakeGeminiModel.calls}:{title}".encode("utf-8")).digest()
+        return digest[0] / 255 < self.drop_rate
+
+    def generate_content(self, prompt):
+        FakeGeminiModel.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        if "Titles:" in prompt:
+            items = []
+            for index, title in re.findall(r"^(\d+)\. (.+)$", prompt.split("Titles:", 1)[1], re.MULTILINE):
+                if self._dropped(title):
+                    continue
+                items.append({"index": int(index), **describe_title(title)})
+            text = json.dumps(items)
+        else:
+            title = prompt.split("Title:", 1)[1].strip()
+            text = json.dumps(describe_title(title))
+        return SimpleNamespace(text=f"```json\n{text}\n```")
@@ -0,0 +1,246 @@
+"""
+Tiered product fetching: a pooled plain-HTTP GET first, the browser only when
+that page is blocked or lacks the title or price.
+
+Many product pages render both fields in the server HTML, so the browser is
+skipped for them entirely. Which tier last worked is remembered per URL, so a
+page that needed the browser goes straight to it on later checks until the
+entry expires and the HTTP tier is given another try.
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from captures import capture
+from enrichment import enrich_product
+from http_client import http_get, http_get_async
+from metrics import event, span
+from page_extract import (extract_from_html, extract_price_region, price_fingerprint, price_from_candidates,
+                          price_unchanged, unchanged_result)
+from rate_limit import BLOCKED, FAILED, OK, CircuitOpen, RateLimited, acquire, acquire_async, limiter_key, report
+from search_cache import open_cache
+
+SCRAPE_HTTP_TIER = os.getenv("SCRAPE_HTTP_TIER", "1") == "1"
+FETCH_TIER_TTL = float(os.getenv("FETCH_TIER_TTL", str(6 * 60 * 60)))
+FETCH_TIER_MAX_ENTRIES = int(os.getenv("FETCH_TIER_MAX_ENTRIES", "10000"))
+
+TIER_HTTP = "http"
+TIER_BROWSER = "browser"
+
+_tiers = None
+_tiers_lock = threading.Lock()
+_counters_lock = threading.Lock()
+_counters = {
+    "http_served": 0,
+    "browser_served": 0,
+    "skipped_to_browser": 0,
+    "unchanged": 0,
+    "escalated": {},
+}
+
+
+def get_tier_memory():
+    global _tiers
+    if _tiers is None:
+        with _tiers_lock:
+            if _tiers is None:
+                _tiers = open_cache("memory", None, FETCH_TIER_TTL, FETCH_TIER_MAX_ENTRIES, "fetch_tiers")
+    return _tiers
+
+
+def tier_key(url):
+    """
+    Scheme, host and path only; tracking parameters do not change the page.
+    """
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc.lower()}{parts.path}"
+
+
+def remembered_tier(url):
+    return get_tier_memory().get(tier_key(url))
+
+
+def remember_tier(url, tier):
+    get_tier_memory().set(tier_key(url), tier)
+
+
+def _count(name, reason=None):
+    with _counters_lock:
+        if reason is None:
+            _counters[name] += 1
+        else:
+            _counters[name][reason] = _counters[name].get(reason, 0) + 1
+
+
+def parse_http_page(status_code, html, price_only=False):
+    """
+    Turn a plain-HTTP response into a product dict (without enrichment), or
+    return (None, reason) when the browser tier is needed. price_only parses
+    just the title and price regions and does not need a title.
+    """
+    if status_code != 200:
+        return None, f"status {status_code}"
+    extracted = extract_price_region(html) if price_only else extract_from_html(html)
+    if extracted["blocked"]:
+        return None, "blocked"
+    if not extracted["title"] and not price_only:
+        return None, "no title"
+    price, _ = price_from_candidates(extracted["price_candidates"])
+    if price is None:
+        return None, "no price"
+    return {
+        "title": extracted["title"],
+        "price": price,
+        "image": extracted["image"],
+        "fingerprint": price_fingerprint(extracted["price_candidates"]),
+    }, None
+
+
+def _report_http(domain, status_code, reason):
+    """
+    Feed an HTTP-tier response back to the domain's limiter. A page without
+    a title or price is still a clean response; 429, 503 and block pages are
+    the site pushing back.
+    """
+    if reason == "blocked" or status_code in (429, 503):
+        report(domain, BLOCKED)
+    elif status_code >= 500:
+        report(domain, FAILED)
+    else:
+        report(domain, OK)
+
+
+def _limited(url, e):
+    print(f"[TIER] Skipping the HTTP tier for {url}: {e}", file=sys.stderr)
+    _count("escalated", "circuit open" if isinstance(e, CircuitOpen) else "rate limited")
+
+
+def _escalate(url, reason, html):
+    capture_id = capture("http", html, url=url, reason=reason)
+    print(f"[TIER] Escalating {url} to the browser: {reason} (capture {capture_id})", file=sys.stderr)
+    _count("escalated", reason)
+    if reason == "blocked":
+        event("blocked")
+
+
+def _http_result(product, html, started):
+    return {
+        **product,
+        "page_stats": {
+            "mode": TIER_HTTP,
+            "requests": 1,
+            "blocked": 0,
+            "blocked_by_reason": {},
+            "bytes_loaded": len(html.encode("utf-8")),
+            "fetch_seconds": round(time.perf_counter() - started, 3),
+        },
+    }
+
+
+def scrape_http(url, price_only=False, **_):
+    """
+    Plain-HTTP tier. Returns the same dict as amazon_scraper.scrape_page, or
+    None when the page has to be fetched with the browser. Browser-only
+    options such as lean are accepted and ignored.
+    """
+    domain = limiter_key(url)
+    try:
+        acquire(domain)
+    except (CircuitOpen, RateLimited) as e:
+        _limited(url, e)
+        return None
+    started = time.perf_counter()
+    try:
+        with span("http_fetch"):
+            response = http_get(url)
+    except Exception as e:
+        report(domain, FAILED)
+        print(f"[TIER] HTTP fetch of {url} failed: {e}", file=sys.stderr)
+        _count("escalated", "request error")
+        return None
+    product, reason = parse_http_page(response.status_code, response.text, price_only)
+    _report_http(domain, response.status_code, reason)
+    if product is None:
+        _escalate(url, reason, response.text)
+        return None
+    return _http_result(product, response.text, started)
+
+
+async def scrape_http_async(url, price_only=False, **_):
+    """
+    Async counterpart of scrape_http, on the shared httpx client. Parsing
+    runs in a worker thread.
+    """
+    domain = limiter_key(url)
+    try:
+        await acquire_async(domain)
+    except (CircuitOpen, RateLimited) as e:
+        _limited(url, e)
+        return None
+    started = time.perf_counter()
+    try:
+        with span("http_fetch"):
+            response = await http_get_async(url)
+    except Exception as e:
+        report(domain, FAILED)
+        print(f"[TIER] HTTP fetch of {url} failed: {e}", file=sys.stderr)
+        _count("escalated", "request error")
+        return None
+    product, reason = await asyncio.to_thread(parse_http_page, response.status_code, response.text, price_only)
+    _report_http(domain, response.status_code, reason)
+    if product is None:
+        _escalate(url, reason, response.text)
+        return None
+    return _http_result(product, response.text, started)
+
+
+async def scrape_tiered_async(url, browser_scrape, http_tier=SCRAPE_HTTP_TIER, extract_metadata=False,
+                              get_alternates=False, cache_mode="use", last_price=None, fingerprint=None, **options):
+    """
+    Try the HTTP tier unless this URL is known to need the browser, then fall
+    back to browser_scrape(url, **options), which only does the page-bound
+    stage. The tier that produced the result is recorded for the URL and
+    reported as result["tier"]. Enrichment (see enrichment.py) runs once the
+    page has been fetched and any browser page released.
+
+    With last_price or fingerprint this is a re-check: only the price region
+    is extracted, and when the price has not moved a compact unchanged
+    result is returned without enrichment.
+    """
+    recheck = last_price is not None or bool(fingerprint)
+    if recheck:
+        options["price_only"] = True
+    data = None
+    if http_tier:
+        if remembered_tier(url) == TIER_BROWSER:
+            _count("skipped_to_browser")
+        else:
+            data = await scrape_http_async(url, **options)
+            if data is not None:
+                remember_tier(url, TIER_HTTP)
+                _count("http_served")
+                data = {**data, "tier": TIER_HTTP}
+    if data is None:
+        data = await browser_scrape(url, **options)
+        if not isinstance(data, dict) or "error" in data:
+            return data
+        if http_tier:
+            remember_tier(url, TIER_BROWSER)
+        _count("browser_served")
+        data = {**data, "tier": TIER_BROWSER}
+    if recheck and price_unchanged(data, last_price, fingerprint):
+        _count("unchanged")
+        return {**unchanged_result(data), "tier": data["tier"]}
+    if recheck:
+        data = {**data, "unchanged": False}
+    enrichment = await asyncio.to_thread(enrich_product, data["title"], extract_metadata, get_alternates, cache_mode)
+    return {**data, **enrichment}
+
+
+def stats():
+    with _counters_lock:
+        counters = {**_counters, "escalated": dict(_counters["escalated"])}
+    return {"enabled": SCRAPE_HTTP_TIER, **counters, "memory": get_tier_memory().stats()}
@@ -0,0 +1,137 @@
+import os
+import sys
+import threading
+
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "32"))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "15"))
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    "Accept-Encoding": "gzip, deflate",
+    "Connection": "keep-alive",
+}
+
+_session = None
+_session_lock = threading.Lock()
+_async_client = None
+_counters = {
+    "requests": 0,
+    "async_requests": 0,
+    "async_connections_opened": 0,
+}
+_counters_lock = threading.Lock()
+
+
+def _count(name, amount=1):
+    with _counters_lock:
+        _counters[name] += amount
+
+
+def get_session():
+    """
+    Return the process-wide requests.Session. Connections are kept alive and
+    pooled per host, so repeated searches skip the TCP and TLS handshakes.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # Imported here: processes that only use the async client never load requests
+                import requests
+                from requests.adapters import HTTPAdapter
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE)
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _session = session
+    return _session
+
+
+def http_get(url, timeout=HTTP_TIMEOUT, **kwargs):
+    """
+    GET through the shared session.
+    """
+    _count("requests")
+    return get_session().get(url, timeout=timeout, **kwargs)
+
+
+def get_async_client():
+    """
+    Return the shared httpx.AsyncClient, the asyncio counterpart of get_session().
+    """
+    global _async_client
+    if _async_client is None:
+        try:
+            import httpx
+        except ImportError:
+            print("[ERROR] httpx not installed. Run: pip install httpx", file=sys.stderr)
+            raise
+        _async_client = httpx.AsyncClient(
+            headers=DEFAULT_HEADERS,
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_MAXSIZE,
+                max_keepalive_connections=HTTP_POOL_MAXSIZE,
+            ),
+        )
+    return _async_client
+
+
+async def _trace(event_name, info):
+    if event_name == "connection.connect_tcp.complete":
+        _count("async_connections_opened")
+
+
+async def http_get_async(url, timeout=HTTP_TIMEOUT, **kwargs):
+    """
+    GET through the shared async client.
+    """
+    _count("async_requests")
+    extensions = kwargs.pop("extensions", {})
+    extensions.setdefault("trace", _trace)
+    return await get_async_client().get(url, timeout=timeout, extensions=extensions, **kwargs)
+
+
+async def close_async_client():
+    global _async_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def _sync_connections_opened():
+    if _session is None:
+        return 0
+    opened = 0
+    for adapter in set(_session.adapters.values()):
+        pools = adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+    return opened
+
+
+def stats():
+    """
+    Request and connection counters; reused = requests served on an existing
+    keep-alive connection.
+    """
+    with _counters_lock:
+        counters = dict(_counters)
+    opened = _sync_connections_opened()
+    return {
+        "requests": counters["requests"],
+        "connections_opened": opened,
+        "connections_reused": max(counters["requests"] - opened, 0),
+        "async_requests": counters["async_requests"],
+        "async_connections_opened": counters["async_connections_opened"],
+        "async_connections_reused": max(counters["async_requests"] - counters["async_connections_opened"], 0),
+        "pool_connections": HTTP_POOL_CONNECTIONS,
+        "pool_maxsize": HTTP_POOL_MAXSIZE,
+    }
@@ -1,11 +1,74 @@
+import asyncio
 import subprocess
 import sys
 import json
 import os
-from fastapi import FastAPI, Query
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import List, Optional
+from urllib.parse import urlparse
+from fastapi import FastAPI, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from pydantic import BaseModel, Field
 
-app = FastAPI()
+# The scraper modules import each other by bare name (as scrape_worker.py does),
+# so make this directory importable when served as app.main.
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from startup import load_config
+
+load_config()
+
+from metrics import collect_timings, event, span
+
+SCRAPER_ENGINE = os.getenv("SCRAPER_ENGINE", "async")
+SCRAPE_TIMEOUT = float(os.getenv("SCRAPE_TIMEOUT", "60"))
+DISCONNECT_POLL_INTERVAL = 0.5
+BATCH_MAX_ITEMS = int(os.getenv("SCRAPE_BATCH_MAX_ITEMS", "500"))
+BATCH_DOMAIN_LIMIT = int(os.getenv("SCRAPE_BATCH_DOMAIN_LIMIT", "4"))
+RECHECK_MAX_PRODUCTS = int(os.getenv("RECHECK_MAX_PRODUCTS", "100000"))
+# Serve subprocess-engine scrapes from a pre-forked template (see worker_template.py)
+SCRAPER_PREFORK = os.getenv("SCRAPER_PREFORK", "0") == "1"
+SCRAPE_WORKER_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scrape_worker.py")
+
+browser_pool = None
+async_pool = None
+worker_template = None
+
+@asynccontextmanager
+async def lifespan(app):
+    global browser_pool, async_pool, worker_template
+    if SCRAPER_ENGINE == "async":
+        from browser_pool import AsyncBrowserPool
+        async_pool = AsyncBrowserPool()
+        await async_pool.start()
+    elif SCRAPER_ENGINE == "pool":
+        from browser_pool import BrowserPool
+        browser_pool = BrowserPool()
+        browser_pool.start()
+    elif SCRAPER_PREFORK and hasattr(os, "fork"):
+        from worker_template import WorkerTemplate
+        worker_template = WorkerTemplate()
+        try:
+            await asyncio.to_thread(worker_template.start)
+        except RuntimeError as e:
+            print(f"[WARNING] {e}; scrapes will start scrape_worker.py per request", file=sys.stderr)
+            worker_template = None
+    yield
+    if async_pool:
+        await async_pool.close()
+        async_pool = None
+    if browser_pool:
+        await asyncio.to_thread(browser_pool.close)
+        browser_pool = None
+    if worker_template:
+        await asyncio.to_thread(worker_template.close)
+        worker_template = None
+    from http_client import close_async_client
+    await close_async_client()
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,28 +77,402 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-@app.get("/scrape")
-async def scrape(url: str = Query(..., description="Amazon product/search URL"),
-                extract_metadata: bool = Query(False),
-                get_alternates: bool = Query(False)):
-    script_path = os.path.abspath("app/scrape_worker.py")
-    print("[DEBUG] Running:", sys.executable, script_path, url)
-    print("[DEBUG] File exists:", os.path.exists(script_path))
-  
-    args = [sys.executable, script_path, url]
+def run_scrape_subprocess(url, extract_metadata=False, get_alternates=False, cache_mode="use", lean=None,
+                          price_only=False, last_price=None, fingerprint=None):
+    args = [url]
     if extract_metadata:
         args.append("--extract-metadata")
     if get_alternates:
         args.append("--get-alternates")
+    if cache_mode != "use":
+        args.append(f"--{cache_mode}-cache")
+    if lean is not None:
+        args.append("--lean" if lean else "--full")
+    if price_only:
+        args.append("--price-only")
+    if last_price is not None:
+        args += ["--last-price", str(last_price)]
+    if fingerprint:
+        args += ["--fingerprint", fingerprint]
+    if worker_template is not None:
+        try:
+            return worker_template.run(args)
+        except (OSError, ValueError, RuntimeError) as e:
+            print(f"[WARNING] Worker template failed, starting scrape_worker.py: {e}", file=sys.stderr)
+    args = [sys.executable, SCRAPE_WORKER_PATH] + args
     print("[DEBUG] Running:", " ".join(args))
     result = subprocess.run(
         args,
         capture_output=True,
         text=True
     )
-    print("[SCRAPER STDERR]", result.stderr)
+    print("[SCRAPER STDERR]", result.stderr, file=sys.stderr)
     try:
         data = json.loads(result.stdout)
     except Exception:
-        data = {"error": "Failed to parse scraper output", "raw": result.stdout}
-    return {"results": data, "stderr": result.stderr, "returncode": result.returncode}
\ No newline at end of file
+        data = {"error": "Failed to parse scraper output"}
+    return {"results": data, "returncode": result.returncode}
+
+async def run_until_disconnected(request, coro, timeout):
+    """
+    Await coro with a deadline, cancelling it if the client goes away first.
+    Returns None when the client disconnected.
+    """
+    task = asyncio.ensure_future(asyncio.wait_for(coro, timeout))
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_INTERVAL)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                print("[INFO] Client disconnected, cancelling scrape", file=sys.stderr)
+                task.cancel()
+                return None
+    finally:
+        if not task.done():
+            task.cancel()
+
+def cache_mode_for(bypass_cache, refresh_cache):
+    if bypass_cache:
+        return "bypass"
+    if refresh_cache:
+        return "refresh"
+    return "use"
+
+async def acquire_page_token(url):
+    """
+    Take the domain's rate-limit token for a browser scrape of url. Returns
+    None once it is granted, or the error dict to answer with while the
+    domain's circuit breaker is open or no token comes within
+    RATE_LIMIT_MAX_WAIT.
+    """
+    from rate_limit import CircuitOpen, RateLimited, acquire_async, limiter_key
+    try:
+        await acquire_async(limiter_key(url))
+    except (CircuitOpen, RateLimited) as e:
+        event("circuit_open" if isinstance(e, CircuitOpen) else "rate_limited")
+        print(f"[LIMIT] Not fetching {url}: {e}", file=sys.stderr)
+        return {"error": str(e)}
+    return None
+
+async def scrape_with_browser(url, **options):
+    """
+    Run the page-bound stage of a scrape (title, price, image) on whichever
+    engine is configured and return its result dict; enrichment happens in
+    fetch_tiers.scrape_tiered_async after the page is released. Raises
+    PoolExhausted when the pool cannot take more work.
+    The domain's rate-limit token is taken before a browser page is leased,
+    so a page never sits idle waiting for one.
+    """
+    limited = await acquire_page_token(url)
+    if limited is not None:
+        return limited
+    if async_pool is not None:
+        return await async_pool.scrape(url, **options)
+    if browser_pool is not None:
+        future = browser_pool.scrape(url, **options)
+        return await asyncio.wrap_future(future)
+    result = await asyncio.to_thread(run_scrape_subprocess, url, **options)
+    # The worker reported to its own limiter, which exited with it
+    from page_extract import result_outcome
+    from rate_limit import limiter_key, report
+    outcome = result_outcome(result["results"])
+    if outcome is not None:
+        report(limiter_key(url), outcome)
+    return result["results"]
+
+async def scrape_with_engine(url, http_tier=None, **options):
+    """
+    Fetch a product over plain HTTP when possible and on the configured
+    browser engine otherwise (see fetch_tiers.py). Concurrent scrapes of the
+    same product with the same options share one run (see coalesce.py).
+    """
+    from coalesce import coalesced, scrape_key
+    from fetch_tiers import SCRAPE_HTTP_TIER, scrape_tiered_async
+    if http_tier is None:
+        http_tier = SCRAPE_HTTP_TIER
+    return await coalesced(
+        scrape_key(url, {**options, "http_tier": http_tier}),
+        lambda: scrape_tiered_async(url, scrape_with_browser, http_tier=http_tier, **options),
+        use_fresh=options["cache_mode"] == "use",
+    )
+
+@app.get("/scrape")
+async def scrape(request: Request,
+                url: str = Query(..., description="Amazon product/search URL"),
+                extract_metadata: bool = Query(False),
+                get_alternates: bool = Query(False),
+                timeout: float = Query(SCRAPE_TIMEOUT, gt=0, description="Seconds before the scrape is abandoned"),
+                bypass_cache: bool = Query(False, description="Skip the alternate-price search cache"),
+                refresh_cache: bool = Query(False, description="Re-run cached alternate-price searches and store the result"),
+                lean: Optional[bool] = Query(None, description="Block images, fonts, media and third-party requests; defaults to SCRAPE_LEAN_DEFAULT"),
+                http_tier: Optional[bool] = Query(None, description="Try a plain HTTP fetch before the browser; defaults to SCRAPE_HTTP_TIER"),
+                last_price: Optional[float] = Query(None, description="Re-check: the last known price"),
+                fingerprint: Optional[str] = Query(None, description="Re-check: the fingerprint returned by the last scrape"),
+                timing: bool = Query(False, description="Include per-stage timings in the response")):
+    from browser_pool import PoolExhausted
+
+    options = {
+        "extract_metadata": extract_metadata,
+        "get_alternates": get_alternates,
+        "cache_mode": cache_mode_for(bypass_cache, refresh_cache),
+    }
+    if lean is not None:
+        options["lean"] = lean
+    if last_price is not None:
+        options["last_price"] = last_price
+    if fingerprint:
+        options["fingerprint"] = fingerprint
+    with collect_timings() as timings:
+        try:
+            with span("scrape"):
+                data = await run_until_disconnected(
+                    request, scrape_with_engine(url, http_tier=http_tier, **options), timeout
+                )
+        except PoolExhausted as e:
+            event("pool_rejected")
+            return JSONResponse(status_code=503, content={"results": {"error": str(e)}})
+        except asyncio.TimeoutError:
+            event("timeout")
+            print(f"[ERROR] Scrape of {url} timed out after {timeout}s", file=sys.stderr)
+            data = {"error": f"Scrape timed out after {timeout}s"}
+        except Exception as e:
+            data = {"error": str(e)}
+    if data is None:
+        event("client_disconnected")
+        data = {"error": "Client disconnected"}
+    if timing:
+        return {"results": data, "timings": timings}
+    return {"results": data}
+
+class BatchItem(BaseModel):
+    url: str
+    extract_metadata: bool = False
+    get_alternates: bool = False
+    bypass_cache: bool = False
+    refresh_cache: bool = False
+    lean: Optional[bool] = None
+    http_tier: Optional[bool] = None
+    last_price: Optional[float] = None
+    fingerprint: Optional[str] = None
+
+    def scrape_options(self):
+        options = {
+            "extract_metadata": self.extract_metadata,
+            "get_alternates": self.get_alternates,
+            "cache_mode": cache_mode_for(self.bypass_cache, self.refresh_cache),
+        }
+        if self.lean is not None:
+            options["lean"] = self.lean
+        if self.http_tier is not None:
+            options["http_tier"] = self.http_tier
+        if self.last_price is not None:
+            options["last_price"] = self.last_price
+        if self.fingerprint:
+            options["fingerprint"] = self.fingerprint
+        return options
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+    per_domain_limit: int = Field(BATCH_DOMAIN_LIMIT, ge=1, le=64)
+    timeout: float = Field(SCRAPE_TIMEOUT, gt=0, description="Seconds before a single item is abandoned")
+
+def domain_of(url):
+    host = urlparse(url).netloc.lower()
+    return host[4:] if host.startswith("www.") else host
+
+@app.post("/scrape/batch")
+async def scrape_batch(batch: BatchRequest):
+    """
+    Scrape many URLs concurrently, at most per_domain_limit at a time per
+    domain, and stream one NDJSON line per item as soon as it finishes.
+    """
+    from browser_pool import PoolExhausted
+
+    limits = {}
+
+    async def run_item(index, item):
+        limit = limits.setdefault(domain_of(item.url), asyncio.Semaphore(batch.per_domain_limit))
+        async with limit:
+            try:
+                data = await asyncio.wait_for(
+                    scrape_with_engine(item.url, **item.scrape_options()),
+                    batch.timeout,
+                )
+            except PoolExhausted as e:
+                event("pool_rejected")
+                data = {"error": str(e)}
+            except asyncio.TimeoutError:
+                event("timeout")
+                print(f"[ERROR] Scrape of {item.url} timed out after {batch.timeout}s", file=sys.stderr)
+                data = {"error": f"Scrape timed out after {batch.timeout}s"}
+            except Exception as e:
+                data = {"error": str(e)}
+        return {"index": index, "url": item.url, "results": data}
+
+    async def stream():
+        tasks = [asyncio.ensure_future(run_item(index, item)) for index, item in enumerate(batch.items)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield json.dumps(await next_done) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+class PricePoint(BaseModel):
+    price: float
+    checked_at: datetime
+
+class RecheckProduct(BaseModel):
+    url: str
+    target_price: Optional[float] = None
+    history: List[PricePoint] = []
+    last_checked_at: Optional[datetime] = Field(None, description="Latest check, including re-checks that found the price unchanged")
+
+class RecheckRequest(BaseModel):
+    products: List[RecheckProduct] = Field(..., min_length=1, max_length=RECHECK_MAX_PRODUCTS)
+    budget_per_hour: int = Field(..., ge=0, description="Scrapes available for this hour")
+    now: Optional[datetime] = Field(None, description="Plan as of this time instead of the current time")
+
+def epoch_seconds(moment):
+    # price_history.checked_at is a TIMESTAMP without time zone, written in UTC
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+@app.post("/schedule/due")
+async def schedule_due(batch: RecheckRequest):
+    """
+    Which tracked products to re-scrape this hour, given their price_history
+    and the hour's scrape budget, most volatile and closest to their target
+    price first (see recheck.py).
+    """
+    from recheck import plan_rechecks
+    products = [
+        {
+            "url": product.url,
+            "target_price": product.target_price,
+            "history": [(epoch_seconds(point.checked_at), point.price) for point in product.history],
+            "last_checked": epoch_seconds(product.last_checked_at) if product.last_checked_at else None,
+        }
+        for product in batch.products
+    ]
+    now = epoch_seconds(batch.now) if batch.now else None
+    due, scores = await asyncio.to_thread(plan_rechecks, products, batch.budget_per_hour, now)
+    return {
+        "due": due,
+        "considered": len(products),
+        "eligible": int(scores["due"].sum()),
+        "budget_per_hour": batch.budget_per_hour,
+    }
+
+class MetadataBatchRequest(BaseModel):
+    titles: List[str] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
+
+@app.post("/metadata/batch")
+async def metadata_batch(batch: MetadataBatchRequest):
+    """
+    Extract brand/model/attributes for many titles with batched LLM prompts.
+    """
+    from extract_metadata import extract_metadata_batch
+    metadata = await asyncio.to_thread(extract_metadata_batch, batch.titles)
+    return {"results": [{"title": title, "metadata": item} for title, item in zip(batch.titles, metadata)]}
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Stage timings, event and selector counters, and pool and rate limiter
+    stats as gauges, in the Prometheus text format.
+    """
+    from metrics import render
+    from rate_limit import stats as limit_stats
+    gauges = {}
+    pool = async_pool or browser_pool
+    if pool is not None:
+        for name, value in pool.stats().items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges[f"scraper_pool_{name}"] = value
+    limits = limit_stats()["domains"]
+    if limits:
+        gauges["scraper_limiter_waiting"] = {(("domain", d),): s["waiting"] for d, s in limits.items()}
+        gauges["scraper_limiter_rate"] = {(("domain", d),): s["rate"] for d, s in limits.items()}
+        gauges["scraper_limiter_open"] = {(("domain", d),): int(s["state"] != "closed") for d, s in limits.items()}
+    return PlainTextResponse(render(gauges), media_type="text/plain; version=0.0.4")
+
+@app.get("/limits/stats")
+async def limits_stats():
+    from rate_limit import stats
+    return stats()
+
+@app.post("/limits/share")
+async def limits_share(share: float = Query(..., gt=0, le=1, description="Share of each domain's rate and burst")):
+    """
+    Set this process's share of the per-domain limits; the supervisor calls
+    this when it changes the worker count.
+    """
+    from rate_limit import set_share, stats
+    set_share(share)
+    return stats()
+
+@app.get("/pool/stats")
+async def pool_stats():
+    pool = async_pool or browser_pool
+    if pool is None:
+        if worker_template is not None:
+            return {"engine": SCRAPER_ENGINE, "worker_template": worker_template.stats()}
+        return {"engine": SCRAPER_ENGINE}
+    return {"engine": SCRAPER_ENGINE, **pool.stats()}
+
+@app.get("/http/stats")
+async def http_stats():
+    from http_client import stats
+    return stats()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    from search_cache import stats
+    from extract_metadata import get_metadata_cache
+    metadata_cache = get_metadata_cache()
+    return {
+        "search": stats(),
+        "metadata": metadata_cache.stats() if metadata_cache else {"backend": "off"},
+    }
+
+@app.get("/coalesce/stats")
+async def coalesce_stats():
+    from coalesce import stats
+    return stats()
+
+@app.get("/tier/stats")
+async def tier_stats():
+    from fetch_tiers import stats
+    return stats()
+
+@app.get("/captures")
+async def captures_list(kind: Optional[str] = Query(None, description="product, http or search"),
+                        limit: int = Query(100, ge=1, le=1000)):
+    from captures import list_captures, stats
+    # Both wait for the capture index to be loaded, so keep them off the loop
+    return {"stats": await asyncio.to_thread(stats), "captures": await asyncio.to_thread(list_captures, kind, limit)}
+
+@app.get("/captures/{capture_id}")
+async def capture_detail(capture_id: str):
+    from captures import read_capture
+    found = await asyncio.to_thread(read_capture, capture_id)
+    if found is None:
+        return JSONResponse(status_code=404, content={"error": "Capture not found"})
+    meta, content = found
+    # Captured pages are untrusted third-party HTML: serve them as text so a
+    # browser never renders or runs them under this origin
+    return PlainTextResponse(content, headers={
+        "X-Capture-Kind": meta["kind"],
+        "Content-Security-Policy": "sandbox",
+        "X-Content-Type-Options": "nosniff",
+    })
+
+@app.get("/page/stats")
+async def page_stats():
+    from page_modes import stats
+    return stats()
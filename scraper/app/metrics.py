@@ -0,0 +1,151 @@
+"""
+Timing spans and counters for the scraper, rendered in the Prometheus text
+format by /metrics.
+
+span("navigation") times a block into the scraper_stage_seconds histogram.
+Inside collect_timings() the same spans are also gathered for the current
+request; the collector lives in a context variable, so it follows the
+request into asyncio tasks and asyncio.to_thread workers.
+"""
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+COUNTER_HELP = {
+    "scraper_events_total": "Blocks, timeouts and other notable scrape outcomes",
+    "scraper_price_selector_checks_total": "Product pages whose price selectors were checked",
+    "scraper_price_selector_hits_total": "Pages where a price selector matched non-empty text",
+    "scraper_price_selector_used_total": "Pages whose price came from a selector",
+}
+
+
+def _key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def observe(stage, seconds, **labels):
+    labels = {"stage": stage, **labels}
+    key = _key(labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(STAGE_BUCKETS), "sum": 0.0, "count": 0}
+        for index, bound in enumerate(STAGE_BUCKETS):
+            if seconds <= bound:
+                histogram["buckets"][index] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+    timings = _request_timings.get()
+    if timings is not None:
+        name = stage if not labels.get("platform") else f"{stage}:{labels['platform']}"
+        timings.append((name, seconds))
+
+
+@contextmanager
+def span(stage, **labels):
+    """
+    Time the enclosed block as one observation of stage, also when it raises.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started, **labels)
+
+
+def inc(name, amount=1, **labels):
+    key = (name, _key(labels))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def event(name):
+    inc("scraper_events_total", event=name)
+
+
+def record_price_selectors(candidates, used):
+    """
+    Count, per price selector, how often it matched and how often its text
+    became the price.
+    """
+    inc("scraper_price_selector_checks_total")
+    for candidate in candidates:
+        if candidate["text"]:
+            inc("scraper_price_selector_hits_total", selector=candidate["selector"])
+    if used:
+        inc("scraper_price_selector_used_total", selector=used)
+
+
+@contextmanager
+def collect_timings():
+    """
+    Gather the spans recorded while the block runs. Yields a dict that is
+    filled with {stage: total seconds} when the block exits.
+    """
+    timings = []
+    summary = {}
+    token = _request_timings.set(timings)
+    try:
+        yield summary
+    finally:
+        _request_timings.reset(token)
+        for name, seconds in timings:
+            summary[name] = round(summary.get(name, 0.0) + seconds, 4)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(pairs, extra=None):
+    pairs = list(pairs) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render(gauges=None):
+    """
+    All metrics in the Prometheus text exposition format. gauges is an
+    optional {name: value} of point-in-time values to append, where value
+    may also be {((label, value), ...): value} for a labelled gauge.
+    """
+    with _lock:
+        histograms = {key: {**h, "buckets": list(h["buckets"])} for key, h in _histograms.items()}
+        counters = dict(_counters)
+
+    lines = [
+        "# HELP scraper_stage_seconds Time spent in each scrape stage",
+        "# TYPE scraper_stage_seconds histogram",
+    ]
+    for key, histogram in sorted(histograms.items()):
+        for bound, count in zip(STAGE_BUCKETS, histogram["buckets"]):
+            lines.append(f"scraper_stage_seconds_bucket{_labels(key, ('le', bound))} {count}")
+        lines.append(f"scraper_stage_seconds_bucket{_labels(key, ('le', '+Inf'))} {histogram['count']}")
+        lines.append(f"scraper_stage_seconds_sum{_labels(key)} {histogram['sum']:.6f}")
+        lines.append(f"scraper_stage_seconds_count{_labels(key)} {histogram['count']}")
+
+    for name in sorted({name for name, _ in counters}):
+        lines.append(f"# HELP {name} {COUNTER_HELP.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for (counter_name, key), value in sorted(counters.items()):
+            if counter_name == name:
+                lines.append(f"{name}{_labels(key)} {value}")
+
+    for name, value in sorted((gauges or {}).items()):
+        lines.append(f"# TYPE {name} gauge")
+        if isinstance(value, dict):
+            # {label tuple: value} for a labelled gauge
+            for key, labelled in sorted(value.items()):
+                lines.append(f"{name}{_labels(key)} {labelled}")
+        else:
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,379 @@
+"""
+Single-pass extraction of the fields we read from an Amazon product page.
+
+In the browser, EXTRACT_SCRIPT collects the title, every price selector's
+text, the landing image and the block markers in one page.evaluate() round
+trip. Offline, extract_from_html() produces the same dict from saved HTML in
+one parse, so extraction can be checked and benchmarked without a browser.
+
+Re-checks of a tracked product only need the price. extract_price_region()
+parses just the slices of the HTML around the title and the price block,
+and price_fingerprint() hashes the price node the price is read from, so an
+unchanged page can be recognised without comparing anything else.
+
+The sync and async browser scrapers only differ in how they navigate and
+evaluate; what they do with the extracted dict (reporting the outcome to
+the rate limiter, capturing failures, building the result) is
+navigation_failed(), check_blocked() and page_result() here.
+"""
+import hashlib
+import re
+import sys
+from html.parser import HTMLParser
+
+from captures import capture
+from metrics import event, record_price_selectors
+from rate_limit import BLOCKED, FAILED, OK, report
+
+PRICE_SELECTORS = [
+    "span.a-price span.a-offscreen",
+    "span#priceblock_ourprice",
+    "span#priceblock_dealprice",
+    "span#priceblock_saleprice",
+    "span.apexPriceToPay span.a-offscreen",
+    "span.a-price-whole"
+]
+
+BLOCK_MARKERS = [
+    "Enter the characters you see below",
+    "not a robot",
+    "Sorry, we just need to make sure you're not a robot",
+]
+
+SNIPPET_LENGTH = 5000
+
+# Elements that open the price block; a price-only parse starts at the first
+PRICE_REGION_MARKERS = (
+    'id="corePriceDisplay_desktop_feature_div"',
+    'id="corePrice_feature_div"',
+    'id="apex_desktop"',
+    'id="priceblock_',
+    'class="a-price',
+)
+TITLE_REGION_MARKERS = ('id="productTitle"',)
+PRICE_REGION_CHARS = 20000
+TITLE_REGION_CHARS = 2000
+
+EXTRACT_SCRIPT = """
+([selectors, markers, snippetLength, priceOnly]) => {
+    const text = (el) => el ? (el.innerText || el.textContent || '').trim() : null;
+    const title = document.querySelector('#productTitle');
+    const image = document.querySelector('#landingImage');
+    const candidates = selectors.map((selector) => ({
+        selector: selector,
+        text: text(document.querySelector(selector)),
+    }));
+    const found = candidates.some((c) => c.text);
+    // A page with a price is not a block page; skip serializing it on re-checks
+    const html = priceOnly && found ? '' : (document.documentElement ? document.documentElement.outerHTML : '');
+    const blocked = markers.some((m) => html.includes(m)) || html.toLowerCase().includes('captcha');
+    return {
+        blocked: blocked,
+        title: text(title),
+        image: image ? image.getAttribute('src') : null,
+        price_candidates: candidates,
+        snippet: found ? null : html.slice(0, snippetLength),
+    };
+}
+"""
+
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "param", "source", "track", "wbr",
+}
+
+
+def clean_price(price_str):
+    price_str = price_str.replace('₹', '').replace(',', '').strip()
+    try:
+        return float(re.findall(r"[\d.]+", price_str)[0])
+    except Exception as e:
+        print(f"[ERROR] Failed to clean price: {e} | Raw: {price_str}", file=sys.stderr)
+        return None
+
+
+def script_args(price_only=False):
+    return [PRICE_SELECTORS, BLOCK_MARKERS, SNIPPET_LENGTH, price_only]
+
+
+def is_blocked(html):
+    return any(marker in html for marker in BLOCK_MARKERS) or "captcha" in html.lower()
+
+
+def _parse_selector(selector):
+    """
+    "span.a-price span.a-offscreen" -> [("span", None, {"a-price"}), ("span", None, {"a-offscreen"})]
+    Only tag, #id and .class compounds joined by descendant combinators are
+    supported, which covers PRICE_SELECTORS.
+    """
+    parts = []
+    for compound in selector.split():
+        tag, element_id, classes = "", None, set()
+        token, kind = "", "tag"
+        for ch in compound + "\0":
+            if ch in ".#\0":
+                if kind == "tag":
+                    tag = token
+                elif kind == "id":
+                    element_id = token
+                elif token:
+                    classes.add(token)
+                token, kind = "", {".": "class", "#": "id"}.get(ch, kind)
+            else:
+                token += ch
+        parts.append((tag.lower() or None, element_id, classes))
+    return parts
+
+
+def _matches(part, element):
+    tag, element_id, classes = part
+    return ((tag is None or element[0] == tag)
+            and (element_id is None or element[1] == element_id)
+            and classes <= element[2])
+
+
+class _ProductParser(HTMLParser):
+    def __init__(self, selectors):
+        super().__init__(convert_charrefs=True)
+        self.selectors = [(selector, _parse_selector(selector)) for selector in selectors]
+        self.stack = []
+        self.capturing = []
+        self.texts = {}
+        self.title = None
+        self.image = None
+
+    def _selector_hit(self, parts):
+        # The element just pushed must match the last compound, and the
+        # earlier compounds must match ancestors in order.
+        if not _matches(parts[-1], self.stack[-1]):
+            return False
+        remaining = len(parts) - 2
+        for element in reversed(self.stack[:-1]):
+            if remaining < 0:
+                break
+            if _matches(parts[remaining], element):
+                remaining -= 1
+        return remaining < 0
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        element = (tag, attrs.get("id"), set((attrs.get("class") or "").split()))
+        if element[1] == "landingImage" and self.image is None:
+            self.image = attrs.get("src")
+        if tag in VOID_TAGS:
+            return
+        self.stack.append(element)
+        depth = len(self.stack)
+        if element[1] == "productTitle" and self.title is None:
+            self.capturing.append(["title", depth, []])
+        for selector, parts in self.selectors:
+            if selector not in self.texts and self._selector_hit(parts):
+                self.texts[selector] = None
+                self.capturing.append([selector, depth, []])
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                del self.stack[index:]
+                break
+        else:
+            return
+        depth = len(self.stack)
+        while self.capturing and self.capturing[-1][1] > depth:
+            key, _, chunks = self.capturing.pop()
+            value = " ".join("".join(chunks).split())
+            if key == "title":
+                self.title = value
+            else:
+                self.texts[key] = value
+
+    def handle_data(self, data):
+        for capture in self.capturing:
+            capture[2].append(data)
+
+
+def extract_from_html(html, selectors=PRICE_SELECTORS):
+    """
+    Offline equivalent of evaluating EXTRACT_SCRIPT on a loaded page.
+    """
+    parser = _ProductParser(selectors)
+    parser.feed(html)
+    parser.close()
+    candidates = [{"selector": selector, "text": parser.texts.get(selector) or None} for selector in selectors]
+    found = any(candidate["text"] for candidate in candidates)
+    return {
+        "blocked": is_blocked(html),
+        "title": parser.title or None,
+        "image": parser.image,
+        "price_candidates": candidates,
+        "snippet": None if found else html[:SNIPPET_LENGTH],
+    }
+
+
+def _region(html, markers, length):
+    positions = [position for position in (html.find(marker) for marker in markers) if position >= 0]
+    if not positions:
+        return ""
+    start = html.rfind("<", 0, min(positions))
+    return html[start:start + length]
+
+
+def extract_price_region(html, selectors=PRICE_SELECTORS):
+    """
+    extract_from_html for re-checks: parses only the title and price block
+    slices, and falls back to the whole page when the slice has no price.
+    The image is not read.
+    """
+    empty = [{"selector": selector, "text": None} for selector in selectors]
+    if is_blocked(html):
+        return {"blocked": True, "title": None, "image": None, "price_candidates": empty,
+                "snippet": html[:SNIPPET_LENGTH]}
+    price_region = _region(html, PRICE_REGION_MARKERS, PRICE_REGION_CHARS)
+    parser = _ProductParser(selectors)
+    parser.feed(_region(html, TITLE_REGION_MARKERS, TITLE_REGION_CHARS))
+    parser.close()
+    title = parser.title
+    if not price_region:
+        # No price block at all, so a full parse would not find one either
+        return {"blocked": False, "title": title or None, "image": None, "price_candidates": empty,
+                "snippet": html[:SNIPPET_LENGTH]}
+    parser = _ProductParser(selectors)
+    parser.feed(price_region)
+    parser.close()
+    candidates = [{"selector": selector, "text": parser.texts.get(selector) or None} for selector in selectors]
+    if not any(candidate["text"] for candidate in candidates):
+        return extract_from_html(html, selectors)
+    return {
+        "blocked": False,
+        "title": title or None,
+        "image": None,
+        "price_candidates": candidates,
+        "snippet": None,
+    }
+
+
+def price_fingerprint(candidates):
+    """
+    Short hash of the price node the price is read from (the first
+    candidate that parses, as in price_from_candidates): its selector and
+    text. Only that node is hashed so the browser, the full-page parse and
+    the price-region parse of the same page agree, whatever else each of
+    them can see.
+    """
+    node = ""
+    for c in candidates:
+        if c["text"] and clean_price(c["text"]) is not None:
+            node = f"{c['selector']}={' '.join(c['text'].split())}"
+            break
+    return hashlib.sha256(node.encode("utf-8")).hexdigest()[:16]
+
+
+def price_unchanged(result, last_price=None, fingerprint=None):
+    """
+    Whether a re-check result matches what the caller already has: the same
+    fingerprint when one was given, otherwise the same price.
+    """
+    if result.get("price") is None:
+        return False
+    if fingerprint:
+        return result.get("fingerprint") == fingerprint
+    return result["price"] == last_price
+
+
+def unchanged_result(result):
+    """
+    The compact re-check response for a price that did not move.
+    """
+    return {"unchanged": True, "price": result["price"], "fingerprint": result["fingerprint"]}
+
+
+def price_from_candidates(candidates):
+    """
+    First candidate, in PRICE_SELECTORS order, whose text parses as a price.
+    Returns (price, selector) or (None, None). Selector hits are counted in
+    metrics.py.
+    """
+    for candidate in candidates:
+        if candidate["text"]:
+            price = clean_price(candidate["text"])
+            if price is not None:
+                record_price_selectors(candidates, candidate["selector"])
+                return price, candidate["selector"]
+    record_price_selectors(candidates, None)
+    return None, None
+
+
+BLOCKED_ERROR = "CAPTCHA or block detected"
+# Errors of pages that never loaded or never rendered the product
+FAILED_ERROR_PREFIXES = ("Failed to navigate", "Timeout waiting")
+
+
+def result_outcome(result):
+    """
+    The limiter outcome (OK, BLOCKED or FAILED) a browser-stage result
+    stands for, or None for errors that say nothing about the site. For
+    results produced in another process (the subprocess and prefork
+    engines), whose own limiter is thrown away when it exits.
+    """
+    error = result.get("error") if isinstance(result, dict) else None
+    if not error:
+        return OK
+    if error == BLOCKED_ERROR:
+        return BLOCKED
+    if error.startswith(FAILED_ERROR_PREFIXES):
+        return FAILED
+    return None
+
+
+def navigation_failed(domain, url, error):
+    """
+    Record a failed navigation or evaluate and return the error result.
+    """
+    report(domain, FAILED)
+    event("navigation_error")
+    print(f"[ERROR] Failed to navigate to {url}: {error}", file=sys.stderr)
+    return {"error": f"Failed to navigate: {error}"}
+
+
+def check_blocked(domain, url, final_url, extracted):
+    """
+    Report a loaded page's outcome to the domain's limiter. Returns the
+    error result when the page is a CAPTCHA or block page, otherwise None.
+    """
+    if final_url != url:
+        print(f"[REDIRECT] Navigated from {url} to {final_url}", file=sys.stderr)
+    if extracted["blocked"]:
+        report(domain, BLOCKED)
+        event("blocked")
+        capture_id = capture("product", extracted["snippet"], url=final_url, reason="blocked")
+        print(f"[BLOCKED] CAPTCHA or block detected on {final_url} (capture {capture_id})", file=sys.stderr)
+        return {"error": BLOCKED_ERROR}
+    report(domain, OK)
+    return None
+
+
+def page_result(url, extracted, traffic):
+    """
+    The page-bound scrape result (title, price, image, fingerprint and
+    page_stats) from EXTRACT_SCRIPT's dict. Pages without a price are
+    captured; a missing title is an error.
+    """
+    title = extracted["title"]
+    price, _ = price_from_candidates(extracted["price_candidates"])
+    if price is None:
+        event("no_price")
+        capture_id = capture("product", extracted["snippet"], url=url, reason="no price")
+        print(f"[ERROR] Could not find price on {url} (capture {capture_id})", file=sys.stderr)
+    if not title:
+        return {"error": "Product title not found"}
+    return {
+        "title": title,
+        "price": price,
+        "image": extracted["image"],
+        "fingerprint": price_fingerprint(extracted["price_candidates"]),
+        "page_stats": traffic.report()
+    }
@@ -0,0 +1,224 @@
+"""
+Lean page mode for product fetches.
+
+We only read the title, a few price nodes and the landing image's src, so in
+lean mode images, media, fonts, ads and third-party requests are aborted
+through request routing and navigation waits for domcontentloaded instead of
+the full load event. Every page reports its request counts and bytes loaded,
+from Playwright's request sizes (headers and body as transferred, so chunked
+and compressed responses count too). The bytes a lean page saved are
+estimated from what its aborted requests would have cost: the running
+average transfer size of finished requests of the same resource type, or
+TYPICAL_REQUEST_BYTES until enough have been seen.
+"""
+import os
+import re
+import threading
+from urllib.parse import urlparse
+
+SCRAPE_LEAN_DEFAULT = os.getenv("SCRAPE_LEAN_DEFAULT", "1") == "1"
+
+# Browser context settings, shared by the sync and async engines
+CONTEXT_OPTIONS = {
+    "user_agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36",
+    "locale": "en-US",
+    "extra_http_headers": {
+        "accept-language": "en-US,en;q=0.9",
+        "accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+        "sec-fetch-site": "none",
+        "sec-fetch-mode": "navigate",
+        "sec-fetch-user": "?1",
+        "sec-fetch-dest": "document",
+    }
+}
+
+BLOCKED_RESOURCE_TYPES = {"image", "media", "font"}
+BLOCKED_DOMAINS = (
+    "amazon-adsystem.com",
+    "doubleclick.net",
+    "googlesyndication.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "facebook.net",
+    "scorecardresearch.com",
+)
+_FIRST_PARTY_RE = re.compile(r"(^|\.)(amazon\.[a-z.]+|media-amazon\.com|ssl-images-amazon\.com)$")
+
+# Rough transfer sizes of the requests lean mode aborts, used until
+# TYPE_SAMPLES_MIN of a type have been measured (image and media requests
+# are only measured in full mode)
+TYPICAL_REQUEST_BYTES = {"image": 30_000, "media": 250_000, "font": 40_000, "script": 25_000, "other": 5_000}
+TYPE_SAMPLES_MIN = 20
+
+_lock = threading.Lock()
+_totals = {
+    "full_pages": 0,
+    "full_bytes": 0,
+    "lean_pages": 0,
+    "lean_bytes": 0,
+    "blocked_requests": 0,
+    "saved_bytes_estimate": 0,
+}
+# resource type -> [finished requests, bytes]
+_type_bytes = {}
+
+
+def request_bytes(resource_type):
+    """
+    Expected transfer size of one request of resource_type.
+    """
+    with _lock:
+        count, total = _type_bytes.get(resource_type, (0, 0))
+    if count >= TYPE_SAMPLES_MIN:
+        return total / count
+    return TYPICAL_REQUEST_BYTES.get(resource_type, TYPICAL_REQUEST_BYTES["other"])
+
+
+def wait_until(lean):
+    return "domcontentloaded" if lean else "load"
+
+
+def block_reason(resource_type, url):
+    """
+    Why a request should be aborted in lean mode, or None to let it through.
+    """
+    host = (urlparse(url).hostname or "").lower()
+    if any(host == domain or host.endswith("." + domain) for domain in BLOCKED_DOMAINS):
+        return "ads"
+    if resource_type in BLOCKED_RESOURCE_TYPES:
+        return resource_type
+    if resource_type != "document" and host and not _FIRST_PARTY_RE.search(host):
+        return "third-party"
+    return None
+
+
+def _sizes_total(sizes):
+    return max(sizes.get("responseHeadersSize", 0), 0) + max(sizes.get("responseBodySize", 0), 0)
+
+
+def _content_length(response):
+    # Fallback for when the sizes are unavailable, e.g. the page already closed
+    try:
+        return int(response.headers.get("content-length", 0)) if response else 0
+    except ValueError:
+        return 0
+
+
+class PageTraffic:
+    """
+    Per-page request accounting, fed by the page's requestfinished events
+    and the lean-mode router.
+    """
+
+    def __init__(self, lean):
+        self.lean = lean
+        self.requests = 0
+        self.blocked = {}
+        self.bytes_loaded = 0
+        self.bytes_saved = 0
+
+    def on_finished(self, request, size):
+        self.requests += 1
+        self.bytes_loaded += size
+        with _lock:
+            counts = _type_bytes.setdefault(request.resource_type, [0, 0])
+            counts[0] += 1
+            counts[1] += size
+
+    def on_blocked(self, reason, resource_type):
+        self.blocked[reason] = self.blocked.get(reason, 0) + 1
+        self.bytes_saved += request_bytes(resource_type)
+
+    def report(self):
+        """
+        Record this page in the running totals and return its stats for the
+        scrape result.
+        """
+        blocked = sum(self.blocked.values())
+        with _lock:
+            if self.lean:
+                _totals["lean_pages"] += 1
+                _totals["lean_bytes"] += self.bytes_loaded
+                _totals["blocked_requests"] += blocked
+                _totals["saved_bytes_estimate"] += int(self.bytes_saved)
+            else:
+                _totals["full_pages"] += 1
+                _totals["full_bytes"] += self.bytes_loaded
+        stats = {
+            "mode": "lean" if self.lean else "full",
+            "requests": self.requests,
+            "blocked": blocked,
+            "blocked_by_reason": dict(self.blocked),
+            "bytes_loaded": self.bytes_loaded,
+        }
+        if self.lean:
+            stats["bytes_saved_estimate"] = int(self.bytes_saved)
+        return stats
+
+
+def install_lean_routes(page, traffic):
+    """
+    Attach request accounting to a sync Playwright page, and in lean mode the
+    routing that aborts unneeded requests.
+    """
+    def finished(request):
+        try:
+            size = _sizes_total(request.sizes())
+        except Exception:
+            size = _content_length(request.response())
+        traffic.on_finished(request, size)
+
+    page.on("requestfinished", finished)
+    if not traffic.lean:
+        return
+
+    def handle(route):
+        reason = block_reason(route.request.resource_type, route.request.url)
+        if reason:
+            traffic.on_blocked(reason, route.request.resource_type)
+            route.abort()
+        else:
+            route.continue_()
+
+    page.route("**/*", handle)
+
+
+async def install_lean_routes_async(page, traffic):
+    """
+    Async counterpart of install_lean_routes.
+    """
+    async def finished(request):
+        try:
+            size = _sizes_total(await request.sizes())
+        except Exception:
+            size = _content_length(await request.response())
+        traffic.on_finished(request, size)
+
+    page.on("requestfinished", finished)
+    if not traffic.lean:
+        return
+
+    async def handle(route):
+        reason = block_reason(route.request.resource_type, route.request.url)
+        if reason:
+            traffic.on_blocked(reason, route.request.resource_type)
+            await route.abort()
+        else:
+            await route.continue_()
+
+    await page.route("**/*", handle)
+
+
+def stats():
+    with _lock:
+        totals = dict(_totals)
+        by_type = {kind: {"requests": count, "avg_bytes": round(total / count)}
+                   for kind, (count, total) in _type_bytes.items() if count}
+    full_average = totals["full_bytes"] / totals["full_pages"] if totals["full_pages"] else None
+    lean_average = totals["lean_bytes"] / totals["lean_pages"] if totals["lean_pages"] else None
+    return {
+        **totals,
+        "request_bytes_by_type": by_type,
+        "avg_full_page_bytes": round(full_average) if full_average is not None else None,
+        "avg_lean_page_bytes": round(lean_average) if lean_average is not None else None,
+    }
@@ -0,0 +1,192 @@
+"""
+Alternate-platform registry and the search engine shared by every platform.
+
+Each platform is a config entry: its domain (used for the DuckDuckGo site:
+filter and to pick result links), a pattern product URLs must match, and a
+few extraction limits. search_platform() fetches the result page once and
+parses it once with price_tokens.index_result_links, whatever the platform,
+so adding a store is a new PLATFORMS entry rather than another copy of the
+search code.
+"""
+import os
+import re
+import sys
+import time
+
+from captures import capture
+from http_client import http_get
+from metrics import event, span
+from price_tokens import index_result_links, summarize_prices
+from rate_limit import BLOCKED, FAILED, OK, RATE_LIMIT_MAX_WAIT, CircuitOpen, RateLimited, acquire, report
+
+# Overridable so benchmarks can point the searches at a local fixture server
+SEARCH_URL = os.getenv("SEARCH_URL", "https://duckduckgo.com/html/")
+SEARCH_DOMAIN = "duckduckgo.com"
+BLOCK_MARKERS = ("captcha", "detected unusual traffic")
+
+PLATFORMS = [
+    {
+        "key": "flipkart",
+        "name": "Flipkart",
+        "domain": "flipkart.com",
+        "url_pattern": r"^https://www\.flipkart\.com/",
+    },
+    {
+        "key": "meesho",
+        "name": "Meesho",
+        "domain": "meesho.com",
+        "url_pattern": r"^https://www\.meesho\.com/",
+    },
+    {
+        "key": "reliance digital",
+        "name": "Reliance Digital",
+        "domain": "reliancedigital.in",
+        "url_pattern": r"^https://www\.reliancedigital\.in/",
+    },
+    {
+        "key": "croma",
+        "name": "Croma",
+        "domain": "croma.com",
+        "url_pattern": r"^https://www\.croma\.com/.+/p/\d+",
+    },
+    {
+        "key": "tata cliq",
+        "name": "Tata CLiQ",
+        "domain": "tatacliq.com",
+        "url_pattern": r"^https://www\.tatacliq\.com/.+/p-mp\d+",
+    },
+]
+
+# Defaults for the optional per-platform extraction rules
+PLATFORM_DEFAULTS = {
+    "min_title_length": 5,
+    "max_title_length": 100,
+    "max_results": 5,
+}
+
+# The stores searched for alternate prices. Croma and Tata CLiQ are in the
+# registry but off by default; add "croma" or "tata cliq" to opt in
+ALTERNATE_PLATFORM_KEYS = [
+    key.strip() for key in
+    os.getenv("ALTERNATE_PLATFORM_KEYS", "flipkart,meesho,reliance digital").split(",")
+    if key.strip()
+]
+
+
+def _compile(platform):
+    platform = {**PLATFORM_DEFAULTS, **platform}
+    platform["url_re"] = re.compile(platform["url_pattern"])
+    return platform
+
+
+_REGISTRY = {platform["key"]: _compile(platform) for platform in PLATFORMS}
+
+
+def get_platform(key):
+    return _REGISTRY[key]
+
+
+def enabled_platforms():
+    """
+    Registry entries named in ALTERNATE_PLATFORM_KEYS, in that order.
+    """
+    platforms = []
+    for key in ALTERNATE_PLATFORM_KEYS:
+        if key in _REGISTRY:
+            platforms.append(_REGISTRY[key])
+        else:
+            print(f"[WARNING] Unknown alternate platform '{key}' in ALTERNATE_PLATFORM_KEYS", file=sys.stderr)
+    return platforms
+
+
+def parse_results(platform, html):
+    """
+    Priced results first, then unpriced ones, up to the platform's
+    max_results, from one parse of a result page.
+    """
+    results = []
+    for link in index_result_links(html, platform["domain"]):
+        if not platform["url_re"].search(link["url"]):
+            continue
+        title = link["title"]
+        if len(title) < platform["min_title_length"]:
+            continue
+        details = summarize_prices(link["prices"])
+        results.append({
+            "title": title[:platform["max_title_length"]],
+            "url": link["url"],
+            "price": details["price"],
+            "mrp": details["mrp"],
+            "currency": details["currency"],
+        })
+    results.sort(key=lambda result: result["price"] is None)
+    return results[:platform["max_results"]]
+
+
+def search_platform(platform, query, stop_at=None, cancelled=None):
+    """
+    Search one platform through DuckDuckGo and return its results. Returns []
+    at once while DuckDuckGo's circuit breaker is open. A search that is no
+    longer wanted (cancelled is set, or the time.monotonic() deadline
+    stop_at has passed) gives up without taking a rate-limit token, and
+    never waits for one past stop_at.
+    """
+    params = {"q": f"{query} site:{platform['domain']}"}
+    max_wait = RATE_LIMIT_MAX_WAIT
+    if stop_at is not None:
+        max_wait = min(max_wait, stop_at - time.monotonic())
+    if (cancelled is not None and cancelled.is_set()) or max_wait <= 0:
+        event("search_skipped")
+        return []
+    try:
+        acquire(SEARCH_DOMAIN, max_wait=max_wait)
+    except (CircuitOpen, RateLimited) as e:
+        event("search_circuit_open" if isinstance(e, CircuitOpen) else "search_rate_limited")
+        print(f"[WARNING] Skipping {platform['name']} search: {e}", file=sys.stderr)
+        return []
+    if cancelled is not None and cancelled.is_set():
+        event("search_skipped")
+        return []
+    try:
+        with span("platform_search", platform=platform["key"]):
+            resp = http_get(SEARCH_URL, params=params)
+    except Exception as e:
+        report(SEARCH_DOMAIN, FAILED)
+        print(f"[ERROR] {platform['name']} search failed: {e}", file=sys.stderr)
+        return []
+    try:
+        if resp.status_code in (403, 429):
+            report(SEARCH_DOMAIN, BLOCKED)
+        elif resp.status_code >= 500:
+            report(SEARCH_DOMAIN, FAILED)
+        resp.raise_for_status()
+        lowered = resp.text.lower()
+        if any(marker in lowered for marker in BLOCK_MARKERS):
+            report(SEARCH_DOMAIN, BLOCKED)
+            event("search_blocked")
+            print(f"[WARNING] DuckDuckGo may be blocking {platform['name']} searches.", file=sys.stderr)
+            capture("search", resp.text, platform=platform["key"], query=query, reason="blocked")
+            return []
+        report(SEARCH_DOMAIN, OK)
+        results = parse_results(platform, resp.text)
+        if not any(result["price"] for result in results):
+            capture("search", resp.text, platform=platform["key"], query=query,
+                    reason="no results" if not results else "no prices")
+        return results
+    except Exception as e:
+        print(f"[ERROR] {platform['name']} search failed: {e}", file=sys.stderr)
+        return []
+
+
+def make_searcher(key):
+    """
+    query -> results function for one platform, the shape cached_search and
+    the alternate price lookup expect.
+    """
+    platform = get_platform(key)
+
+    def search(query, **options):
+        return search_platform(platform, query, **options)
+
+    search.__name__ = f"search_{key.replace(' ', '_')}"
+    return search
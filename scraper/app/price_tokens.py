@@ -0,0 +1,149 @@
+"""
+Price tokenizer for search result pages.
+
+One precompiled pattern finds every price in a text in a single scan and
+returns it parsed: numeric value, currency and whether it is the selling
+price or an MRP / list price. index_result_links() pairs each result link
+with the prices around it using one scan for links and one for prices,
+instead of searching the whole page again for every link.
+"""
+import html as html_lib
+import re
+from bisect import bisect_left
+from urllib.parse import parse_qs, unquote, urlsplit
+
+CONTEXT_CHARS = 500
+
+_AMOUNT = r"\d[\d,]*(?:\.\d+)?"
+_CURRENCY = r"₹|&#8377;|&#x20b9;|rs\.?|inr"
+# Every price contains one of these markers. Scanning the lowercased text for
+# plain literals is several times faster than one case-insensitive pattern
+# with optional prefixes, which has to be tried at every offset.
+_MARKER_RE = re.compile(r"₹|&#8377;|&#x20b9;|rs|inr|m\.?r\.?p|price|was|list")
+_PREFIXED_RE = re.compile(rf"(?:{_CURRENCY})\s*({_AMOUNT})")
+_LABEL_RE = re.compile(r"(m\.?r\.?p\.?|list\s+price|was|price)\s*(:?)\s*")
+_BARE_AMOUNT_RE = re.compile(_AMOUNT)
+_SUFFIXED_RE = re.compile(rf"({_AMOUNT})\s*$")
+_MRP_LABELS = ("m", "list", "was")
+_ANCHOR_RE = re.compile(r'<a\s[^>]*?href="([^"]+)"[^>]*>(.*?)</a>', re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^<]+?>")
+
+
+def _to_float(amount):
+    try:
+        value = float(amount.replace(",", ""))
+    except ValueError:
+        return None
+    return value if value > 0 else None
+
+
+def scan_prices(text):
+    """
+    Every price in text, in order, as dicts with value, currency, kind
+    ("price" or "mrp") and start offset.
+    """
+    lowered = text.lower()
+    if len(lowered) != len(text):
+        # A few characters change length when lowercased; keep offsets exact
+        lowered = "".join(ch if len(ch.lower()) != 1 else ch.lower() for ch in text)
+    tokens = []
+    consumed = 0
+    for marker in _MARKER_RE.finditer(lowered):
+        start = marker.start()
+        if start < consumed:
+            continue
+        first = lowered[start]
+        if first.isalpha() and start and lowered[start - 1].isalpha():
+            continue
+        kind, amount, end = "price", None, None
+        label = _LABEL_RE.match(lowered, start) if first in "mpwl" else None
+        if label:
+            prefixed = _PREFIXED_RE.match(lowered, label.end())
+            if prefixed:
+                amount, end = prefixed.group(1), prefixed.end()
+            elif label.group(2) or label.group(1).startswith("m"):
+                bare = _BARE_AMOUNT_RE.match(lowered, label.end())
+                if bare:
+                    amount, end = bare.group(0), bare.end()
+            if amount is not None and label.group(1).startswith(_MRP_LABELS):
+                kind = "mrp"
+        elif first in "ri₹&":
+            prefixed = _PREFIXED_RE.match(lowered, start)
+            if prefixed:
+                amount, end = prefixed.group(1), prefixed.end()
+            elif first in "₹&":
+                suffixed = _SUFFIXED_RE.search(lowered, max(consumed, start - 24), start)
+                if suffixed:
+                    amount, end, start = suffixed.group(1), marker.end(), suffixed.start()
+        if amount is None:
+            continue
+        consumed = end
+        value = _to_float(amount)
+        if value is not None:
+            tokens.append({"value": value, "currency": "INR", "kind": kind, "start": start})
+    return tokens
+
+
+def summarize_prices(tokens):
+    """
+    {"price", "mrp", "currency"} from scanned tokens: the first selling price,
+    falling back to the MRP when the text only has one.
+    """
+    price = next((t["value"] for t in tokens if t["kind"] == "price"), None)
+    mrp = next((t["value"] for t in tokens if t["kind"] == "mrp"), None)
+    currency = tokens[0]["currency"] if tokens else None
+    return {"price": price if price is not None else mrp, "mrp": mrp, "currency": currency}
+
+
+def price_details(text):
+    return summarize_prices(scan_prices(text))
+
+
+def resolve_result_url(href):
+    """
+    Target of a search result link, unwrapping DuckDuckGo's /l/?uddg= redirects.
+    """
+    href = href.replace("&amp;", "&")
+    if "uddg=" in href:
+        target = parse_qs(urlsplit(href).query).get("uddg")
+        if target:
+            return target[0]
+    return unquote(href)
+
+
+def index_result_links(html, domain, context_chars=CONTEXT_CHARS):
+    """
+    Results linking to domain in a result page, one per URL, each with its
+    anchor text and nearby prices. A result's anchors (title, display URL,
+    snippet) are usually adjacent, so its context runs from the first of them
+    to the next result, at most context_chars past the last one. The page is
+    scanned once for links and once for prices, and each context is a bisect
+    over the price offsets.
+    """
+    tokens = scan_prices(html)
+    offsets = [token["start"] for token in tokens]
+    groups = []
+    for match in _ANCHOR_RE.finditer(html):
+        url = resolve_result_url(match.group(1))
+        host = (urlsplit(url).hostname or "").lower()
+        if host != domain and not host.endswith("." + domain):
+            continue
+        if groups and groups[-1]["url"] == url:
+            groups[-1]["end"] = match.end()
+            continue
+        groups.append({"url": url, "title_html": match.group(2), "start": match.start(), "end": match.end()})
+
+    links = []
+    for index, group in enumerate(groups):
+        start = group["start"]
+        stop = group["end"] + context_chars
+        if index + 1 < len(groups):
+            stop = min(stop, groups[index + 1]["start"])
+        nearby = tokens[bisect_left(offsets, start):bisect_left(offsets, stop)]
+        links.append({
+            "url": group["url"],
+            "title": html_lib.unescape(_TAG_RE.sub("", group["title_html"])).strip(),
+            "title_html": group["title_html"],
+            "prices": nearby,
+        })
+    return links
@@ -0,0 +1,273 @@
+"""
+Per-domain adaptive rate limiting and circuit breaking.
+
+Every request to a target domain takes a token from that domain's bucket
+first. The refill rate adapts: a block or CAPTCHA halves it, and each clean
+response adds back a small step, so after a block we slow down at once and
+speed up again gradually. BREAKER_THRESHOLD blocks or failures in a row trip
+the domain's breaker; while it is open, acquire() fails immediately instead
+of paying for a request that will be blocked too. After the cooldown one
+probe request is let through, and the cooldown doubles each time the probe
+fails.
+"""
+import asyncio
+import os
+import threading
+import time
+from urllib.parse import urlsplit
+
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "1") == "1"
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT", "30"))
+RATE_LIMIT_BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", "0.5"))
+RATE_LIMIT_RECOVERY = float(os.getenv("RATE_LIMIT_RECOVERY", "0.05"))
+BREAKER_THRESHOLD = int(os.getenv("BREAKER_THRESHOLD", "3"))
+BREAKER_COOLDOWN = float(os.getenv("BREAKER_COOLDOWN", "30"))
+BREAKER_MAX_COOLDOWN = float(os.getenv("BREAKER_MAX_COOLDOWN", "600"))
+# A probe that never reports back stops blocking new probes after this long
+BREAKER_PROBE_TIMEOUT = float(os.getenv("BREAKER_PROBE_TIMEOUT", "60"))
+# Share of each domain's rate and burst this process may use; the supervisor
+# gives each of its N workers 1/N so together they stay within the limits
+RATE_LIMIT_SHARE = float(os.getenv("RATE_LIMIT_SHARE", "1"))
+
+# Requests per second and burst size per domain; keys match with or without "www."
+DOMAIN_LIMITS = {
+    "amazon.in": {"rate": 1.0, "burst": 3},
+    "amazon.com": {"rate": 1.0, "burst": 3},
+    "duckduckgo.com": {"rate": 2.0, "burst": 4},
+}
+DEFAULT_LIMIT = {"rate": 2.0, "burst": 4}
+MIN_RATE = 0.05
+
+# report() outcomes
+OK = "ok"
+BLOCKED = "blocked"
+FAILED = "failed"
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+
+class CircuitOpen(Exception):
+    """The domain's breaker is open; retry_in is seconds until the next probe."""
+
+    def __init__(self, domain, retry_in):
+        super().__init__(f"Circuit open for {domain}, retry in {retry_in:.0f}s")
+        self.domain = domain
+        self.retry_in = retry_in
+
+
+class RateLimited(Exception):
+    """The wait for a token would exceed RATE_LIMIT_MAX_WAIT."""
+
+
+def domain_key(host):
+    host = (host or "").lower()
+    return host[4:] if host.startswith("www.") else host
+
+
+def limiter_key(url):
+    """
+    Limiter name for a URL's domain. The HTTP tier and the browser share it,
+    so every request to a domain draws on one budget.
+    """
+    return domain_key(urlsplit(url).hostname)
+
+
+class DomainLimiter:
+    def __init__(self, domain, rate, burst):
+        self.domain = domain
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.waiting = 0
+        self.state = CLOSED
+        self.failures = 0
+        self.cooldown = BREAKER_COOLDOWN
+        self.opened_at = 0.0
+        self.probing = False
+        self.probe_started = 0.0
+        self.counters = {"granted": 0, "rejected": 0, "blocked": 0, "failed": 0, "trips": 0}
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _check_breaker(self, now):
+        if self.state == OPEN:
+            retry_in = self.opened_at + self.cooldown - now
+            if retry_in > 0:
+                self.counters["rejected"] += 1
+                raise CircuitOpen(self.domain, retry_in)
+            self.state = HALF_OPEN
+        if self.state == HALF_OPEN:
+            if self.probing and now - self.probe_started < BREAKER_PROBE_TIMEOUT:
+                self.counters["rejected"] += 1
+                raise CircuitOpen(self.domain, self.probe_started + BREAKER_PROBE_TIMEOUT - now)
+            self.probing = True
+            self.probe_started = now
+
+    def reserve(self, max_wait=RATE_LIMIT_MAX_WAIT):
+        """
+        Take a token and return how long to wait before using it. Raises
+        CircuitOpen or RateLimited without taking one.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._check_breaker(now)
+            self._refill(now)
+            wait = max(0.0, (1 - self.tokens) / self.rate)
+            if wait > max_wait:
+                self.counters["rejected"] += 1
+                if self.state == HALF_OPEN:
+                    self.probing = False
+                raise RateLimited(f"Rate limit wait for {self.domain} would be {wait:.0f}s")
+            self.tokens -= 1
+            self.counters["granted"] += 1
+            if wait:
+                self.waiting += 1
+            return wait
+
+    def done_waiting(self):
+        with self._lock:
+            self.waiting -= 1
+
+    def report(self, outcome):
+        with self._lock:
+            if outcome == OK:
+                self.failures = 0
+                self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_LIMIT_RECOVERY)
+                if self.state != CLOSED:
+                    self.state = CLOSED
+                    self.cooldown = BREAKER_COOLDOWN
+                self.probing = False
+                return
+            self.counters[outcome] += 1
+            self.failures += 1
+            if outcome == BLOCKED:
+                self.rate = max(MIN_RATE, self.rate * RATE_LIMIT_BACKOFF)
+            if self.state == HALF_OPEN:
+                self.cooldown = min(BREAKER_MAX_COOLDOWN, self.cooldown * 2)
+                self._trip()
+            elif self.state == CLOSED and self.failures >= BREAKER_THRESHOLD:
+                self._trip()
+
+    def _trip(self):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        self.probing = False
+        self.counters["trips"] += 1
+
+    def is_open(self):
+        with self._lock:
+            return self.state == OPEN and time.monotonic() < self.opened_at + self.cooldown
+
+    def stats(self):
+        with self._lock:
+            self._refill(time.monotonic())
+            retry_in = max(0.0, self.opened_at + self.cooldown - time.monotonic()) if self.state == OPEN else 0.0
+            return {
+                "state": self.state,
+                "rate": round(self.rate, 3),
+                "max_rate": self.max_rate,
+                "tokens": round(self.tokens, 2),
+                "waiting": self.waiting,
+                "consecutive_failures": self.failures,
+                "retry_in": round(retry_in, 1),
+                **self.counters,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def _shared_limits(domain, share):
+    """
+    (rate, burst) for this process's share of domain's limits.
+    """
+    limits = DOMAIN_LIMITS.get(domain, DEFAULT_LIMIT)
+    return limits["rate"] * share, max(1.0, limits["burst"] * share)
+
+
+def get_limiter(domain):
+    domain = domain_key(domain)
+    limiter = _limiters.get(domain)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(domain)
+            if limiter is None:
+                limiter = _limiters[domain] = DomainLimiter(domain, *_shared_limits(domain, RATE_LIMIT_SHARE))
+    return limiter
+
+
+def set_share(share):
+    """
+    Change RATE_LIMIT_SHARE, rescaling the existing limiters in place (their
+    current backoff is kept in proportion).
+    """
+    global RATE_LIMIT_SHARE
+    with _limiters_lock:
+        RATE_LIMIT_SHARE = share
+        limiters = list(_limiters.values())
+    for limiter in limiters:
+        rate, burst = _shared_limits(limiter.domain, share)
+        with limiter._lock:
+            limiter.rate = max(MIN_RATE, limiter.rate * rate / limiter.max_rate)
+            limiter.max_rate = rate
+            limiter.burst = burst
+            limiter.tokens = min(limiter.tokens, burst)
+
+
+def acquire(domain, max_wait=RATE_LIMIT_MAX_WAIT):
+    """
+    Block until a request to domain may go out. Raises CircuitOpen or
+    RateLimited instead of sending a request that should not be sent.
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    limiter = get_limiter(domain)
+    wait = limiter.reserve(max_wait)
+    if wait:
+        try:
+            time.sleep(wait)
+        finally:
+            limiter.done_waiting()
+
+
+async def acquire_async(domain, max_wait=RATE_LIMIT_MAX_WAIT):
+    """
+    Async counterpart of acquire().
+    """
+    if not RATE_LIMIT_ENABLED:
+        return
+    limiter = get_limiter(domain)
+    wait = limiter.reserve(max_wait)
+    if wait:
+        try:
+            await asyncio.sleep(wait)
+        finally:
+            limiter.done_waiting()
+
+
+def report(domain, outcome):
+    """
+    Feed the outcome of a request (OK, BLOCKED or FAILED) back to domain's
+    limiter and breaker.
+    """
+    if RATE_LIMIT_ENABLED:
+        get_limiter(domain).report(outcome)
+
+
+def is_open(domain):
+    return RATE_LIMIT_ENABLED and get_limiter(domain).is_open()
+
+
+def stats():
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {"enabled": RATE_LIMIT_ENABLED, "share": RATE_LIMIT_SHARE,
+            "domains": {domain: limiter.stats() for domain, limiter in limiters.items()}}
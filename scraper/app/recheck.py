@@ -0,0 +1,159 @@
+"""
+Volatility-aware re-check planning.
+
+Instead of re-scraping every tracked product on the same hourly cron, the
+backend posts the products with their stored price_history and a per-hour
+scrape budget, and gets back the URLs worth checking now.
+
+Each product's volatility is the standard deviation of its log price per
+sqrt(hour), estimated from the gaps between consecutive checks with recent
+checks weighted more (RECHECK_HALF_LIFE_HOURS). Under a random walk the
+price has moved by about volatility * sqrt(hours since the last check), and
+a product whose target_price is within that spread has a good chance of
+having crossed it. Priority combines the two; products below
+RECHECK_MOVE_THRESHOLD expected movement and unlikely to have reached their
+target are skipped, unless RECHECK_MAX_INTERVAL_HOURS have passed. The whole
+history set is scored with numpy array operations, with no Python loop
+over products or price points.
+"""
+import os
+import time
+
+import numpy as np
+
+RECHECK_HALF_LIFE_HOURS = float(os.getenv("RECHECK_HALF_LIFE_HOURS", str(14 * 24)))
+RECHECK_MIN_INTERVAL_HOURS = float(os.getenv("RECHECK_MIN_INTERVAL_HOURS", "1"))
+RECHECK_MAX_INTERVAL_HOURS = float(os.getenv("RECHECK_MAX_INTERVAL_HOURS", "48"))
+RECHECK_MOVE_THRESHOLD = float(os.getenv("RECHECK_MOVE_THRESHOLD", "0.02"))
+RECHECK_TARGET_THRESHOLD = float(os.getenv("RECHECK_TARGET_THRESHOLD", "0.05"))
+RECHECK_TARGET_WEIGHT = float(os.getenv("RECHECK_TARGET_WEIGHT", "4"))
+# Volatility assumed for products with fewer than two checks, and the floor
+# for the rest, in log price per sqrt(hour)
+RECHECK_DEFAULT_VOLATILITY = float(os.getenv("RECHECK_DEFAULT_VOLATILITY", "0.01"))
+RECHECK_MIN_VOLATILITY = float(os.getenv("RECHECK_MIN_VOLATILITY", "0.0005"))
+
+
+def _normal_sf(x):
+    """
+    Upper tail of the standard normal, elementwise (Abramowitz and Stegun
+    7.1.26, absolute error below 1.5e-7), since numpy has no erf.
+    """
+    z = np.abs(x) / np.sqrt(2)
+    t = 1 / (1 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    erfc = poly * np.exp(-z * z)
+    return np.where(x >= 0, erfc / 2, 1 - erfc / 2)
+
+
+def score_histories(index, checked_at, prices, targets, now, last_checked=None):
+    """
+    Score count = len(targets) products from their flattened price history:
+    index[i] is the product of the check at checked_at[i] (epoch seconds)
+    that saw prices[i]. targets holds NaN where a product has none.
+    last_checked optionally holds each product's latest check in epoch
+    seconds (NaN where unknown), for re-checks that found the price
+    unchanged and so added no history row; it only moves the time since the
+    last check forward. Returns
+    a dict of per-product arrays: volatility, hours (since the last check),
+    last_price, target_probability, priority and due.
+    """
+    count = len(targets)
+    index = np.asarray(index, dtype=np.int64)
+    hours = np.asarray(checked_at, dtype=np.float64) / 3600
+    prices = np.asarray(prices, dtype=np.float64)
+    targets = np.asarray(targets, dtype=np.float64)
+    now_hours = now / 3600
+
+    valid = prices > 0
+    index, hours, prices = index[valid], hours[valid], prices[valid]
+    order = np.lexsort((hours, index))
+    index, hours, prices = index[order], hours[order], prices[order]
+
+    # Consecutive checks of the same product
+    same = index[1:] == index[:-1]
+    owner = index[1:][same]
+    gap = np.maximum(np.diff(hours)[same], 1e-3)
+    step = np.diff(np.log(prices))[same]
+    weight = 0.5 ** ((now_hours - hours[1:][same]) / RECHECK_HALF_LIFE_HOURS)
+    variance = np.bincount(owner, weights=weight * step * step, minlength=count)
+    elapsed = np.bincount(owner, weights=weight * gap, minlength=count)
+    pairs = np.bincount(owner, minlength=count)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        volatility = np.where(pairs > 0, np.sqrt(variance / elapsed), RECHECK_DEFAULT_VOLATILITY)
+    volatility = np.maximum(np.nan_to_num(volatility, nan=RECHECK_DEFAULT_VOLATILITY), RECHECK_MIN_VOLATILITY)
+
+    # Latest check per product: the last row of each run of index
+    last = np.flatnonzero(np.append(index[1:] != index[:-1], True)) if len(index) else np.array([], dtype=np.int64)
+    last_hours = np.full(count, -np.inf)
+    last_price = np.full(count, np.nan)
+    last_hours[index[last]] = hours[last]
+    last_price[index[last]] = prices[last]
+    if last_checked is not None:
+        last_checked = np.asarray(last_checked, dtype=np.float64) / 3600
+        last_hours = np.fmax(last_hours, np.where(np.isfinite(last_price), last_checked, np.nan))
+    since = np.maximum(now_hours - last_hours, 0)
+
+    spread = volatility * np.sqrt(np.minimum(since, RECHECK_MAX_INTERVAL_HOURS * 4))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        distance = np.log(last_price / targets)
+        # Chance a random walk has touched the target since the last check
+        probability = np.where(distance > 0, 2 * _normal_sf(distance / spread), 0.0)
+    probability = np.nan_to_num(probability, nan=0.0)
+
+    never_checked = ~np.isfinite(last_hours)
+    overdue = never_checked | (since >= RECHECK_MAX_INTERVAL_HOURS)
+    priority = spread / RECHECK_MOVE_THRESHOLD * (1 + RECHECK_TARGET_WEIGHT * probability)
+    priority = np.where(overdue, np.maximum(priority, 1 + since / RECHECK_MAX_INTERVAL_HOURS), priority)
+    priority = np.where(never_checked, np.inf, priority)
+    due = overdue | (
+        (since >= RECHECK_MIN_INTERVAL_HOURS)
+        & ((spread >= RECHECK_MOVE_THRESHOLD) | (probability >= RECHECK_TARGET_THRESHOLD))
+    )
+    return {
+        "volatility": volatility,
+        "hours": np.where(never_checked, np.inf, since),
+        "last_price": last_price,
+        "target_probability": probability,
+        "priority": priority,
+        "due": due,
+    }
+
+
+def plan_rechecks(products, budget, now=None):
+    """
+    The products to re-check now, highest priority first and at most budget
+    of them. Each product is a dict with "url", an optional "target_price",
+    "history", a list of (checked_at epoch seconds, price) pairs, and an
+    optional "last_checked" epoch seconds of its latest check.
+    Returns (due list, scores) where each due entry has the url and the
+    numbers behind its priority.
+    """
+    now = time.time() if now is None else now
+    lengths = [len(product["history"]) for product in products]
+    index = np.repeat(np.arange(len(products)), lengths)
+    points = [point for product in products for point in product["history"]]
+    checked_at = np.array([point[0] for point in points], dtype=np.float64)
+    prices = np.array([point[1] for point in points], dtype=np.float64)
+    targets = np.array(
+        [product.get("target_price") if product.get("target_price") else np.nan for product in products],
+        dtype=np.float64,
+    )
+    last_checked = np.array(
+        [product.get("last_checked") if product.get("last_checked") else np.nan for product in products],
+        dtype=np.float64,
+    )
+    scores = score_histories(index, checked_at, prices, targets, now, last_checked)
+
+    candidates = np.flatnonzero(scores["due"])
+    chosen = candidates[np.argsort(-scores["priority"][candidates], kind="stable")][:max(budget, 0)]
+    due = []
+    for i in chosen:
+        hours = scores["hours"][i]
+        due.append({
+            "url": products[i]["url"],
+            "priority": None if np.isinf(scores["priority"][i]) else round(float(scores["priority"][i]), 4),
+            "daily_volatility": round(float(scores["volatility"][i] * np.sqrt(24)), 5),
+            "hours_since_check": None if np.isinf(hours) else round(float(hours), 2),
+            "target_probability": round(float(scores["target_probability"][i]), 4),
+        })
+    return due, scores
@@ -1,10 +1,54 @@
 import sys
 import json
+
+from startup import load_config
+
+load_config()
+
 from amazon_scraper import scrape_amazon_product
 
+def option_value(argv, name):
+    if name in argv:
+        index = argv.index(name)
+        if index + 1 < len(argv):
+            return argv[index + 1]
+    return None
+
+def parse_args(argv):
+    """
+    (url, scrape_amazon_product keyword arguments) from the command line
+    main.run_scrape_subprocess builds, without the script name.
+    """
+    url = argv[0]
+    cache_mode = "use"
+    if "--bypass-cache" in argv:
+        cache_mode = "bypass"
+    elif "--refresh-cache" in argv:
+        cache_mode = "refresh"
+    kwargs = {
+        "extract_metadata": "--extract-metadata" in argv,
+        "get_alternates": "--get-alternates" in argv,
+        "cache_mode": cache_mode,
+    }
+    if "--lean" in argv:
+        kwargs["lean"] = True
+    elif "--full" in argv:
+        kwargs["lean"] = False
+    if "--price-only" in argv:
+        kwargs["price_only"] = True
+    if option_value(argv, "--last-price") is not None:
+        kwargs["last_price"] = float(option_value(argv, "--last-price"))
+    if option_value(argv, "--fingerprint"):
+        kwargs["fingerprint"] = option_value(argv, "--fingerprint")
+    return url, kwargs
+
+def run(argv):
+    """
+    Scrape as the command line asks and return the result dict; also called
+    in the forked children of worker_template.py.
+    """
+    url, kwargs = parse_args(argv)
+    return scrape_amazon_product(url, **kwargs)
+
 if __name__ == "__main__":
-    url = sys.argv[1]
-    extract_metadata = "--extract-metadata" in sys.argv
-    get_alternates = "--get-alternates" in sys.argv
-    result = scrape_amazon_product(url, extract_metadata=extract_metadata, get_alternates=get_alternates)
-    print(json.dumps(result))
\ No newline at end of file
+    print(json.dumps(run(sys.argv[1:])))
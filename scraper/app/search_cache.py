@@ -0,0 +1,182 @@
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory")
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", str(6 * 60 * 60)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "5000"))
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "search_cache.sqlite3")
+
+# cache_mode values accepted by cached_search
+CACHE_USE = "use"
+CACHE_BYPASS = "bypass"
+CACHE_REFRESH = "refresh"
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def normalize_query(query):
+    """
+    Lowercase, drop punctuation and collapse whitespace so trivially
+    different spellings of a title share one cache entry.
+    """
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return re.sub(r"\s+", " ", query).strip()
+
+
+def cache_key(platform, query):
+    return f"{platform.lower()}|{normalize_query(query)}"
+
+
+class MemoryCache:
+    """
+    In-process LRU cache whose entries expire ttl seconds after being stored.
+    """
+
+    def __init__(self, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] > self.ttl:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return json.loads(entry[1])
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.time(), json.dumps(value))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        return {"backend": "memory", "entries": len(self._entries), "hits": self.hits,
+                "misses": self.misses, "ttl": self.ttl, "max_entries": self.max_entries}
+
+
+class SqliteCache:
+    """
+    SQLite-backed cache with the same interface as MemoryCache, so cached
+    entries survive restarts. Least recently read entries are evicted first.
+    """
+
+    def __init__(self, path=SEARCH_CACHE_PATH, ttl=SEARCH_CACHE_TTL, max_entries=SEARCH_CACHE_MAX_ENTRIES,
+                 table="search_cache"):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.table = table
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, stored_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._db.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)")
+        self._db.commit()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            row = self._db.execute(f"SELECT value, stored_at FROM {self.table} WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                if row is not None:
+                    self._db.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                    self._db.commit()
+                self.misses += 1
+                return None
+            self._db.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (now, key))
+            self._db.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                f"INSERT OR REPLACE INTO {self.table} (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._db.execute(
+                f"DELETE FROM {self.table} WHERE key IN ("
+                f"SELECT key FROM {self.table} ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._db.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+        return {"backend": "sqlite", "path": self.path, "entries": entries, "hits": self.hits,
+                "misses": self.misses, "ttl": self.ttl, "max_entries": self.max_entries}
+
+
+def open_cache(backend, path, ttl, max_entries, table):
+    """
+    Build a MemoryCache or SqliteCache for the given backend name. Falls back
+    to memory when the SQLite file cannot be opened.
+    """
+    if backend == "sqlite":
+        try:
+            return SqliteCache(path, ttl=ttl, max_entries=max_entries, table=table)
+        except sqlite3.Error as e:
+            print(f"[WARNING] Could not open {table} at {path}, using memory: {e}", file=sys.stderr)
+    return MemoryCache(ttl=ttl, max_entries=max_entries)
+
+
+def get_search_cache():
+    """
+    Return the configured cache, or None when SEARCH_CACHE_BACKEND=off.
+    """
+    global _cache
+    if _cache is None and SEARCH_CACHE_BACKEND != "off":
+        with _cache_lock:
+            if _cache is None:
+                _cache = open_cache(SEARCH_CACHE_BACKEND, SEARCH_CACHE_PATH, SEARCH_CACHE_TTL,
+                                    SEARCH_CACHE_MAX_ENTRIES, "search_cache")
+    return _cache
+
+
+def cached_search(search_func, query, platform_name, cache_mode=CACHE_USE, **search_options):
+    """
+    Call search_func(query, **search_options) through the cache. "bypass"
+    skips the cache entirely and "refresh" skips the read but stores the
+    fresh result. Empty results are never stored, since they are usually a
+    block.
+    """
+    cache = get_search_cache()
+    if cache is None or cache_mode == CACHE_BYPASS:
+        return search_func(query, **search_options)
+    key = cache_key(platform_name, query)
+    if cache_mode != CACHE_REFRESH:
+        results = cache.get(key)
+        if results is not None:
+            return results
+    results = search_func(query, **search_options)
+    if results:
+        cache.set(key, results)
+    return results
+
+
+def stats():
+    cache = get_search_cache()
+    return cache.stats() if cache else {"backend": "off"}
@@ -0,0 +1,64 @@
+"""
+Process start-up: configuration and module preloading.
+
+Every module reads its settings from the environment when it is imported,
+so the entry points (main.py, scrape_worker.py, supervisor.py) call
+load_config() before importing anything else, and .env is read once per
+process no matter which module is imported first. Heavy optional packages
+(Playwright's sync API, requests, the Gemini SDK) are imported where they
+are first used rather than at module level, so a process only pays for
+what it runs; preload() pulls them in ahead of time for the pre-forked
+worker template (worker_template.py).
+
+    python -X importtime -c "import scrape_worker" 2> imports.txt
+
+profiles a cold import; benchmarks/bench_startup.py summarizes it.
+"""
+import importlib
+import sys
+import time
+
+_config_loaded = False
+
+# Everything a scrape_worker run may import, heaviest first
+WORKER_PRELOAD = (
+    "playwright.sync_api",
+    "amazon_scraper",
+    "scrape_worker",
+    "requests",
+    "extract_metadata",
+    "google.generativeai",
+)
+
+
+def load_config():
+    """
+    Load .env into os.environ, once per process. Variables already set in
+    the environment win. Without python-dotenv only the environment is used.
+    """
+    global _config_loaded
+    if _config_loaded:
+        return
+    _config_loaded = True
+    try:
+        from dotenv import load_dotenv
+    except ImportError:
+        return
+    load_dotenv()
+
+
+def preload(modules=WORKER_PRELOAD):
+    """
+    Import modules now and return {module: seconds}. Optional packages that
+    are not installed are skipped.
+    """
+    timings = {}
+    for name in modules:
+        started = time.perf_counter()
+        try:
+            importlib.import_module(name)
+        except ImportError as e:
+            print(f"[DEBUG] Not preloading {name}: {e}", file=sys.stderr)
+            continue
+        timings[name] = round(time.perf_counter() - started, 4)
+    return timings
@@ -0,0 +1,448 @@
+"""
+Supervisor mode: N long-lived scraper worker processes behind one front app.
+
+Each worker is a full copy of main.py in its own process, with its own
+browser pool, tier memory, coalescing window and caches, so the service
+scales across cores. Requests are routed by consistent hashing on the
+Amazon ASIN (the canonical URL for other pages), so repeat checks of a
+product land on the worker that already holds its warm state, and changing
+the worker count only moves about 1/N of the products. A crashed worker is
+restarted with exponential backoff; its products go to the next worker on
+the ring until it is back.
+
+Limits that are meant for the whole service are split between the workers:
+each worker's rate limiter gets 1/N of every domain's rate and burst
+(RATE_LIMIT_SHARE, updated on resize), and a batch's per_domain_limit is
+divided between the parts it is split into. Each worker keeps its debug
+captures in its own subdirectory of CAPTURE_DIR, and /captures merges them.
+
+    cd scraper/app && SUPERVISOR_WORKERS=16 uvicorn supervisor:app --port 8000
+
+/scrape and /scrape/batch are routed by product, /captures asks every
+worker; every other path is forwarded to any live worker. /supervisor/stats shows the workers and
+POST /supervisor/workers?count=N resizes the pool.
+"""
+import asyncio
+import bisect
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, APP_DIR)
+
+from startup import load_config
+
+load_config()
+
+from captures import CAPTURE_DIR
+from coalesce import canonical_url
+from main import BatchRequest
+
+SUPERVISOR_WORKERS = int(os.getenv("SUPERVISOR_WORKERS", str(os.cpu_count() or 1)))
+SUPERVISOR_HOST = os.getenv("SUPERVISOR_HOST", "127.0.0.1")
+SUPERVISOR_BASE_PORT = int(os.getenv("SUPERVISOR_BASE_PORT", "8100"))
+SUPERVISOR_VNODES = int(os.getenv("SUPERVISOR_VNODES", "64"))
+SUPERVISOR_CHECK_INTERVAL = float(os.getenv("SUPERVISOR_CHECK_INTERVAL", "1"))
+SUPERVISOR_RESTART_BACKOFF = float(os.getenv("SUPERVISOR_RESTART_BACKOFF", "1"))
+SUPERVISOR_MAX_BACKOFF = float(os.getenv("SUPERVISOR_MAX_BACKOFF", "30"))
+SUPERVISOR_REQUEST_TIMEOUT = float(os.getenv("SUPERVISOR_REQUEST_TIMEOUT", "180"))
+SUPERVISOR_MAX_WORKERS = int(os.getenv("SUPERVISOR_MAX_WORKERS", "64"))
+# Headers that describe one hop and must not be copied onto the next
+HOP_HEADERS = {"connection", "content-length", "content-encoding", "transfer-encoding", "keep-alive", "host"}
+
+
+def routing_key(url):
+    """
+    The Amazon ASIN for product URLs, otherwise the canonical URL.
+    """
+    canonical = canonical_url(url)
+    parts = urlsplit(canonical)
+    if parts.path.startswith("/dp/"):
+        return parts.path[4:]
+    return canonical
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.md5(value.encode("utf-8")).digest()[:8], "big")
+
+
+class HashRing:
+    """
+    Consistent hash ring with vnodes points per node.
+    """
+
+    def __init__(self, vnodes=SUPERVISOR_VNODES):
+        self.vnodes = vnodes
+        self._points = []
+        self._owners = []
+
+    def rebuild(self, nodes):
+        ring = sorted((_hash(f"{node}#{i}"), node) for node in nodes for i in range(self.vnodes))
+        self._points = [point for point, _ in ring]
+        self._owners = [node for _, node in ring]
+
+    def lookup(self, key, usable=None):
+        """
+        The node owning key, skipping clockwise past nodes not in usable.
+        """
+        if not self._points:
+            return None
+        start = bisect.bisect(self._points, _hash(key))
+        for offset in range(len(self._owners)):
+            node = self._owners[(start + offset) % len(self._owners)]
+            if usable is None or node in usable:
+                return node
+        return None
+
+
+class Worker:
+    def __init__(self, name, port):
+        self.name = name
+        self.port = port
+        self.url = f"http://{SUPERVISOR_HOST}:{port}"
+        self.process = None
+        self.ready = False
+        self.started_at = None
+        self.restarts = 0
+        self.crashes_in_a_row = 0
+        self.restart_at = 0.0
+        self.routed = 0
+        self.stopping = False
+        # Share of the per-domain rate limits, 1/N of N workers
+        self.share = 1.0
+
+    def start(self):
+        env = {**os.environ, "SCRAPER_WORKER_NAME": self.name, "RATE_LIMIT_SHARE": str(self.share),
+               "CAPTURE_DIR": os.path.join(CAPTURE_DIR, self.name)}
+        args = [sys.executable, "-m", "uvicorn", "main:app", "--host", SUPERVISOR_HOST, "--port", str(self.port),
+                "--log-level", "warning"]
+        self.process = subprocess.Popen(args, cwd=APP_DIR, env=env)
+        self.ready = False
+        self.started_at = time.monotonic()
+        print(f"[SUPERVISOR] Started worker {self.name} (pid {self.process.pid}) on port {self.port}",
+              file=sys.stderr)
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def stop(self, timeout=10):
+        self.stopping = True
+        self.ready = False
+        if not self.alive():
+            return
+        self.process.terminate()
+        try:
+            self.process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+    def stats(self):
+        return {
+            "name": self.name,
+            "port": self.port,
+            "pid": self.process.pid if self.process else None,
+            "alive": self.alive(),
+            "ready": self.ready,
+            "restarts": self.restarts,
+            "routed": self.routed,
+            "uptime": round(time.monotonic() - self.started_at, 1) if self.started_at and self.alive() else 0.0,
+        }
+
+
+class Supervisor:
+    def __init__(self):
+        self.workers = {}
+        self.ring = HashRing()
+        self.client = None
+        self._monitor = None
+        self._resize_lock = asyncio.Lock()
+        self._round_robin = itertools.count()
+
+    async def start(self, count):
+        self.client = httpx.AsyncClient(timeout=SUPERVISOR_REQUEST_TIMEOUT,
+                                        limits=httpx.Limits(max_connections=None, max_keepalive_connections=256))
+        await self.resize(count)
+        self._monitor = asyncio.create_task(self._monitor_loop())
+
+    async def close(self):
+        if self._monitor:
+            self._monitor.cancel()
+        await asyncio.gather(*(asyncio.to_thread(worker.stop) for worker in self.workers.values()))
+        self.workers = {}
+        if self.client:
+            await self.client.aclose()
+
+    async def resize(self, count):
+        """
+        Start or stop workers so that count are running, and rebuild the ring.
+        Workers keep their names (w0, w1, ...), so only the products owned by
+        added or removed workers move. Every worker's rate limit share is
+        set to 1/count.
+        """
+        async with self._resize_lock:
+            names = [f"w{index}" for index in range(count)]
+            share = 1 / count
+            kept = [worker for name, worker in self.workers.items() if name in names]
+            for index, name in enumerate(names):
+                if name not in self.workers:
+                    worker = self.workers[name] = Worker(name, SUPERVISOR_BASE_PORT + index)
+                    worker.share = share
+                    worker.start()
+            removed = [self.workers.pop(name) for name in list(self.workers) if name not in names]
+            self.ring.rebuild(names)
+            await asyncio.gather(*(asyncio.to_thread(worker.stop) for worker in removed))
+            await asyncio.gather(*(self._set_share(worker, share) for worker in kept))
+            print(f"[SUPERVISOR] Running {count} workers", file=sys.stderr)
+
+    async def _set_share(self, worker, share):
+        """
+        Tell a running worker its new rate limit share. A worker that cannot
+        be reached gets it when it is next restarted.
+        """
+        worker.share = share
+        try:
+            await self.client.post(f"{worker.url}/limits/share", params={"share": share}, timeout=5)
+        except httpx.HTTPError as e:
+            print(f"[SUPERVISOR] Could not set the rate limit share of {worker.name}: {e}", file=sys.stderr)
+
+    async def _probe(self, worker):
+        try:
+            response = await self.client.get(f"{worker.url}/pool/stats", timeout=2)
+            worker.ready = response.status_code == 200
+        except httpx.HTTPError:
+            worker.ready = False
+        if worker.ready:
+            worker.crashes_in_a_row = 0
+
+    async def _monitor_loop(self):
+        while True:
+            now = time.monotonic()
+            for worker in list(self.workers.values()):
+                if worker.stopping:
+                    continue
+                if worker.alive():
+                    if not worker.ready:
+                        await self._probe(worker)
+                    continue
+                if worker.restart_at == 0.0:
+                    worker.ready = False
+                    worker.crashes_in_a_row += 1
+                    backoff = min(SUPERVISOR_MAX_BACKOFF,
+                                  SUPERVISOR_RESTART_BACKOFF * 2 ** (worker.crashes_in_a_row - 1))
+                    worker.restart_at = now + backoff
+                    code = worker.process.returncode if worker.process else None
+                    print(f"[SUPERVISOR] Worker {worker.name} exited with {code}, restarting in {backoff:.0f}s",
+                          file=sys.stderr)
+                elif now >= worker.restart_at:
+                    worker.restart_at = 0.0
+                    worker.restarts += 1
+                    worker.start()
+            await asyncio.sleep(SUPERVISOR_CHECK_INTERVAL)
+
+    def usable(self):
+        return {name for name, worker in self.workers.items() if worker.ready and worker.alive()}
+
+    def route(self, url, exclude=()):
+        name = self.ring.lookup(routing_key(url), self.usable() - set(exclude))
+        return self.workers.get(name) if name else None
+
+    def any_worker(self):
+        usable = sorted(self.usable())
+        if not usable:
+            return None
+        return self.workers[usable[next(self._round_robin) % len(usable)]]
+
+    def stats(self):
+        return {
+            "workers": [worker.stats() for worker in self.workers.values()],
+            "ready": len(self.usable()),
+            "vnodes": self.ring.vnodes,
+        }
+
+
+supervisor = Supervisor()
+
+
+@asynccontextmanager
+async def lifespan(app):
+    await supervisor.start(SUPERVISOR_WORKERS)
+    yield
+    await supervisor.close()
+
+app = FastAPI(lifespan=lifespan)
+
+
+def no_worker():
+    return JSONResponse(status_code=503, content={"results": {"error": "No scraper worker is available"}})
+
+
+def forwarded(response, worker):
+    headers = {k: v for k, v in response.headers.items() if k.lower() not in HOP_HEADERS}
+    headers["x-scraper-worker"] = worker.name
+    return Response(content=response.content, status_code=response.status_code, headers=headers)
+
+
+@app.get("/scrape")
+async def scrape(request: Request):
+    """
+    Forward to the worker that owns the product. If that worker dies
+    mid-request the next one on the ring is tried once.
+    """
+    url = request.query_params.get("url")
+    if not url:
+        return JSONResponse(status_code=422, content={"detail": "url is required"})
+    tried = []
+    for _ in range(2):
+        worker = supervisor.route(url, exclude=tried)
+        if worker is None:
+            return no_worker()
+        worker.routed += 1
+        try:
+            response = await supervisor.client.get(f"{worker.url}/scrape", params=request.query_params)
+        except httpx.TransportError as e:
+            print(f"[SUPERVISOR] Worker {worker.name} failed on {url}: {e}", file=sys.stderr)
+            worker.ready = False
+            tried.append(worker.name)
+            continue
+        return forwarded(response, worker)
+    return no_worker()
+
+
+@app.post("/scrape/batch")
+async def scrape_batch(batch: BatchRequest):
+    """
+    Split the batch by owning worker, run the parts concurrently and stream
+    their NDJSON lines back with the original item indexes. The batch is
+    validated as the workers would, and per_domain_limit is divided between
+    the parts (at least 1 each) so the batch as a whole stays within it.
+    """
+    items = [item.model_dump(exclude_unset=True) for item in batch.items]
+    parts = {}
+    lines = []
+    for index, item in enumerate(items):
+        worker = supervisor.route(item["url"])
+        if worker is None:
+            lines.append({"index": index, "url": item["url"], "results": {"error": "No scraper worker is available"}})
+            continue
+        parts.setdefault(worker.name, []).append(index)
+    options = batch.model_dump(exclude={"items"})
+    options["per_domain_limit"] = max(1, batch.per_domain_limit // max(len(parts), 1))
+
+    async def run_part(name, indexes, queue):
+        worker = supervisor.workers[name]
+        worker.routed += len(indexes)
+        body = {**options, "items": [items[index] for index in indexes]}
+        seen = set()
+        try:
+            async with supervisor.client.stream("POST", f"{worker.url}/scrape/batch", json=body) as response:
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    row = json.loads(line)
+                    row["index"] = indexes[row["index"]]
+                    seen.add(row["index"])
+                    await queue.put(row)
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            print(f"[SUPERVISOR] Batch part on worker {name} failed: {e}", file=sys.stderr)
+        for index in indexes:
+            if index not in seen:
+                await queue.put({"index": index, "url": items[index]["url"],
+                                 "results": {"error": f"Worker {name} failed"}})
+
+    async def stream():
+        for row in lines:
+            yield json.dumps(row) + "\n"
+        queue = asyncio.Queue()
+        tasks = [asyncio.create_task(run_part(name, indexes, queue)) for name, indexes in parts.items()]
+        try:
+            for _ in range(sum(len(indexes) for indexes in parts.values())):
+                yield json.dumps(await queue.get()) + "\n"
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/supervisor/stats")
+async def supervisor_stats():
+    return supervisor.stats()
+
+
+@app.post("/supervisor/workers")
+async def resize_workers(count: int = Query(..., ge=1, le=SUPERVISOR_MAX_WORKERS)):
+    await supervisor.resize(count)
+    return supervisor.stats()
+
+
+@app.get("/captures")
+async def captures_list(kind: Optional[str] = Query(None), limit: int = Query(100, ge=1, le=1000)):
+    """
+    Every live worker's captures, newest first, with each worker's stats.
+    """
+    workers = [supervisor.workers[name] for name in sorted(supervisor.usable())]
+    params = {"kind": kind, "limit": limit} if kind else {"limit": limit}
+    responses = await asyncio.gather(
+        *(supervisor.client.get(f"{worker.url}/captures", params=params) for worker in workers),
+        return_exceptions=True,
+    )
+    stats, captures = {}, []
+    for worker, response in zip(workers, responses):
+        if isinstance(response, Exception) or response.status_code != 200:
+            continue
+        body = response.json()
+        stats[worker.name] = body["stats"]
+        captures += [{**meta, "worker": worker.name} for meta in body["captures"]]
+    captures.sort(key=lambda meta: meta["captured_at"], reverse=True)
+    return {"stats": stats, "captures": captures[:limit]}
+
+
+@app.get("/captures/{capture_id}")
+async def capture_detail(capture_id: str):
+    """
+    The capture from whichever worker stored it.
+    """
+    for name in sorted(supervisor.usable()):
+        worker = supervisor.workers[name]
+        try:
+            response = await supervisor.client.get(f"{worker.url}/captures/{capture_id}")
+        except httpx.TransportError:
+            continue
+        if response.status_code != 404:
+            return forwarded(response, worker)
+    return JSONResponse(status_code=404, content={"error": "Capture not found"})
+
+
+@app.api_route("/{path:path}", methods=["GET", "POST"])
+async def forward(path: str, request: Request):
+    """
+    Stateless endpoints (stats, metadata, scheduling) go to any live worker;
+    add ?worker=<name> to read one worker's stats.
+    """
+    name = request.query_params.get("worker")
+    worker = supervisor.workers.get(name) if name else supervisor.any_worker()
+    if worker is None:
+        return no_worker()
+    params = [(key, value) for key, value in request.query_params.multi_items() if key != "worker"]
+    try:
+        response = await supervisor.client.request(
+            request.method, f"{worker.url}/{path}", params=params, content=await request.body(),
+            headers={"content-type": request.headers.get("content-type", "application/json")},
+        )
+    except httpx.TransportError as e:
+        worker.ready = False
+        return JSONResponse(status_code=502, content={"error": f"Worker {worker.name} failed: {e}"})
+    return forwarded(response, worker)
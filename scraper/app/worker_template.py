@@ -0,0 +1,189 @@
+"""
+Pre-forked worker template for the subprocess engine.
+
+Starting scrape_worker.py for every request pays for a fresh interpreter
+and the Playwright, requests and metadata imports before a page is opened.
+With SCRAPER_PREFORK=1, main.py instead starts one template process at
+startup that loads the configuration and preloads those modules once
+(startup.preload), then listens on a Unix socket. Every request forks the
+template: the child starts with everything already imported, runs
+scrape_worker.run() with the request's arguments, writes the JSON result
+back and exits, so each scrape is still isolated in its own process. The
+browser is launched in the child, since Playwright's driver connection
+does not survive a fork.
+
+    python worker_template.py /tmp/scraper/template.sock
+"""
+import json
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, APP_DIR)
+
+from startup import load_config, preload
+
+load_config()
+
+WORKER_TEMPLATE_START_TIMEOUT = float(os.getenv("WORKER_TEMPLATE_START_TIMEOUT", "30"))
+
+
+def _reply(stream, payload):
+    stream.write(json.dumps(payload).encode("utf-8") + b"\n")
+    stream.flush()
+
+
+def _handle(conn, preloaded):
+    """
+    Answer one request in a forked child: {"ping": true} reports the
+    template's preload timings, {"argv": [...]} runs a scrape.
+    """
+    with conn, conn.makefile("rwb") as stream:
+        request = json.loads(stream.readline())
+        if request.get("ping"):
+            _reply(stream, {"preloaded": preloaded})
+            return 0
+        import scrape_worker
+        try:
+            result, code = scrape_worker.run(request["argv"]), 0
+        except Exception as e:
+            print(f"[ERROR] Forked worker failed: {e}", file=sys.stderr)
+            result, code = {"error": f"Scrape failed: {e}"}, 1
+        _reply(stream, {"results": result, "returncode": code})
+        return code
+
+
+def serve(socket_path):
+    """
+    Preload, then fork a child per connection on socket_path until
+    terminated.
+    """
+    started = time.perf_counter()
+    preloaded = preload()
+    print(f"[TEMPLATE] Preloaded {len(preloaded)} modules in {time.perf_counter() - started:.2f}s", file=sys.stderr)
+
+    owner = os.getpid()
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(socket_path)
+    listener.listen(128)
+    # Reap children automatically; SIGTERM unwinds so the socket is removed
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            conn, _ = listener.accept()
+            if os.fork() == 0:
+                listener.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                # sys.exit rather than os._exit, so atexit handlers (the
+                # capture writer's flush) still run in the child
+                sys.exit(_handle(conn, preloaded))
+            conn.close()
+    finally:
+        if os.getpid() == owner:
+            listener.close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+
+class WorkerTemplate:
+    """
+    main.py's handle on the template process: starts it, restarts it if it
+    has died, and sends it scrapes.
+    """
+
+    def __init__(self, socket_path=None):
+        self._dir = None
+        if socket_path is None:
+            self._dir = tempfile.mkdtemp(prefix="scraper-template-")
+            socket_path = os.path.join(self._dir, "template.sock")
+        self.socket_path = socket_path
+        self.process = None
+        self.start_seconds = None
+        self.preloaded = {}
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def alive(self):
+        return self.process is not None and self.process.poll() is None
+
+    def start(self, timeout=WORKER_TEMPLATE_START_TIMEOUT):
+        """
+        Start the template and wait until it answers a ping.
+        """
+        started = time.perf_counter()
+        self.process = subprocess.Popen([sys.executable, os.path.abspath(__file__), self.socket_path], cwd=APP_DIR)
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Worker template exited with {self.process.returncode}")
+            try:
+                self.preloaded = self.request({"ping": True}, timeout=5)["preloaded"]
+                break
+            except OSError:
+                if time.monotonic() > deadline:
+                    self.close()
+                    raise RuntimeError(f"Worker template not ready after {timeout}s")
+                time.sleep(0.05)
+        self.start_seconds = round(time.perf_counter() - started, 3)
+        print(f"[DEBUG] Worker template ready in {self.start_seconds}s (pid {self.process.pid})", file=sys.stderr)
+
+    def ensure_started(self):
+        with self._lock:
+            if not self.alive():
+                self.start()
+
+    def request(self, payload, timeout=None):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+            conn.settimeout(timeout)
+            conn.connect(self.socket_path)
+            with conn.makefile("rwb") as stream:
+                _reply(stream, payload)
+                line = stream.readline()
+        if not line:
+            raise ConnectionError("Worker template closed the connection without a result")
+        return json.loads(line)
+
+    def run(self, argv, timeout=None):
+        """
+        Run scrape_worker with argv (without the script name) in a forked
+        child and return {"results", "returncode"}, the shape of
+        main.run_scrape_subprocess.
+        """
+        self.ensure_started()
+        self.runs += 1
+        return self.request({"argv": argv}, timeout=timeout)
+
+    def stats(self):
+        return {
+            "pid": self.process.pid if self.process else None,
+            "alive": self.alive(),
+            "start_seconds": self.start_seconds,
+            "preloaded": self.preloaded,
+            "runs": self.runs,
+        }
+
+    def close(self):
+        if self.alive():
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self._dir:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    serve(sys.argv[1])
@@ -0,0 +1,123 @@
+"""
+Check and time page_extract.extract_from_html on saved product pages, and
+compare it with reading the same fields one selector at a time (one
+BeautifulSoup select per field, the way the locator loop worked) when bs4 is
+installed. The price-only parse used by re-checks is timed too.
+
+    python benchmarks/bench_extract.py [--repeat 200] [--pad-kb 0]
+
+--pad-kb appends filler markup to each page to approximate full-size
+product pages.
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "app"))
+
+from page_extract import (PRICE_SELECTORS, clean_price, extract_from_html, extract_price_region, is_blocked,
+                          price_from_candidates)
+
+EXPECTED = {
+    "amazon_product.html": {
+        "blocked": False,
+        "title": "Samsung Galaxy M34 5G (Midnight Blue, 6GB, 128GB Storage) | 120Hz sAMOLED Display",
+        "price": 16999.0,
+        "image": "https://m.media-amazon.com/images/I/71hpGWwTrVL._SX679_.jpg",
+    },
+    "amazon_captcha.html": {"blocked": True, "title": None, "price": None, "image": None},
+    "amazon_no_price.html": {
+        "blocked": False,
+        "title": "boAt Rockerz 450 Bluetooth On Ear Headphones (Luscious Black)",
+        "price": None,
+        "image": "https://m.media-amazon.com/images/I/51FNnHjzhQL._SX679_.jpg",
+    },
+}
+
+
+def load_page(name, pad_kb):
+    with open(os.path.join(HERE, "fixtures", name), encoding="utf-8") as f:
+        html = f.read()
+    if pad_kb:
+        filler = '<div class="a-section"><span class="a-size-base">filler text</span></div>\n'
+        html = html.replace("</body>", filler * (pad_kb * 1024 // len(filler)) + "</body>")
+    return html
+
+
+def single_pass(html):
+    extracted = extract_from_html(html)
+    price, _ = price_from_candidates(extracted["price_candidates"])
+    return {"blocked": extracted["blocked"], "title": extracted["title"], "price": price, "image": extracted["image"]}
+
+
+def price_only(html):
+    extracted = extract_price_region(html)
+    price, _ = price_from_candidates(extracted["price_candidates"])
+    return {"blocked": extracted["blocked"], "price": price}
+
+
+def sequential(html):
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.select_one("#productTitle")
+    price = None
+    for selector in PRICE_SELECTORS:
+        node = soup.select_one(selector)
+        if node and node.get_text(strip=True):
+            price = clean_price(node.get_text(strip=True))
+            if price is not None:
+                break
+    image = soup.select_one("#landingImage")
+    return {
+        "blocked": is_blocked(str(soup)),
+        "title": " ".join(title.get_text().split()) if title else None,
+        "price": price,
+        "image": image.get("src") if image else None,
+    }
+
+
+def time_per_page(fn, pages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            fn(html)
+    return (time.perf_counter() - started) / (repeat * len(pages)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--pad-kb", type=int, default=0, help="Filler markup appended to every page, in KB")
+    args = parser.parse_args()
+
+    pages = {name: load_page(name, args.pad_kb) for name in EXPECTED}
+    failures = 0
+    for name, expected in EXPECTED.items():
+        got = single_pass(pages[name])
+        if got != expected:
+            failures += 1
+            print(f"MISMATCH {name}: expected {expected}, got {got}")
+
+    size_kb = sum(len(html) for html in pages.values()) / len(pages) / 1024
+    print(f"pages:        {len(pages)} (avg {size_kb:.1f} KB)")
+    print(f"correct:      {len(pages) - failures}/{len(pages)}")
+    print(f"single pass:  {time_per_page(single_pass, list(pages.values()), args.repeat):.3f} ms/page")
+    agree = sum(price_only(pages[name]) == {"blocked": e["blocked"], "price": e["price"]} for name, e in EXPECTED.items())
+    print(f"price only:   {time_per_page(price_only, list(pages.values()), args.repeat):.3f} ms/page "
+          f"(agrees on {agree}/{len(pages)})")
+    try:
+        import bs4  # noqa: F401
+    except ImportError:
+        print("sequential:   skipped (bs4 not installed)")
+    else:
+        agree = sum(sequential(pages[name]) == single_pass(pages[name]) for name in pages)
+        print(f"sequential:   {time_per_page(sequential, list(pages.values()), args.repeat):.3f} ms/page "
+              f"(agrees on {agree}/{len(pages)})")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
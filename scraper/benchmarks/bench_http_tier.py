@@ -0,0 +1,61 @@
+"""
+Run the plain-HTTP fetch tier against fixture pages served locally by
+fixture_server.py: check which pages it serves and which it escalates to the
+browser, and time the HTTP tier per page.
+
+    python benchmarks/bench_http_tier.py [--repeat 50]
+"""
+import argparse
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "app"))
+# Time the tier itself, not the per-domain pacing in rate_limit.py
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+
+from fixture_server import start_server
+
+# path -> expected outcome of the HTTP tier (a price, or None for escalation)
+CASES = {
+    "amazon_product.html": 16999.0,
+    "amazon_captcha.html": None,
+    "amazon_no_price.html": None,
+    "status/503/amazon_product.html": None,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    import fetch_tiers
+    server, base_url = start_server()
+    failures = 0
+    try:
+        for path, expected in CASES.items():
+            result = fetch_tiers.scrape_http(f"{base_url}/{path}")
+            got = result["price"] if result else None
+            outcome = "http" if result else "browser"
+            ok = got == expected
+            failures += not ok
+            print(f"{'ok  ' if ok else 'FAIL'} {path:35} -> {outcome} tier (price {got})")
+
+        url = f"{base_url}/amazon_product.html"
+        started = time.perf_counter()
+        for _ in range(args.repeat):
+            fetch_tiers.scrape_http(url)
+        per_page = (time.perf_counter() - started) / args.repeat * 1000
+    finally:
+        server.shutdown()
+
+    print(f"http tier:  {per_page:.2f} ms/page over {args.repeat} fetches")
+    print(f"escalated:  {fetch_tiers.stats()['escalated']}")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Compare one-prompt-per-title metadata extraction with extract_metadata_batch,
+both against the local FakeGeminiModel stand-in.
+
+    python benchmarks/bench_metadata_batch.py [--latency 0.05] [--drop-rate 0.1] [--batch-size 25]
+
+Besides the timings it checks the batch path and exits non-zero when a
+check fails:
+
+    aligned         every title the fake model answered gets its own answer,
+                    and every title it never answered the rule metadata
+    retry failed    a retry only re-sends titles missing from the last
+                    response, never one that was already answered
+    fallback        with every batch entry dropped, all titles still get
+                    the rule metadata
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "app"))
+
+
+def load_titles():
+    with open(os.path.join(HERE, "fixtures", "titles.txt"), encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def record_calls(fake_model_class):
+    """
+    Wrap the fake model so every batch call is recorded as (titles sent,
+    titles answered). Returns the list the calls are appended to.
+    """
+    calls = []
+    generate = fake_model_class.generate_content
+
+    def recording(self, prompt):
+        response = generate(self, prompt)
+        if "Titles:" in prompt:
+            sent = dict(re.findall(r"^(\d+)\. (.+)$", prompt.split("Titles:", 1)[1], re.MULTILINE))
+            body = response.text.strip("`").removeprefix("json")
+            answered = {sent[str(item["index"])] for item in json.loads(body)}
+            calls.append((list(sent.values()), answered))
+        return response
+
+    fake_model_class.generate_content = recording
+    return calls
+
+
+def check(name, ok, detail):
+    print(f"{'ok  ' if ok else 'FAIL'} {name:15} {detail}")
+    return not ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05, help="Seconds added to every fake LLM call")
+    parser.add_argument("--drop-rate", type=float, default=0.1, help="Fraction of batch entries the fake model omits")
+    parser.add_argument("--batch-size", type=int, default=25)
+    args = parser.parse_args()
+
+    os.environ["METADATA_LLM_BACKEND"] = "fake"
+    os.environ["METADATA_CACHE_BACKEND"] = "off"
+    os.environ["FAKE_LLM_LATENCY"] = str(args.latency)
+    os.environ["FAKE_LLM_DROP_RATE"] = str(args.drop_rate)
+    import extract_metadata
+    from fake_llm import FakeGeminiModel, describe_title
+    from rule_metadata import extract_metadata_rules
+
+    titles = load_titles()
+
+    FakeGeminiModel.calls = 0
+    started = time.perf_counter()
+    single = [extract_metadata.call_gemini_for_metadata(title) for title in titles]
+    single_time = time.perf_counter() - started
+    single_calls = FakeGeminiModel.calls
+
+    calls = record_calls(FakeGeminiModel)
+    FakeGeminiModel.calls = 0
+    started = time.perf_counter()
+    batched = extract_metadata.extract_metadata_batch(titles, batch_size=args.batch_size, use_rules=False)
+    batch_time = time.perf_counter() - started
+    batch_calls = FakeGeminiModel.calls
+
+    answered = set().union(*(done for _, done in calls))
+    expected = [describe_title(title) if title in answered else extract_metadata_rules(title)[0] for title in titles]
+    aligned = sum(1 for metadata, want in zip(batched, expected) if metadata == want)
+    missing = len(titles) - len(answered)
+    resent, seen = 0, set()
+    for sent, done in calls:
+        resent += sum(1 for title in sent if title in seen)
+        seen |= done
+    sends = sum(len(sent) for sent, _ in calls)
+
+    print(f"titles:            {len(titles)}")
+    print(f"per-title:         {single_calls} calls, {single_time * 1000:.1f} ms")
+    print(f"batched:           {batch_calls} calls, {batch_time * 1000:.1f} ms (batch size {args.batch_size})")
+    print(f"speedup:           {single_time / batch_time:.1f}x")
+    print(f"per-title matched: {sum(1 for m in single if m is not None)}/{len(titles)}")
+
+    failures = 0
+    failures += check("aligned", aligned == len(titles),
+                      f"{aligned}/{len(titles)} (rule fallback for {missing} never answered)")
+    failures += check("retry failed", bool(calls) and resent == 0, f"{sends} titles sent in {len(calls)} calls, {resent} already answered")
+
+    FakeGeminiModel._dropped = lambda self, title: True
+    fallback = extract_metadata.extract_metadata_batch(titles, batch_size=args.batch_size, use_rules=False)
+    rules = [extract_metadata_rules(title)[0] for title in titles]
+    failures += check("fallback", fallback == rules,
+                      f"{sum(1 for got, want in zip(fallback, rules) if got == want)}/{len(titles)} got the rule metadata")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
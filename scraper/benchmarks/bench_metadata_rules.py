@@ -0,0 +1,129 @@
+"""
+Benchmark the offline rule-based metadata extractor against the LLM path on
+the fixture titles: per-title latency, how many titles clear the confidence
+threshold, and brand/model/attribute agreement with the LLM output.
+
+    python benchmarks/bench_metadata_rules.py                       # recorded reference
+    python benchmarks/bench_metadata_rules.py --backend gemini --record fixtures/titles_llm.json
+    python benchmarks/bench_metadata_rules.py --backend fake        # pipeline check only
+
+By default the rules are compared with fixtures/titles_llm.json, metadata
+for every fixture title in the shape the Gemini prompt returns, checked by
+hand. Re-record it with --backend gemini --record when the prompt or the
+titles change. The fake backend derives its answers from the title with
+naive rules of its own, so its agreement numbers say nothing about quality.
+
+The threshold table shows, for each confidence threshold, how many titles
+would skip the LLM and how well those agree with the reference; "model =" is
+an exact model match, "model ~" allows either to contain the other.
+RULES_MIN_CONFIDENCE is chosen from it.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "app"))
+REFERENCE = os.path.join(HERE, "fixtures", "titles_llm.json")
+THRESHOLDS = [0.5, 0.6, 0.7, 0.8, 0.85, 0.9, 1.0]
+
+
+def load_titles():
+    with open(os.path.join(HERE, "fixtures", "titles.txt"), encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def norm(value):
+    return re.sub(r"[^a-z0-9]+", " ", str(value or "").lower()).strip()
+
+
+def attribute_set(attributes):
+    if isinstance(attributes, dict):
+        attributes = list(attributes.values())
+    if not isinstance(attributes, list):
+        attributes = [attributes] if attributes else []
+    return {norm(item) for item in attributes if norm(item)}
+
+
+def agreement(rules, llm):
+    brand = norm(rules.get("brand")) == norm(llm.get("brand"))
+    rules_model, llm_model = norm(rules.get("model")), norm(llm.get("model"))
+    model = bool(rules_model and llm_model and (rules_model in llm_model or llm_model in rules_model))
+    exact = bool(rules_model) and rules_model == llm_model
+    a, b = attribute_set(rules.get("attributes")), attribute_set(llm.get("attributes"))
+    attributes = len(a & b) / len(a | b) if a | b else 1.0
+    return brand, model, exact, attributes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--backend", choices=["recorded", "fake", "gemini"], default="recorded",
+                        help="Compare with --reference, or call this LLM backend")
+    parser.add_argument("--reference", default=REFERENCE, help="JSON file of recorded LLM metadata, keyed by title")
+    parser.add_argument("--record", help="Write the LLM metadata to this JSON file for later --reference runs")
+    parser.add_argument("--repeat", type=int, default=200, help="Rule extractor passes over the title set")
+    args = parser.parse_args()
+
+    if args.backend != "recorded":
+        os.environ["METADATA_LLM_BACKEND"] = args.backend
+    os.environ["METADATA_CACHE_BACKEND"] = "off"
+    import extract_metadata
+    from rule_metadata import extract_metadata_rules
+
+    titles = load_titles()
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        rules = [extract_metadata_rules(title) for title in titles]
+    rules_us = (time.perf_counter() - started) / (args.repeat * len(titles)) * 1e6
+
+    if args.backend == "recorded":
+        with open(args.reference, encoding="utf-8") as f:
+            recorded = json.load(f)
+        llm = [recorded.get(title) for title in titles]
+        llm_ms = None
+    else:
+        started = time.perf_counter()
+        llm = [extract_metadata.call_gemini_for_metadata(title) for title in titles]
+        llm_ms = (time.perf_counter() - started) / len(titles) * 1000
+        if args.record:
+            with open(args.record, "w", encoding="utf-8") as f:
+                json.dump(dict(zip(titles, llm)), f, indent=2, ensure_ascii=False)
+
+    threshold = extract_metadata.METADATA_RULES_MIN_CONFIDENCE
+    confident = [i for i, (_, confidence) in enumerate(rules) if confidence >= threshold]
+    compared = [i for i in range(len(titles)) if isinstance(llm[i], dict)]
+
+    def mean_agreement(indexes):
+        scores = [agreement(rules[i][0], llm[i]) for i in indexes]
+        return [sum(s[k] for s in scores) / len(scores) for k in range(4)] if scores else None
+
+    def summarize(indexes):
+        means = mean_agreement(indexes)
+        if means is None:
+            return "n/a"
+        brand, model, exact, attributes = means
+        return (f"brand {brand:.0%}, model {model:.0%} (exact {exact:.0%}), attributes {attributes:.0%} "
+                f"(n={len(indexes)})")
+
+    print(f"titles:              {len(titles)}")
+    print(f"rules latency:       {rules_us:.1f} us/title")
+    source = os.path.relpath(args.reference) if args.backend == "recorded" else args.backend
+    print(f"llm latency:         {'recorded' if llm_ms is None else f'{llm_ms:.1f} ms/title'} ({source})")
+    print(f"fast-path coverage:  {len(confident)}/{len(titles)} at confidence >= {threshold}")
+    print(f"agreement (all):     {summarize(compared)}")
+    print(f"agreement (fast):    {summarize([i for i in confident if i in compared])}")
+
+    print(f"\n{'threshold':>9} {'skip llm':>9} {'brand':>6} {'model ~':>8} {'model =':>8} {'attrs':>6}")
+    for value in THRESHOLDS:
+        indexes = [i for i in compared if rules[i][1] >= value]
+        means = mean_agreement(indexes)
+        cells = " ".join(f"{m:>{w}.0%}" for m, w in zip(means, (6, 8, 8, 6))) if means else "n/a"
+        print(f"{value:9.2f} {len(indexes):4d}/{len(compared):<4d} {cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Micro-benchmark of price extraction on saved DuckDuckGo result pages: the
+previous approach (page.find(url) per link, then up to six regexes compiled
+and run in turn over a 1000-character slice) against price_tokens'
+single-scan tokenizer and link-to-context index.
+
+    python benchmarks/bench_price_tokens.py [--repeat 50] [--scale 1]
+
+--scale repeats the results on each page to see how both grow with page size.
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "app"))
+
+from price_tokens import _ANCHOR_RE, index_result_links, resolve_result_url, summarize_prices
+
+PAGES = {
+    "ddg_flipkart.html": "flipkart.com",
+    "ddg_meesho.html": "meesho.com",
+    "ddg_reliance.html": "reliancedigital.in",
+}
+
+LEGACY_PATTERNS = [
+    r'₹\s*[\d,]+(?:\.\d+)?',
+    r'Rs\.?\s*[\d,]+(?:\.\d+)?',
+    r'INR\s*[\d,]+(?:\.\d+)?',
+    r'\b[\d,]+\s*₹',
+    r'Price:\s*₹?\s*[\d,]+(?:\.\d+)?',
+    r'MRP:?\s*₹?\s*[\d,]+(?:\.\d+)?',
+]
+
+
+def legacy_price(text):
+    for pattern in LEGACY_PATTERNS:
+        matches = re.findall(pattern, text, re.IGNORECASE)
+        if matches:
+            return matches[0].strip()
+    return None
+
+
+def legacy(html, domain):
+    results = []
+    for match in _ANCHOR_RE.finditer(html):
+        url = resolve_result_url(match.group(1))
+        if domain not in url:
+            continue
+        price = None
+        link_pos = html.find(url)
+        if link_pos != -1:
+            price = legacy_price(html[max(0, link_pos - 500):link_pos + 500])
+        if not price:
+            price = legacy_price(match.group(2))
+        results.append((url, price))
+    return results
+
+
+def single_scan(html, domain):
+    return [(link["url"], summarize_prices(link["prices"])) for link in index_result_links(html, domain)]
+
+
+def load_page(name, scale):
+    with open(os.path.join(HERE, "fixtures", name), encoding="utf-8") as f:
+        html = f.read()
+    if scale > 1:
+        start, end = html.index('<div id="links"'), html.rindex("</div>")
+        body = html[html.index(">", start) + 1:end]
+        html = html[:end] + body * (scale - 1) + html[end:]
+    return html
+
+
+def time_per_page(fn, pages, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for html, domain in pages:
+            fn(html, domain)
+    return (time.perf_counter() - started) / (repeat * len(pages)) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--scale", type=int, default=1, help="Copies of each page's results")
+    args = parser.parse_args()
+
+    pages = [(load_page(name, args.scale), domain) for name, domain in PAGES.items()]
+    links = sum(len(single_scan(html, domain)) for html, domain in pages)
+    priced = sum(1 for html, domain in pages for _, details in single_scan(html, domain) if details["price"])
+    legacy_links = sum(len(legacy(html, domain)) for html, domain in pages)
+    legacy_priced = sum(1 for html, domain in pages for _, price in legacy(html, domain) if price)
+
+    size_kb = sum(len(html) for html, _ in pages) / len(pages) / 1024
+    print(f"pages:        {len(pages)} (avg {size_kb:.1f} KB)")
+    print(f"legacy:       {time_per_page(legacy, pages, args.repeat):.3f} ms/page, "
+          f"{legacy_priced}/{legacy_links} anchors priced (raw strings)")
+    print(f"single scan:  {time_per_page(single_scan, pages, args.repeat):.3f} ms/page, "
+          f"{priced}/{links} results priced (numeric, MRP separated)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Simulate the volatility-aware re-check planner in recheck.py on synthetic
+price histories and compare it with the fixed hourly cron.
+
+Products fall into stable, weekly and daily repricing classes, each with a
+target price somewhat below its base price. After a warm-up history, every
+simulated hour the planner picks up to --budget of the products to check.
+The report shows how many scrapes that saves over checking everything every
+hour, how many target-price events (spells with the price at or below the
+target) were never observed, and the mean delay before an observed event
+was seen. A round-robin schedule with the same budget is shown for
+comparison.
+
+    python benchmarks/bench_recheck.py [--products 1000] [--days 14] [--budget 0.1]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "app"))
+
+from recheck import plan_rechecks
+
+# share of products, mean hours between price changes
+CLASSES = [(0.6, 24 * 45), (0.3, 24 * 7), (0.1, 24)]
+WARMUP_DAYS = 30
+WARMUP_EVERY_HOURS = 6
+
+
+def simulate_prices(rng, count, hours):
+    """
+    (count, hours) true hourly prices and per-product target prices.
+    """
+    shares = np.array([share for share, _ in CLASSES])
+    mean_gaps = np.array([gap for _, gap in CLASSES], dtype=float)
+    kind = rng.choice(len(CLASSES), size=count, p=shares / shares.sum())
+    base = np.round(rng.uniform(300, 80000, size=count))
+    changes = rng.random((count, hours)) < (1 / mean_gaps[kind])[:, None]
+    levels = np.round(base[:, None] * np.exp(rng.normal(0, 0.08, size=(count, hours))))
+    levels[:, 0] = base
+    # Forward-fill: each hour keeps the level set at the latest change
+    last_change = np.where(changes, np.arange(hours), 0)
+    np.maximum.accumulate(last_change, axis=1, out=last_change)
+    prices = np.take_along_axis(levels, last_change, axis=1)
+    targets = np.round(base * (1 - rng.uniform(0.03, 0.15, size=count)))
+    return prices, targets, kind
+
+
+def target_events(prices, targets, start):
+    """
+    (product, first hour, last hour) of every spell at or below target that
+    starts at or after hour start.
+    """
+    below = prices <= targets[:, None]
+    events = []
+    for product in np.flatnonzero(below[:, start:].any(axis=1)):
+        row = below[product]
+        hour = start
+        while hour < len(row):
+            if row[hour] and (hour == start or not row[hour - 1]):
+                end = hour
+                while end + 1 < len(row) and row[end + 1]:
+                    end += 1
+                events.append((product, hour, end))
+                hour = end + 1
+            else:
+                hour += 1
+    return events
+
+
+def score_schedule(checks, events):
+    missed = 0
+    delays = []
+    for product, first, last in events:
+        seen = [hour for hour in checks[product] if first <= hour <= last]
+        if seen:
+            delays.append(min(seen) - first)
+        else:
+            missed += 1
+    return missed, (sum(delays) / len(delays) if delays else 0.0)
+
+
+def run_planner(prices, targets, start, budget):
+    count, hours = prices.shape
+    history = [[(hour * 3600.0, prices[i, hour]) for hour in range(0, start, WARMUP_EVERY_HOURS)]
+               for i in range(count)]
+    checks = [[] for _ in range(count)]
+    scrapes = 0
+    plan_seconds = 0.0
+    for hour in range(start, hours):
+        products = [{"url": str(i), "target_price": targets[i], "history": history[i]} for i in range(count)]
+        started = time.perf_counter()
+        due, _ = plan_rechecks(products, budget, now=hour * 3600.0)
+        plan_seconds += time.perf_counter() - started
+        for entry in due:
+            i = int(entry["url"])
+            history[i].append((hour * 3600.0, prices[i, hour]))
+            checks[i].append(hour)
+        scrapes += len(due)
+    return checks, scrapes, plan_seconds / (hours - start)
+
+
+def run_round_robin(count, start, hours, budget):
+    checks = [[] for _ in range(count)]
+    cursor = 0
+    for hour in range(start, hours):
+        for _ in range(min(budget, count)):
+            checks[cursor].append(hour)
+            cursor = (cursor + 1) % count
+    return checks, min(budget, count) * (hours - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--products", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=14)
+    parser.add_argument("--budget", type=float, default=0.1, help="Scrapes per hour as a share of the products")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    start = WARMUP_DAYS * 24
+    hours = start + args.days * 24
+    prices, targets, _ = simulate_prices(rng, args.products, hours)
+    events = target_events(prices, targets, start)
+    budget = max(1, int(args.products * args.budget))
+    hourly = args.products * (hours - start)
+
+    checks, scrapes, plan_seconds = run_planner(prices, targets, start, budget)
+    missed, delay = score_schedule(checks, events)
+    rr_checks, rr_scrapes = run_round_robin(args.products, start, hours, budget)
+    rr_missed, rr_delay = score_schedule(rr_checks, events)
+
+    print(f"products: {args.products}, simulated hours: {hours - start}, budget: {budget}/hour")
+    print(f"target events: {len(events)}")
+    print(f"{'schedule':12} {'scrapes':>9} {'saved':>7} {'missed':>7} {'miss rate':>10} {'delay h':>8}")
+    print(f"{'hourly cron':12} {hourly:9d} {0:6.1f}% {0:7d} {0:9.1f}% {0:8.2f}")
+    for name, used, miss, lag in (("planner", scrapes, missed, delay), ("round robin", rr_scrapes, rr_missed, rr_delay)):
+        rate = miss / len(events) * 100 if events else 0.0
+        print(f"{name:12} {used:9d} {(1 - used / hourly) * 100:6.1f}% {miss:7d} {rate:9.1f}% {lag:8.2f}")
+    print(f"planner: {plan_seconds * 1000:.1f} ms per hourly plan")
+
+
+if __name__ == "__main__":
+    main()
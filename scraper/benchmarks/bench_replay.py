@@ -0,0 +1,309 @@
+"""
+Offline replay benchmark of the scrape hot paths against recorded pages
+served by fixture_server.py, so a change to the fetch tiers, price
+extraction or platform searches can be measured before it is deployed
+without touching Amazon or DuckDuckGo.
+
+    python benchmarks/bench_replay.py [--requests 200] [--concurrency 16]
+        [--latency 0.02] [--jitter 0.01] [--fail-rate 0] [--browser]
+        [--save baseline.json | --baseline baseline.json]
+
+Three paths are replayed through the app's own code:
+
+    single      main.scrape_with_engine, one scrape at a time, over product,
+                redirect, CAPTCHA, missing-price and 503 pages
+    batch       POST /scrape/batch with --requests items, per_domain_limit
+                --concurrency; latency is from the start of the batch to
+                the item's NDJSON line
+    alternates  enrichment.enrich_product(get_alternates=True) for the
+                titles in fixtures/titles.txt, every platform search hitting
+                the fixture DuckDuckGo
+
+Each path reports throughput, p50/p95/p99 latency and the peak Python
+memory allocated per scrape (tracemalloc, in a separate pass so tracing
+does not slow the timed one). Pages the HTTP tier escalates go to a
+Chromium pool with --browser and are otherwise answered at once with an
+error, so the numbers cover the HTTP side only. The Gemini metadata lookup
+is not replayed. The time taken to import the app is printed as well.
+
+The fixture server runs in its own process. Before the timings, every
+variant is checked for the outcome it should produce, and the run exits
+non-zero if one is wrong or, with --baseline, if a path's throughput or p95
+is more than --tolerance worse than the saved run.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "..", "app"))
+# Measure the scrape paths themselves: no per-domain pacing, no sharing of
+# repeated URLs and no capture files
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("SCRAPE_COALESCE", "0")
+os.environ.setdefault("CAPTURE_ENABLED", "0")
+os.environ.setdefault("SCRAPER_ENGINE", "none")
+
+from fixture_server import FIXTURES, start_server_process
+
+PRODUCT_PRICE = 16999.0
+# path -> expected outcome: the price the HTTP tier returns, or None when the
+# page should be escalated to the browser
+PAGE_CASES = {
+    "amazon_product.html": PRODUCT_PRICE,
+    "redirect/amazon_product.html": PRODUCT_PRICE,
+    "amazon_captcha.html": None,
+    "amazon_no_price.html": None,
+    "status/503/amazon_product.html": None,
+}
+# Share of each variant in the replayed traffic
+PAGE_MIX = ["amazon_product.html"] * 6 + ["redirect/amazon_product.html"] * 2 + [
+    "amazon_captcha.html", "amazon_no_price.html", "status/503/amazon_product.html",
+]
+SCRAPE_OPTIONS = {"extract_metadata": False, "get_alternates": False, "cache_mode": "bypass"}
+MEMORY_SAMPLES = 20
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+def summarize(latencies, seconds, peak_bytes):
+    return {
+        "requests": len(latencies),
+        "throughput": len(latencies) / seconds if seconds else 0.0,
+        "p50": percentile(latencies, 0.50) * 1000,
+        "p95": percentile(latencies, 0.95) * 1000,
+        "p99": percentile(latencies, 0.99) * 1000,
+        "peak_kib": peak_bytes / 1024,
+    }
+
+
+def page_urls(base_url, count):
+    # Distinct URLs, so the tier memory of one request does not decide the next
+    return [f"{base_url}/{PAGE_MIX[i % len(PAGE_MIX)]}?n={i}" for i in range(count)]
+
+
+def load_titles():
+    with open(os.path.join(FIXTURES, "titles.txt"), encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+async def measure_peak(run, samples):
+    """
+    Mean tracemalloc peak, in bytes, of await run(i) over samples calls.
+    """
+    tracemalloc.start()
+    try:
+        total = 0
+        for i in range(samples):
+            tracemalloc.reset_peak()
+            before, _ = tracemalloc.get_traced_memory()
+            await run(i)
+            _, peak = tracemalloc.get_traced_memory()
+            total += peak - before
+    finally:
+        tracemalloc.stop()
+    return total / samples
+
+
+async def check_outcomes(main, base_url):
+    """
+    Run every page and search variant once against base_url, a server that
+    injects no failures; returns the number that did not behave as expected.
+    """
+    import platforms
+    from enrichment import enrich_product
+    platforms.SEARCH_URL = f"{base_url}/html/"
+    failures = 0
+    for path, expected in PAGE_CASES.items():
+        data = await main.scrape_with_engine(f"{base_url}/{path}", http_tier=True, **SCRAPE_OPTIONS)
+        got = data.get("price") if data.get("tier") == "http" else None
+        ok = got == expected
+        failures += not ok
+        outcome = "http" if data.get("tier") == "http" else "escalated"
+        print(f"{'ok  ' if ok else 'FAIL'} {path:35} -> {outcome} (price {got})")
+
+    title = load_titles()[0]
+    found = enrich_product(title, get_alternates=True, cache_mode="bypass")["alternate_prices"]
+    ok = any(result.get("price") for result in found)
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {'search results':35} -> {len(found)} alternates")
+
+    platforms.SEARCH_URL = f"{base_url}/blocked/html/"
+    found = enrich_product(title, get_alternates=True, cache_mode="bypass")["alternate_prices"]
+    ok = found == []
+    failures += not ok
+    print(f"{'ok  ' if ok else 'FAIL'} {'search bot challenge':35} -> {len(found)} alternates")
+    return failures
+
+
+async def bench_single(main, base_url, count):
+    urls = page_urls(base_url, count)
+    latencies = []
+    started = time.perf_counter()
+    for url in urls:
+        began = time.perf_counter()
+        await main.scrape_with_engine(url, http_tier=True, **SCRAPE_OPTIONS)
+        latencies.append(time.perf_counter() - began)
+    seconds = time.perf_counter() - started
+
+    async def one(i):
+        await main.scrape_with_engine(urls[i % len(urls)], http_tier=True, **SCRAPE_OPTIONS)
+
+    return summarize(latencies, seconds, await measure_peak(one, MEMORY_SAMPLES))
+
+
+async def run_batch(main, urls, concurrency):
+    batch = main.BatchRequest(
+        items=[{"url": url, "http_tier": True, "bypass_cache": True} for url in urls],
+        per_domain_limit=concurrency,
+    )
+    latencies = []
+    started = time.perf_counter()
+    # Read the handler's NDJSON stream directly; an in-process HTTP client
+    # would buffer it and hide when each line was ready
+    response = await main.scrape_batch(batch)
+    async for line in response.body_iterator:
+        if line.strip():
+            latencies.append(time.perf_counter() - started)
+    return latencies, time.perf_counter() - started
+
+
+async def bench_batch(main, base_url, count, concurrency):
+    urls = page_urls(base_url, min(count, main.BATCH_MAX_ITEMS))
+    latencies, seconds = await run_batch(main, urls, concurrency)
+
+    samples = urls[:MEMORY_SAMPLES]
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        await run_batch(main, samples, concurrency)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return summarize(latencies, seconds, (peak - before) / len(samples))
+
+
+async def bench_alternates(base_url, count):
+    from enrichment import enrich_product
+    titles = load_titles()
+    latencies = []
+    started = time.perf_counter()
+    for i in range(count):
+        began = time.perf_counter()
+        enrich_product(titles[i % len(titles)], get_alternates=True, cache_mode="bypass")
+        latencies.append(time.perf_counter() - began)
+    seconds = time.perf_counter() - started
+
+    async def one(i):
+        enrich_product(titles[i % len(titles)], get_alternates=True, cache_mode="bypass")
+
+    return summarize(latencies, seconds, await measure_peak(one, min(MEMORY_SAMPLES, count)))
+
+
+def compare(results, baseline, tolerance):
+    """
+    Lines describing each path whose throughput or p95 regressed by more
+    than tolerance against baseline.
+    """
+    regressions = []
+    for path, now in results.items():
+        before = baseline.get(path)
+        if not before:
+            continue
+        if now["throughput"] < before["throughput"] * (1 - tolerance):
+            regressions.append(f"{path}: throughput {before['throughput']:.1f} -> {now['throughput']:.1f}/s")
+        if now["p95"] > before["p95"] * (1 + tolerance):
+            regressions.append(f"{path}: p95 {before['p95']:.1f} -> {now['p95']:.1f} ms")
+    return regressions
+
+
+async def run(args, base_url, check_url):
+    started = time.perf_counter()
+    import main
+    import platforms
+    startup = time.perf_counter() - started
+    pool = None
+    if args.browser:
+        from browser_pool import AsyncBrowserPool
+        pool = main.async_pool = AsyncBrowserPool()
+        await pool.start()
+    else:
+        async def skip_browser(url, **options):
+            return {"error": "browser tier not replayed (run with --browser)"}
+        main.scrape_with_browser = skip_browser
+
+    try:
+        failures = await check_outcomes(main, check_url)
+        platforms.SEARCH_URL = f"{base_url}/html/"
+        results = {
+            "single": await bench_single(main, base_url, args.requests),
+            "batch": await bench_batch(main, base_url, args.requests, args.concurrency),
+            "alternates": await bench_alternates(base_url, args.alternates),
+        }
+    finally:
+        if pool is not None:
+            await pool.close()
+        # Let searches still running after their lookup returned finish
+        # before the fixture server goes away
+        from extract_metadata import get_search_executor
+        get_search_executor().shutdown(wait=True)
+        from http_client import close_async_client
+        await close_async_client()
+    return failures, results, startup
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Scrapes for the single and batch paths")
+    parser.add_argument("--alternates", type=int, default=30, help="Titles for the alternates path")
+    parser.add_argument("--concurrency", type=int, default=16, help="per_domain_limit for the batch path")
+    parser.add_argument("--latency", type=float, default=0.02, help="Seconds the fixture server adds per response")
+    parser.add_argument("--jitter", type=float, default=0.01)
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of fixture responses that are 503s")
+    parser.add_argument("--browser", action="store_true", help="Render escalated pages in a Chromium pool")
+    parser.add_argument("--save", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="Compare with results saved by --save")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression against --baseline")
+    args = parser.parse_args()
+
+    server, base_url = start_server_process(latency=args.latency, jitter=args.jitter, fail_rate=args.fail_rate)
+    check_server, check_url = start_server_process()
+    try:
+        failures, results, startup = asyncio.run(run(args, base_url, check_url))
+    finally:
+        for process in (server, check_server):
+            process.terminate()
+            process.wait()
+
+    print(f"fixture latency: {args.latency * 1000:.0f} ms (+{args.jitter * 1000:.0f} ms jitter), "
+          f"fail rate: {args.fail_rate:.0%}")
+    print(f"app import: {startup * 1000:.0f} ms (see bench_startup.py for process start times)")
+    print(f"{'path':11} {'requests':>8} {'per sec':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'peak KiB':>9}")
+    for path, result in results.items():
+        print(f"{path:11} {result['requests']:8d} {result['throughput']:8.1f} {result['p50']:8.1f} "
+              f"{result['p95']:8.1f} {result['p99']:8.1f} {result['peak_kib']:9.1f}")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+    if failures or regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Measure how long the scraper's processes take to start: a cold import of
+the app and of a scrape_worker.py run (fresh interpreter, Playwright,
+requests, metadata modules), against a child forked from the pre-loaded
+worker template in worker_template.py. Also prints where import time goes,
+from python -X importtime, grouped by top-level package.
+
+    python benchmarks/bench_startup.py [--repeat 5] [--top 12]
+
+Browser launch is not included: a scrape_worker run and a forked child
+both launch Chromium themselves.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APP_DIR = os.path.abspath(os.path.join(HERE, "..", "app"))
+sys.path.insert(0, APP_DIR)
+
+# What each kind of process imports before it can do any work
+COLD_IMPORTS = {
+    "app (main)": "import main",
+    "scrape_worker": "import scrape_worker",
+    "scrape_worker + metadata": "import scrape_worker, extract_metadata",
+}
+
+
+def cold_start(statement, repeat):
+    """
+    Median wall time, in seconds, of a fresh interpreter running statement.
+    """
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-c", statement], cwd=APP_DIR, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        times.append(time.perf_counter() - started)
+    return statistics.median(times)
+
+
+def import_profile(statement):
+    """
+    {top-level package: self seconds} from python -X importtime.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement], cwd=APP_DIR,
+                            capture_output=True, text=True, check=True)
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(self_us) / 1e6
+    return packages
+
+
+def forked_start(repeat):
+    """
+    (template start seconds, its preload timings, median seconds for a
+    forked child to answer).
+    """
+    from worker_template import WorkerTemplate
+    template = WorkerTemplate()
+    template.start()
+    try:
+        times = []
+        for _ in range(repeat * 4):
+            started = time.perf_counter()
+            template.request({"ping": True}, timeout=10)
+            times.append(time.perf_counter() - started)
+    finally:
+        template.close()
+    return template.start_seconds, template.preloaded, statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=12, help="Packages to show in the import profile")
+    args = parser.parse_args()
+
+    print(f"{'process':28} {'start ms':>9}")
+    for name, statement in COLD_IMPORTS.items():
+        print(f"{name:28} {cold_start(statement, args.repeat) * 1000:9.1f}")
+    start_seconds, preloaded, child = forked_start(args.repeat)
+    print(f"{'forked from template':28} {child * 1000:9.1f}")
+    print(f"template start: {start_seconds * 1000:.0f} ms, once per service start")
+    for module, seconds in preloaded.items():
+        print(f"  preloaded {module:24} {seconds * 1000:7.1f} ms")
+
+    profile = import_profile(COLD_IMPORTS["scrape_worker + metadata"])
+    print(f"\nimport profile of scrape_worker + metadata ({sum(profile.values()) * 1000:.0f} ms):")
+    for package, seconds in sorted(profile.items(), key=lambda item: -item[1])[:args.top]:
+        print(f"  {package:28} {seconds * 1000:7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
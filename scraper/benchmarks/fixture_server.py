@@ -0,0 +1,142 @@
+"""
+Local HTTP stand-in that serves the saved pages in fixtures/, so the fetch
+tiers and the DuckDuckGo platform searches can be exercised without
+reaching Amazon or DuckDuckGo.
+
+    python benchmarks/fixture_server.py [--port 8765] [--latency 0.05] [--fail-rate 0.02]
+
+GET /<name>.html returns fixtures/<name>.html with status 200. Prefixes
+give the variants a live site produces:
+
+    /status/<code>/<name>.html   the page with that status instead
+    /redirect/<name>.html        a 302 to /<name>.html
+    /html/?q=... site:<domain>   a DuckDuckGo result page, ddg_<store>.html
+                                 for the store in the site: filter and
+                                 ddg_empty.html for stores without one
+    /blocked/html/?q=...         DuckDuckGo's bot challenge, ddg_captcha.html
+
+--latency adds that many seconds (with up to --jitter more) to every
+response and --fail-rate answers that share of requests with a 503.
+"""
+import argparse
+import os
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, "fixtures")
+SEARCH_PAGES = {
+    name[len("ddg_"):-len(".html")]: name
+    for name in os.listdir(FIXTURES) if name.startswith("ddg_") and name not in ("ddg_empty.html", "ddg_captcha.html")
+}
+
+
+def search_page(query):
+    """
+    The saved result page for the store named in query's site: filter.
+    """
+    match = re.search(r"site:(\S+)", query)
+    domain = match.group(1) if match else ""
+    for store, name in SEARCH_PAGES.items():
+        if store in domain:
+            return name
+    return "ddg_empty.html"
+
+
+class FixtureHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    latency = 0.0
+    jitter = 0.0
+    fail_rate = 0.0
+
+    def do_GET(self):
+        parts = urlsplit(self.path)
+        path = parts.path.strip("/")
+        if self.latency or self.jitter:
+            time.sleep(self.latency + random.random() * self.jitter)
+        if self.fail_rate and random.random() < self.fail_rate:
+            self.send_page(503, b"Service Unavailable")
+            return
+
+        status = 200
+        if path.startswith("status/"):
+            _, code, path = path.split("/", 2)
+            status = int(code)
+        if path.startswith("redirect/"):
+            self.send_response(302)
+            self.send_header("Location", "/" + path[len("redirect/"):])
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if path in ("html", "blocked/html"):
+            query = parse_qs(parts.query).get("q", [""])[0]
+            path = "ddg_captcha.html" if path.startswith("blocked") else search_page(query)
+
+        file_path = os.path.join(FIXTURES, os.path.basename(path))
+        if not os.path.isfile(file_path):
+            self.send_error(404)
+            return
+        with open(file_path, "rb") as f:
+            self.send_page(status, f.read())
+
+    def send_page(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(port=0, latency=0.0, jitter=0.0, fail_rate=0.0):
+    handler = type("Handler", (FixtureHandler,), {"latency": latency, "jitter": jitter, "fail_rate": fail_rate})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def start_server(port=0, **options):
+    """
+    Serve fixtures on a background thread. Returns (server, base_url); call
+    server.shutdown() when done. options are make_server's latency, jitter
+    and fail_rate.
+    """
+    server = make_server(port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_server_process(port=0, latency=0.0, jitter=0.0, fail_rate=0.0):
+    """
+    Serve fixtures from a separate process, so the server's threads do not
+    compete with the code being measured for the GIL or show up in its
+    memory. Returns (process, base_url); terminate the process when done.
+    """
+    args = [sys.executable, os.path.abspath(__file__), "--port", str(port), "--latency", str(latency),
+            "--jitter", str(jitter), "--fail-rate", str(fail_rate)]
+    process = subprocess.Popen(args, stdout=subprocess.PIPE, text=True)
+    base_url = process.stdout.readline().split()[-1]
+    return process, base_url
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Up to this many more seconds, at random")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="Share of requests answered with a 503")
+    args = parser.parse_args()
+    server = make_server(args.port, args.latency, args.jitter, args.fail_rate)
+    print(f"serving {FIXTURES} on http://127.0.0.1:{server.server_address[1]}", flush=True)
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The scraper modules import each other by bare name (see app/main.py)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+os.environ.setdefault("CAPTURE_ENABLED", "0")
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+import main
+from page_extract import BLOCKED_ERROR, result_outcome
+from rate_limit import BLOCKED, FAILED, OK, get_limiter, limiter_key
+
+
+@pytest.mark.parametrize("result, outcome", [
+    ({"title": "Product", "price": 16999.0}, OK),
+    ({"unchanged": True, "price": 16999.0}, OK),
+    ({"error": BLOCKED_ERROR}, BLOCKED),
+    ({"error": "Failed to navigate: net::ERR_CONNECTION_RESET"}, FAILED),
+    ({"error": "Timeout waiting for product title"}, FAILED),
+    ({"error": "Failed to parse scraper output"}, None),
+])
+def test_result_outcome(result, outcome):
+    assert result_outcome(result) == outcome
+
+
+def run_subprocess_engine(monkeypatch, url, results):
+    monkeypatch.setattr(main, "async_pool", None)
+    monkeypatch.setattr(main, "browser_pool", None)
+    monkeypatch.setattr(main, "run_scrape_subprocess", lambda url, **options: {"results": results, "returncode": 0})
+    return asyncio.run(main.scrape_with_browser(url))
+
+
+def test_blocked_subprocess_result_backs_off_parent_limiter(monkeypatch):
+    url = "https://blocked.example.test/dp/B0TEST0001"
+    limiter = get_limiter(limiter_key(url))
+
+    result = run_subprocess_engine(monkeypatch, url, {"error": BLOCKED_ERROR})
+
+    assert result == {"error": BLOCKED_ERROR}
+    assert limiter.rate < limiter.max_rate
+
+
+def test_unrelated_subprocess_error_leaves_parent_limiter(monkeypatch):
+    url = "https://crashed.example.test/dp/B0TEST0002"
+    limiter = get_limiter(limiter_key(url))
+
+    run_subprocess_engine(monkeypatch, url, {"error": "Failed to parse scraper output"})
+
+    assert limiter.rate == limiter.max_rate
+    assert limiter.stats()["consecutive_failures"] == 0